@@ -17,11 +17,11 @@ directory.
 
 
 import asyncio
+import collections
 import contextlib
+import fnmatch
 import functools
 import gzip
-import importlib
-import importlib.resources
 import itertools
 import math
 import multiprocessing
@@ -29,6 +29,7 @@ import os
 import pickle
 import shutil
 import signal
+import statistics
 import subprocess
 import sys
 import time
@@ -38,13 +39,15 @@ import pygments.styles
 import pyinotify
 import sortedcontainers
 
-import eris
+from eris import coverage_index
 from eris import fill3
+from eris import imports
+from eris import jobserver
+from eris import journal
 from eris import terminal
 from eris import termstr
 from eris import tools
 from eris import worker
-from eris import paged_list
 
 
 USAGE = """
@@ -61,12 +64,41 @@ Options:
   -i, --info                       Show information about the available tools.
   -w COUNT, --workers=COUNT        The number of processes working in parallel.
                                    By default it is the number of cpus minus 1.
+  -a, --autoscale                  Grow and shrink the number of workers with
+                                   the system load, up to the --workers count.
+  -J PATH, --jobserver=PATH        Share the cpus with other eris instances
+                                   through a jobserver fifo at PATH, created if
+                                   it doesn't exist. When run by make -j, eris
+                                   uses make's jobserver instead.
+  -r WORKERS, --remote=WORKERS     Also run tools on other machines, against a
+                                   copy of the directory. A comma separated
+                                   list of "HOST:PORT" for workers started
+                                   with "eris-worker --listen", or
+                                   "ssh:HOST:DIRECTORY". Each result is sent
+                                   back to this machine. Listening workers
+                                   need the secret in ERIS_WORKER_SECRET.
+  --concurrency=COUNT              The number of command line tools each worker
+                                   can run at once. Defaults to 1.
+  --pipe-results=SIZE              Results smaller than SIZE kilobytes are
+                                   sent back from the workers compressed,
+                                   rather than read back from the cache.
+                                   Defaults to 0.
   -e "COMMAND", --editor="COMMAND" The command used to start the editor, in
                                    the *edit command. It may contain options.
   -t THEME, --theme=THEME          The pygment theme used for syntax
                                    highlighting. Defaults to "native".
   -c TYPE, --compression=TYPE      The type of compression used in the cache:
                                    gzip, lzma, bz2, or none. Defaults to gzip.
+  -F PATHS, --focus=PATHS          Only run tools on some of the files. A
+                                   comma separated list of path prefixes,
+                                   globs, or "git:REV" for the files changed
+                                   since the git revision REV.
+  -p FRACTION, --pause=FRACTION    The fraction of workers paused while keys
+                                   are pressed, to keep the interface
+                                   responsive. Defaults to 0.5.
+  -D SECONDS, --debounce=SECONDS   Wait until a changed file hasn't changed
+                                   for this long before running its tools
+                                   again. Defaults to 0.
 """
 
 
@@ -81,63 +113,186 @@ KEYS_DOC = """Keys:
   *n - Move to the next issue.
   *N - Move to the next issue of the current tool.
   *s - Sort files by type, or by directory location. (toggle)
+  *d - Show files in a directory tree, with status counts. (toggle)
+  enter - Expand or collapse the selected directory of the tree.
   *r - Refresh the currently selected report.
   *R - Refresh all reports of the current tool.
   *f - Resize the focused pane to the full screen. (toggle)
   *x - Open the current file with xdg-open.
+  *F - Only run tools on the files given by --focus, or else on the files in
+       the current file's directory. (toggle)
 """
 
 
+_TOOLS = []
+_TOOL_IDS = {}
+_TOOL_ID_ROWS = {}
+_COMPRESSIONS = [None, "gzip", "lzma", "bz2", "none"]
+_TOOLS_FOR_PATHS_KEY = " tools for paths"  # Saved with the fingerprints.
+
+
+def _tool_id(tool):
+    try:
+        return _TOOL_IDS[tool]
+    except KeyError:
+        _TOOLS.append(tool)
+        return _TOOL_IDS.setdefault(tool, len(_TOOLS) - 1)
+
+
+def _tool_ids(tools_):
+    """Tool ids as bytes, shared between all entries using the same tools."""
+    tool_ids = bytes(_tool_id(tool) for tool in tools_)
+    return _TOOL_ID_ROWS.setdefault(tool_ids, tool_ids)
+
+
 class Entry:
+    """A row of results kept in compact columns.
+
+    The statuses and compressions of the results are byte arrays, and the
+    tools are ids shared between entries. Results are views made on demand.
+    Entries loaded from the summary index keep only their index position
+    until their columns are needed."""
 
     MAX_WIDTH = 0
 
-    def __init__(self, path, results, change_time, highlighted=None,
-                 set_results=True):
-        self.path = path
+    __slots__ = ("path", "directory_key", "type_key", "change_time",
+                 "summary",
+                 "appearance_cache", "_index_row", "_tool_ids",
+                 "_statuses", "_compressions", "_scroll_positions")
+
+    def __init__(self, path, tools_, change_time, statuses=None,
+                 compressions=None):
+        self.path = sys.intern(path)
+        self.directory_key, self.type_key = _sort_keys(self.path)
         self.change_time = change_time
-        self.highlighted = highlighted
-        self.results = results
-        if set_results:
-            # FIX: this is missed for entries appended later
-            for result in results:
-                result.entry = self
-        self.widget = fill3.Row(results)
+        self.summary = None
         self.appearance_cache = None
-        self.last_width = None
+        self._index_row = None
+        self._scroll_positions = None
+        self._set_columns(tools_, statuses, compressions)
+
+    @classmethod
+    def from_index(cls, index, position, path):
+        entry = cls(path, (), index.change_time(position))
+        entry._index_row = index, position
+        return entry
+
+    @classmethod
+    def from_journal(cls, path, change_time, journal_results):
+        entry = cls(path, (), change_time)
+        entry._set_journal_columns(journal_results)
+        return entry
+
+    def _set_columns(self, tools_, statuses=None, compressions=None):
+        self._tool_ids = _tool_ids(tools_)
+        self._statuses = (bytearray([tools.Status.pending]) * len(tools_)
+                          if statuses is None else bytearray(statuses))
+        self._compressions = (bytearray(len(tools_)) if compressions is None
+                              else bytearray(compressions))
+
+    def _set_journal_columns(self, journal_results):
+        tools_, statuses, compressions = [], [], []
+        for tool_name, status, compression in journal_results:
+            with contextlib.suppress(AttributeError):  # The tool was removed.
+                tools_.append(getattr(tools, tool_name))
+                statuses.append(status)
+                compressions.append(_COMPRESSIONS.index(compression))
+        self._set_columns(tools_, statuses, compressions)
+
+    def _materialize(self):
+        if self._index_row is not None:
+            index, position = self._index_row
+            self._set_journal_columns(index.results(position))
+            self._index_row = None
+
+    def tools(self):
+        self._materialize()
+        return [_TOOLS[tool_id] for tool_id in self._tool_ids]
+
+    def statuses(self):
+        if self._index_row is not None:
+            index, position = self._index_row
+            return index.statuses(position)
+        return self._statuses
+
+    def status(self, index):
+        return self._statuses[index]
+
+    def set_status(self, index, status):
+        self._statuses[index] = status
+
+    def compression(self, index):
+        return _COMPRESSIONS[self._compressions[index]]
+
+    def set_compression(self, index, compression):
+        self._compressions[index] = _COMPRESSIONS.index(compression)
+
+    def scroll_position(self, index):
+        if self._scroll_positions is None:
+            return (0, 0)
+        return self._scroll_positions.get(index, (0, 0))
+
+    def set_scroll_position(self, index, position):
+        if self._scroll_positions is None:
+            self._scroll_positions = {}
+        self._scroll_positions[index] = position
+
+    def requirement_statuses(self, tool):
+        """The statuses of the tools required by tool, that apply here."""
+        tools_ = self.tools()
+        return [(requirement,
+                 tools.Status(self._statuses[tools_.index(requirement)]))
+                for requirement in tools.tool_requirements(tool)
+                if requirement in tools_]
 
     def __eq__(self, other):
         return self.path == other.path
 
     def __len__(self):
-        return len(self.results)
+        if self._index_row is not None:
+            index, position = self._index_row
+            return index.row_length(position)
+        return len(self._tool_ids)
 
     def __getitem__(self, index):
-        return self.results[index]
+        self._materialize()
+        index = range(len(self._tool_ids))[index]
+        return tools.Result(self.path, _TOOLS[self._tool_ids[index]], self,
+                            index)
+
+    def __iter__(self):
+        self._materialize()
+        for index, tool_id in enumerate(self._tool_ids):
+            yield tools.Result(self.path, _TOOLS[tool_id], self, index)
+
+    def appearance_line(self, highlighted=None):
+        # The padding is added when drawn, so that a change of the maximum
+        # width doesn't invalidate every row's cache.
+        statuses = self.statuses()
+        key = bytes(statuses), highlighted
+        if self.appearance_cache is None or self.appearance_cache[0] != key:
+            row_appearance = fill3.join("", [
+                tools.status_cursor(status) if index == highlighted
+                else tools.STATUS_TO_TERMSTR[status]
+                for index, status in enumerate(statuses)])
+            self.appearance_cache = key, row_appearance, tools.path_colored(
+                self.path)
+        key, row_appearance, path = self.appearance_cache
+        return (row_appearance + " " * (Entry.MAX_WIDTH - len(statuses) + 1)
+                + path)
 
     def appearance_min(self):
-        if self.appearance_cache is None \
-           or self.last_width != Entry.MAX_WIDTH:
-            self.last_width = Entry.MAX_WIDTH
-            if self.highlighted is not None:
-                self.results[self.highlighted].is_highlighted = True
-            row_appearance = self.widget.appearance_min()
-            path = tools.path_colored(self.path)
-            padding = " " * (self.last_width - len(self.results) + 1)
-            self.appearance_cache = [row_appearance[0] + padding + path]
-        if self.highlighted is not None:
-            self.results[self.highlighted].is_highlighted = False
-        return self.appearance_cache
+        return [self.appearance_line()]
 
     def as_html(self):
         html_parts = []
         styles = set()
-        for result in self.widget:
+        for result in self:
             result_html, result_styles = result.as_html()
             html_parts.append(result_html)
             styles.update(result_styles)
         path = tools.path_colored(self.path)
-        padding = " " * (Entry.MAX_WIDTH - len(self.widget) + 1)
+        padding = " " * (Entry.MAX_WIDTH - len(self) + 1)
         path_html, path_styles = termstr.TermStr(padding + path).as_html()
         return "".join(html_parts) + path_html, styles.union(path_styles)
 
@@ -146,6 +301,39 @@ def is_path_excluded(path):
     return any(part.startswith(".") for part in path.split(os.path.sep))
 
 
+def _focus_path(pattern):
+    path = os.path.normpath(pattern)
+    return path if path == "." else os.path.join(".", path)
+
+
+def _git_changed_paths(root_path, revision):
+    output = subprocess.run(
+        ["git", "diff", "--name-only", revision], cwd=root_path, check=True,
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True).stdout
+    return {os.path.join(".", path) for path in output.splitlines()}
+
+
+class Focus:
+    """The subset of the codebase's files that tools are run on."""
+
+    def __init__(self, patterns, root_path):
+        self.patterns = patterns
+        self._prefixes, self._globs, self._paths = [], [], set()
+        for pattern in patterns:
+            if pattern.startswith("git:"):
+                self._paths.update(_git_changed_paths(root_path, pattern[4:]))
+            elif any(char in pattern for char in "*?["):
+                self._globs.append(_focus_path(pattern))
+            else:
+                self._prefixes.append(_focus_path(pattern))
+
+    def __contains__(self, path):
+        return (path in self._paths or
+                any(path == prefix or path.startswith(prefix + os.path.sep)
+                    for prefix in self._prefixes) or
+                any(fnmatch.fnmatch(path, glob) for glob in self._globs))
+
+
 def codebase_files(path, skip_hidden_directories=True):
     for (dirpath, dirnames, filenames) in os.walk(path):
         if skip_hidden_directories:
@@ -187,6 +375,11 @@ def highlight_str(line, highlight_color, transparency):
     return termstr.TermStr(line).transform_style(blend_style)
 
 
+@functools.lru_cache(maxsize=1)
+def _highlight_cursor_line(line):
+    return highlight_str(line[:-1], termstr.Color.white, 0.8) + line[-1]
+
+
 def in_green(str_):
     return termstr.TermStr(str_, termstr.CharStyle(termstr.Color.lime))
 
@@ -194,57 +387,333 @@ def in_green(str_):
 _UP, _DOWN, _LEFT, _RIGHT = (0, -1), (0, 1), (-1, 0), (1, 0)
 
 
+def _directory_sort_key(path):
+    dirname, _, basename = path.rpartition(os.path.sep)
+    return dirname, tools.splitext(basename)[1], basename
+
+
+def _sort_keys(path):
+    dirname, _, basename = path.rpartition(os.path.sep)
+    dirname, ext = sys.intern(dirname), sys.intern(tools.splitext(basename)[1])
+    return (dirname, ext, basename), (ext, dirname, basename)
+
+
 def directory_sort(entry):
-    path = entry.path
-    return (os.path.dirname(path), tools.splitext(path)[1],
-            os.path.basename(path))
+    return entry.directory_key
 
 
 def type_sort(entry):
-    path = entry.path
-    return (tools.splitext(path)[1], os.path.dirname(path),
-            os.path.basename(path))
+    return entry.type_key
+
+
+def _journal_results(entry):
+    return [(result.tool.__name__, int(result.status), result.compression)
+            for result in entry]
+
+
+_LAST_NAME = chr(sys.maxunicode)
+
+
+class _Directory:
+    """A row of the directory tree, with the status counts of its subtree."""
+
+    __slots__ = ("path", "components", "is_collapsed", "entry_count",
+                 "status_counts", "scroll_position", "appearance_cache")
+
+    tool = None
+    status = None
+
+    def __init__(self, path, components):
+        self.path = path
+        self.components = components
+        self.is_collapsed = True
+        self.entry_count = 0
+        self.status_counts = [0] * (max(tools.Status) + 1)
+        self.scroll_position = (0, 0)
+        self.appearance_cache = None
+
+    def __len__(self):
+        return 1
+
+    def __getitem__(self, index):
+        return self
+
+    def _counts_appearance(self):
+        return fill3.join("", [
+            termstr.TermStr(tools.STATUS_TO_TERMSTR[status]) + f"{count} "
+            for status, count in enumerate(self.status_counts) if count > 0])
+
+    @property
+    def result(self):
+        return fill3.Text(self._counts_appearance())
+
+    def appearance_line(self, highlighted=None):
+        key = tuple(self.status_counts), self.is_collapsed
+        if self.appearance_cache is None or self.appearance_cache[0] != key:
+            marker = termstr.TermStr("▸" if self.is_collapsed else "▾",
+                                     termstr.CharStyle(is_bold=True))
+            self.appearance_cache = key, marker, (
+                tools.path_colored(self.path + os.path.sep) + "  " +
+                self._counts_appearance())
+        key, marker, path = self.appearance_cache
+        return marker + " " * Entry.MAX_WIDTH + path
+
+
+class _DirectoryTree:
+    """The summary's entries under collapsible directory rows.
+
+    The status counts of the directories, the visible rows and the
+    positions of the problems are maintained as entries and results
+    change. The rows of collapsed directories are skipped without being
+    visited."""
+
+    def __init__(self, entries):
+        self._directories = {}
+        self._rows = sortedcontainers.SortedKeyList(key=self._key)
+        self._visible_rows = sortedcontainers.SortedKeyList(key=self._key)
+        self._issues = {}  # None or tool -> problem positions
+        for entry in entries:
+            self.add(entry)
+
+    def _key(self, row):
+        if isinstance(row, _Directory):
+            return row.components, 0
+        dirname, ext, basename = row.directory_key
+        return self._directories[dirname].components, 1, ext, basename
+
+    def _issue_key(self, position):
+        entry, column = position
+        return self._key(entry), column
+
+    def _directory(self, path):
+        try:
+            return self._directories[path]
+        except KeyError:
+            parent_path, _, name = path.rpartition(os.path.sep)
+            components = (() if parent_path == "" else
+                          self._directory(parent_path).components + (name,))
+            directory = self._directories[path] = _Directory(path, components)
+            if components != ():
+                self._rows.add(directory)
+                if self._is_visible(directory):
+                    self._visible_rows.add(directory)
+            return directory
+
+    def _parent(self, row):
+        return self._directories[
+            row.path.rpartition(os.path.sep)[0]
+            if isinstance(row, _Directory) else row.directory_key[0]]
+
+    def _is_visible(self, row):
+        directory = self._parent(row)
+        while directory.components != ():
+            if directory.is_collapsed:
+                return False
+            directory = self._parent(directory)
+        return True
+
+    def _ancestors(self, entry):
+        directory = self._directory(entry.directory_key[0])
+        while directory.components != ():
+            yield directory
+            directory = self._parent(directory)
+
+    def _count(self, entry, change):
+        statuses = entry.statuses()
+        for directory in list(self._ancestors(entry)):
+            directory.entry_count += change
+            for status in set(statuses):
+                directory.status_counts[status] += (
+                    change * statuses.count(status))
+            if directory.entry_count == 0:
+                self._rows.remove(directory)
+                self._visible_rows.discard(directory)
+                del self._directories[directory.path]
+
+    def _index_issue(self, entry, column, tool, is_added=True):
+        for key in [None, tool]:
+            if is_added:
+                if key not in self._issues:
+                    self._issues[key] = sortedcontainers.SortedKeyList(
+                        key=self._issue_key)
+                self._issues[key].add((entry, column))
+            else:
+                self._issues[key].remove((entry, column))
+
+    def _index_issues(self, entry, is_added=True):
+        statuses = entry.statuses()
+        if tools.Status.problem not in statuses:
+            return
+        for column, (tool, status) in enumerate(zip(entry.tools(),
+                                                    statuses)):
+            if status == tools.Status.problem:
+                self._index_issue(entry, column, tool, is_added)
+
+    def add(self, entry):
+        self._count(entry, 1)
+        self._rows.add(entry)
+        if self._is_visible(entry):
+            self._visible_rows.add(entry)
+        self._index_issues(entry)
+
+    def remove(self, entry):
+        self._index_issues(entry, is_added=False)
+        self._rows.remove(entry)
+        self._visible_rows.discard(entry)
+        self._count(entry, -1)
+
+    def on_status_changed(self, entry, column, tool, old_status, new_status):
+        for directory in self._ancestors(entry):
+            directory.status_counts[old_status] -= 1
+            directory.status_counts[new_status] += 1
+        if old_status == tools.Status.problem:
+            self._index_issue(entry, column, tool, is_added=False)
+        if new_status == tools.Status.problem:
+            self._index_issue(entry, column, tool)
+
+    def toggle_collapsed(self, directory):
+        directory.is_collapsed = not directory.is_collapsed
+        if not self._is_visible(directory):
+            return
+        start_key = directory.components, 0
+        end_key = (directory.components + (_LAST_NAME,),)
+        if directory.is_collapsed:
+            del self._visible_rows[
+                self._visible_rows.bisect_key_right(start_key):
+                self._visible_rows.bisect_key_left(end_key)]
+            return
+        index = self._rows.bisect_key_right(start_key)
+        end_index = self._rows.bisect_key_left(end_key)
+        while index < end_index:
+            row = self._rows[index]
+            self._visible_rows.add(row)
+            if isinstance(row, _Directory) and row.is_collapsed:
+                index = self._rows.bisect_key_left(
+                    (row.components + (_LAST_NAME,),))
+            else:
+                index += 1
+
+    def visible_rows(self):
+        return self._visible_rows
+
+    def visible_row(self, entry):
+        """The row of the entry, or of its outermost collapsed directory."""
+        for directory in reversed(list(self._ancestors(entry))):
+            if directory.is_collapsed:
+                return directory
+        return entry
+
+    def next_issue(self, row, column, tool=None):
+        """The next visible problem after a column of a row, or None.
+
+        Returns (row, column). Without a tool, collapsed directories with
+        problems are issues too."""
+        issues = self._issues.get(tool)
+        if not issues:
+            return None
+        if not isinstance(row, _Directory):
+            start = issues.bisect_key_right((self._key(row), column))
+        elif row.is_collapsed:
+            start = issues.bisect_key_left(
+                ((row.components + (_LAST_NAME,),),))
+        else:
+            start = issues.bisect_key_left(((row.components, 1),))
+        for index, end_index in [(start, len(issues)), (0, start)]:
+            while index < end_index:
+                entry, column = issues[index]
+                row = self.visible_row(entry)
+                if row is entry:
+                    return entry, column
+                if tool is None:
+                    return row, 0
+                index = issues.bisect_key_left(
+                    ((row.components + (_LAST_NAME,),),))
+        return None
+
+    def first_entry(self, directory):
+        index = self._rows.index(directory) + 1
+        while index < len(self._rows):
+            row = self._rows[index]
+            if not isinstance(row, _Directory):
+                row_directory = row.directory_key[0] + os.path.sep
+                is_descendant = row_directory.startswith(
+                    directory.path + os.path.sep)
+                return row if is_descendant else None
+            index += 1
+        return None
+
+
+def _memory_budget():  # Half of the physical memory, in megabytes.
+    return (os.sysconf("SC_PHYS_PAGES") * os.sysconf("SC_PAGE_SIZE") //
+            2 ** 20 // 2)
 
 
 class Summary:
 
+    _INDEXED_STATUSES = {tools.Status.problem, tools.Status.running}
+
     def __init__(self, root_path, jobs_added_event):
         self._root_path = root_path
         self._jobs_added_event = jobs_added_event
         self._view_widget = fill3.View.from_widget(self)
         self.is_directory_sort = True
-        self._old_entries = []
+        self.is_tree_view = False
+        self.focus = None
+        self.workers = []
+        self.job_slots = 0  # No limit on the cpu weight of running tools.
+        self.memory_budget = _memory_budget()
+        self.debounce_time = 0
+        self._debounce_handles = {}
+        self._cursor_path = None
         self.__cursor_position = (0, 0)
         self.reset()
 
     def reset(self):
         Entry.MAX_WIDTH = 0
         self._max_path_length = 0
+        self._row_widths = collections.Counter()
+        self._path_lengths = collections.Counter()
         self.result_total = 0
         self.completed_total = 0
         self.is_loaded = False
         self.closest_placeholder_generator = None
-        sort_func = directory_sort if self.is_directory_sort else type_sort
-        self._entries = sortedcontainers.SortedList([], key=sort_func)
+        self._directory_entries = sortedcontainers.SortedList(
+            [], key=directory_sort)
+        self._type_entries = sortedcontainers.SortedList([], key=type_sort)
+        self._entries = (self._directory_entries if self.is_directory_sort
+                         else self._type_entries)
+        self._status_positions = {}
+        self._running_classes = collections.Counter()
+        self._is_resource_limited = False
+        self._import_graph = None
+        self._importer_results = collections.deque()
+        self._coverage_index = coverage_index.CoverageIndex(
+            tools.COVERAGE_INDEX_PATH)
+        self._tool_fingerprints = None  # Saved with the journal.
+        self._tree = None
+        self._journal = journal.Journal(
+            os.path.join(tools.CACHE_PATH, "summary_journal"),
+            _directory_sort_key)
 
     def __getstate__(self):
         state = self.__dict__.copy()
         state["closest_placeholder_generator"] = None
         state["_jobs_added_event"] = None
-        summary_path = os.path.join(tools.CACHE_PATH, "summary_dir")
-        open_compressed = functools.partial(gzip.open, compresslevel=1)
-        x, y = self.cursor_position()
-        if y == 0:
-            entries = []
-        else:
-            entries = itertools.chain(
-                [self._entries[y]], itertools.islice(self._entries, y),
-                itertools.islice(self._entries, y+1, None))
-        state["_old_entries"] = paged_list.PagedList(
-            entries, summary_path, 2000, 1, exist_ok=True,
-            open_func=open_compressed)
+        state["_journal"] = None
         state["_entries"] = None
-        state["__cursor_position"] = (x, 0)
+        state["_directory_entries"] = None
+        state["_type_entries"] = None
+        state["_status_positions"] = None
+        state["_running_classes"] = None
+        state["_import_graph"] = None
+        state["_importer_results"] = None
+        state["_coverage_index"] = None
+        state["_tool_fingerprints"] = None
+        state["_tree"] = None
+        state["workers"] = []
+        state["_debounce_handles"] = {}
+        with contextlib.suppress(IndexError):
+            state["_cursor_path"] = self.get_selection().path
         return state
 
     def __setstate__(self, state):
@@ -262,26 +731,126 @@ class Summary:
             self.closest_placeholder_generator = None
 
     def sort_entries(self):
-        key_func = directory_sort if self.is_directory_sort else type_sort
-        self._entries = sortedcontainers.SortedList(
-            self._entries, key=key_func)
+        self._entries = (self._directory_entries if self.is_directory_sort
+                         else self._type_entries)
+        self._status_positions = {
+            key: self._new_positions(positions)
+            for key, positions in self._status_positions.items()}
         self.closest_placeholder_generator = None
 
+    def _new_positions(self, positions=()):
+        sort_func = directory_sort if self.is_directory_sort else type_sort
+        return sortedcontainers.SortedKeyList(
+            positions, key=lambda position: (sort_func(position[0]),
+                                             position[1]))
+
+    def _index_result(self, entry, column, tool, status, is_added=True):
+        for key in [status, (tool, status)]:
+            if is_added:
+                if key not in self._status_positions:
+                    self._status_positions[key] = self._new_positions()
+                self._status_positions[key].add((entry, column))
+            else:
+                self._status_positions[key].remove((entry, column))
+        if status == tools.Status.running:
+            self._running_classes[tools.resource_class(tool)] += (
+                1 if is_added else -1)
+
+    def _has_resources(self, tool, freed_results=()):
+        # Heavy tools are limited by their resource class, while light tools
+        # fill the remaining job slots.
+        resource_class = tools.resource_class(tool)
+        running = self._running_classes
+        if freed_results:
+            running = running - collections.Counter(
+                tools.resource_class(result.tool) for result in freed_results)
+        if (resource_class.max_instances is not None and
+                running[resource_class] >= resource_class.max_instances):
+            return False
+        if not any(running.values()):
+            return True
+        memory = sum(class_.memory * count
+                     for class_, count in running.items())
+        cpu_weight = sum(class_.cpu_weight * count
+                         for class_, count in running.items())
+        return (memory + resource_class.memory <= self.memory_budget and
+                (self.job_slots == 0 or
+                 cpu_weight + resource_class.cpu_weight <= self.job_slots))
+
+    def _is_waiting_for_requirements(self, result):
+        return any(status in [tools.Status.pending, tools.Status.running]
+                   for requirement, status
+                   in result.entry.requirement_statuses(result.tool))
+
+    def _is_runnable(self, result, freed_results=()):
+        return (result.entry.summary is self and
+                result.status == tools.Status.pending and
+                self.is_focused(result.path) and
+                result.path not in self._debounce_handles and
+                not self._is_waiting_for_requirements(result) and
+                self._has_resources(result.tool, freed_results))
+
+    def would_run_next(self, result, freed_results=()):
+        """Whether the result runs next, once the freed results stop."""
+        return (self._is_runnable(result, freed_results) and
+                not any(self._is_runnable(importer_result, freed_results)
+                        for importer_result in self._importer_results
+                        if importer_result is not result))
+
+    def _index_statuses(self, entry, is_added=True):
+        statuses = entry.statuses()
+        if not any(status in statuses for status in self._INDEXED_STATUSES):
+            return
+        for column, (tool, status) in enumerate(zip(entry.tools(),
+                                                    entry.statuses())):
+            if status in self._INDEXED_STATUSES:
+                self._index_result(entry, column, tool, status, is_added)
+
+    def _add_to_totals(self, entry):
+        statuses = entry.statuses()
+        self.result_total += len(statuses)
+        self.completed_total += (len(statuses) -
+                                 statuses.count(tools.Status.pending) -
+                                 statuses.count(tools.Status.running))
+        self._count_widths([len(statuses)], [len(entry.path) - len("./")])
+
+    def _count_widths(self, row_widths, path_lengths):
+        self._row_widths.update(row_widths)
+        self._path_lengths.update(path_lengths)
+        Entry.MAX_WIDTH = max(row_widths + [Entry.MAX_WIDTH])
+        self._max_path_length = max(path_lengths + [self._max_path_length])
+
+    def _discount_widths(self, row_width, path_length):
+        for counts, width in [(self._row_widths, row_width),
+                              (self._path_lengths, path_length)]:
+            counts[width] -= 1
+            if counts[width] == 0:
+                del counts[width]
+        if row_width == Entry.MAX_WIDTH:
+            Entry.MAX_WIDTH = max(self._row_widths, default=0)
+        if path_length == self._max_path_length:
+            self._max_path_length = max(self._path_lengths, default=0)
+
     def add_entry(self, entry):
         if entry in self._entries:
             return
-        for result in entry:
-            self.result_total += 1
-            if result.is_completed:
-                self.completed_total += 1
-        Entry.MAX_WIDTH = max(len(entry), Entry.MAX_WIDTH)
-        self._max_path_length = max(len(entry.path) - len("./"),
-                                    self._max_path_length)
-        self._entries.add(entry)
-        entry_index = self._entries.index(entry)
-        x, y = self._cursor_position
-        if entry_index <= y:
-            self.scroll(0, -1)
+        entry.summary = self
+        self._journal.add_entry(entry.path, entry.change_time,
+                                _journal_results(entry))
+        self._add_to_totals(entry)
+        self._index_statuses(entry)
+        with self._keep_tree_selection():
+            self._directory_entries.add(entry)
+            self._type_entries.add(entry)
+            if self._tree is not None:
+                self._tree.add(entry)
+        if entry.path.endswith(".py") and self._import_graph is not None:
+            self._import_graph.update(entry.path)
+        if not self.is_tree_view:
+            entry_index = self._entries.index(entry)
+            x, y = self._cursor_position
+            if entry_index <= y:
+                self.scroll(0, -1)
         self._jobs_added_event.set()
         self.closest_placeholder_generator = None
 
@@ -291,95 +860,304 @@ class Summary:
             change_time = os.stat(full_path).st_ctime
         except OSError:
             return
-        row = [tools.Result(path, tool) for tool in tools.tools_for_path(path)]
-        entry = Entry(path, row, change_time)
-        self.add_entry(entry)
+        self.add_entry(Entry(path, tools.tools_for_path(path), change_time))
 
     def on_file_deleted(self, path):
         if os.path.exists(os.path.join(self._root_path, path)):
             return
-        entry = Entry(path, [], None)
+        entry = Entry(path, (), None)
         try:
             index = self._entries.index(entry)
         except ValueError:
             return
+        self._remove_entry(index)
+
+    def _remove_entry(self, index, kept_tools=()):
+        path = self._entries[index].path
         x, y = self._cursor_position
-        if index < y:
+        if index < y and not self.is_tree_view:
             self.scroll(0, 1)
         for result in self._entries[index]:
             if result.is_completed:
                 self.completed_total -= 1
             self.result_total -= 1
-            result.delete()
+            if result.tool not in kept_tools:
+                result.delete()
         row = self._entries[index]
-        self._entries.pop(index)
-        if len(row) == Entry.MAX_WIDTH:
-            Entry.MAX_WIDTH = max((len(entry) for entry in self._entries),
-                                  default=0)
-        if (len(path) - 2) == self._max_path_length:
-            self._max_path_length = max(((len(entry.path) - 2)
-                                         for entry in self._entries), default=0)
+        self._index_statuses(row, is_added=False)
+        row.summary = None
+        with self._keep_tree_selection():
+            self._entries.pop(index)
+            other_entries = (self._type_entries if self.is_directory_sort
+                             else self._directory_entries)
+            other_entries.remove(row)
+            if self._tree is not None:
+                self._tree.remove(row)
+        if path.endswith(".py") and self._import_graph is not None:
+            self._import_graph.remove(path)
+        self._journal.delete_entry(path)
+        self._discount_widths(len(row), len(path) - len("./"))
         x, y = self._cursor_position
-        if y == len(self._entries):
+        if y == len(self._rows()):
             self._cursor_position = x, y - 1
         self.closest_placeholder_generator = None
 
     def on_file_modified(self, path):
-        entry = Entry(path, [], None)
+        entry = Entry(path, (), None)
         try:
             entry_index = self._entries.index(entry)
         except ValueError:
             return
         entry = self._entries[entry_index]
+        if tools.Status.running in entry.statuses():
+            self._cancel_running_jobs(entry)
+        if self.debounce_time > 0:
+            self._debounce(path)
         for result in entry:
             self.refresh_result(result, only_completed=False)
+        if path.endswith(".py"):
+            self._refresh_importers(path)
         self.closest_placeholder_generator = None
         return entry
 
+    def _refresh_importers(self, path):
+        # The tests of files importing a changed module are stale too. They
+        # run before other pending results, the nearest importers first.
+        # But test files with recorded coverage only run again if they ran
+        # the changed file, and then first.
+        if self._import_graph is None:
+            imports.load_cache(tools.IMPORTS_CACHE_PATH)
+            self._import_graph = imports.ImportGraph(
+                [entry.path for entry in self._entries
+                 if entry.path.endswith(".py")])
+        else:
+            self._import_graph.update(path)
+        importers = self._import_graph.importers(path)
+        importer_paths = {importer for importer, distance in importers}
+        recorded_tests, covering_tests = \
+            self._coverage_index.tests_covering(path)
+        dependents = [test_path for test_path in sorted(covering_tests)
+                      if test_path != path]
+        dependents.extend(importer for importer, distance in importers
+                          if importer not in covering_tests)
+        for dependent in dependents:
+            with contextlib.suppress(ValueError):
+                entry = self._entries[
+                    self._entries.index(Entry(dependent, (), None))]
+                for result in entry:
+                    if (tools.records_coverage(result.tool) and
+                            dependent in recorded_tests):
+                        is_stale = dependent in covering_tests
+                    else:
+                        is_stale = (tools.uses_imports(result.tool) and
+                                    dependent in importer_paths)
+                    if is_stale:
+                        self.refresh_result(result)
+                        self._importer_results.append(result)
+
+    def _cancel_running_jobs(self, entry):
+        # Cancelling a worker leaves all its queued jobs pending.
+        for worker_ in self.workers:
+            if any(result.entry is entry for result in worker_.results):
+                worker_.cancel()
+
+    def _debounce(self, path):
+        # Wait until the file stops changing before running its tools again.
+        if path in self._debounce_handles:
+            self._debounce_handles[path].cancel()
+        self._debounce_handles[path] = asyncio.get_event_loop().call_later(
+            self.debounce_time, self._end_debounce, path)
+
+    def _end_debounce(self, path):
+        del self._debounce_handles[path]
+        self.closest_placeholder_generator = None
+        self._jobs_added_event.set()
+
     @contextlib.contextmanager
     def keep_selection(self):
+        x, y = self._cursor_position
         try:
-            cursor_path = self.get_selection().path
-        except AttributeError:
+            row = self._rows()[y]
+        except IndexError:
             yield
             return
-        x, y = self._cursor_position
         yield
-        for index, row in enumerate(self._entries):
-            if row.path == cursor_path:
-                self._cursor_position = (x, index)
-                return
-        if y >= len(self._entries):
-            self._cursor_position = (x, len(self._entries) - 1)
+        with contextlib.suppress(ValueError):
+            self._cursor_position = x, self._rows().index(row)
+            return
+        if y >= len(self._rows()):
+            self._cursor_position = x, len(self._rows()) - 1
+
+    def _keep_tree_selection(self):
+        # The list view moves the cursor itself, keeping the scroll position.
+        return (self.keep_selection() if self.is_tree_view
+                else contextlib.nullcontext())
+
+    def on_status_changed(self, result, old_status):
+        if old_status in self._INDEXED_STATUSES:
+            self._index_result(result.entry, result.index, result.tool,
+                               old_status, is_added=False)
+        if (old_status == tools.Status.running and
+                tools.records_coverage(result.tool)):
+            self._coverage_index.update(result.path)
+        if (old_status == tools.Status.running and
+                self._is_resource_limited):  # Reschedule the skipped results.
+            self._is_resource_limited = False
+            self.closest_placeholder_generator = None
+            self._jobs_added_event.set()
+        if result.status in self._INDEXED_STATUSES:
+            self._index_result(result.entry, result.index, result.tool,
+                               result.status)
+        if self._tree is not None and result.status != old_status:
+            self._tree.on_status_changed(result.entry, result.index,
+                                         result.tool, old_status,
+                                         result.status)
+        if result.status != tools.Status.running:
+            self._journal.set_status(result.path, result.tool.__name__,
+                                     int(result.status), result.compression)
+
+    def _load_index(self, index, overlay):
+        replaced_positions = set()
+        for path in overlay:
+            with contextlib.suppress(KeyError):
+                replaced_positions.add(index.find(path))
+        entries = {position: Entry.from_index(index, position, path)
+                   for position, path in enumerate(index.paths())
+                   if position not in replaced_positions}
+        for position in (index.positions_with_statuses(
+                self._INDEXED_STATUSES) - replaced_positions):
+            self._index_statuses(entries[position])
+        incomplete_statuses = [tools.Status.pending, tools.Status.running]
+        result_total = index.result_count
+        incomplete_total = index.count_statuses(incomplete_statuses)
+        row_lengths = index.row_lengths()
+        for position in replaced_positions:
+            statuses = index.statuses(position)
+            result_total -= len(statuses)
+            incomplete_total -= sum(statuses.count(status)
+                                    for status in incomplete_statuses)
+        self.result_total += result_total
+        self.completed_total += result_total - incomplete_total
+        self._count_widths(
+            [row_lengths[position] for position in entries],
+            [len(entry.path) - len("./") for entry in entries.values()])
+        return list(entries.values())
+
+    def load_entries(self):
+        index, overlay = self._journal.load()
+        entries = [] if index is None else self._load_index(index, overlay)
+        for entry in entries:
+            entry.summary = self
+        for path, journal_entry in overlay.items():
+            if journal_entry is not None:
+                change_time, results = journal_entry
+                entry = Entry.from_journal(path, change_time, results)
+                entry.summary = self
+                self._add_to_totals(entry)
+                self._index_statuses(entry)
+                entries.append(entry)
+        self._directory_entries.update(entries)
+        self._type_entries.update(entries)
+        if self._cursor_path is not None:
+            with contextlib.suppress(ValueError):
+                x, y = self._cursor_position
+                self._cursor_position = (x, self._row_index(
+                    Entry(self._cursor_path, (), None)))
+        self.closest_placeholder_generator = None
+
+    def save(self):
+        self._journal.flush()
+        if self._tool_fingerprints is not None:
+            tools.dump_pickle_safe(self._tool_fingerprints,
+                                   tools.TOOL_FINGERPRINTS_PATH)
+            self._tool_fingerprints = None
+        if self._import_graph is not None:
+            imports.save_cache(tools.IMPORTS_CACHE_PATH)
 
     async def sync_with_filesystem(self, appearance_changed_event, log=None):
         start_time = time.time()
-        cache = {}
         log.log_message("Started loading summary…")
-        for index, entry in enumerate(self._old_entries):
-            if index != 0 and index % 5000 == 0:
-                log.log_message(f"Loaded {index} files…")
-            await asyncio.sleep(0)
-            self.add_entry(entry)
-            if index % 1000 == 0:
-                appearance_changed_event.set()
-            cache[entry.path] = entry.change_time
+        self.load_entries()
+        appearance_changed_event.set()
         duration = time.time() - start_time
         log.log_message(f"Finished loading summary. {round(duration, 2)} secs")
+        self.refresh_changed_tools(log)
         self.is_loaded = True
+        await self.sync_files(appearance_changed_event, log)
+
+    def refresh_changed_tools(self, log=None):
+        # Only results of tools that changed since they were calculated are
+        # stale, i.e. after an upgrade of eris or of a tool's executable.
+        try:
+            with open(tools.TOOL_FINGERPRINTS_PATH, "rb") as file_:
+                old_fingerprints = pickle.load(file_)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            old_fingerprints = {}
+        fingerprints = {tool.__name__: tools.tool_fingerprint(tool)
+                        for tool in tools.tools_all()}
+        changed_tools = {name for name, fingerprint in fingerprints.items()
+                         if old_fingerprints.get(name) != fingerprint}
+        fingerprints[_TOOLS_FOR_PATHS_KEY] = \
+            tools.tools_for_paths_fingerprint()
+        if (old_fingerprints.get(_TOOLS_FOR_PATHS_KEY) !=
+                fingerprints[_TOOLS_FOR_PATHS_KEY]):
+            self._update_entry_tools(log)
+        if changed_tools and len(self._entries) > 0:
+            for entry in self._entries:
+                for result in entry:
+                    if result.tool.__name__ in changed_tools:
+                        self.refresh_result(result)
+            if log is not None:
+                log.log_message("Recalculating the results of changed tools: "
+                                + ", ".join(sorted(changed_tools)))
+        if fingerprints != old_fingerprints:
+            self._tool_fingerprints = fingerprints
+
+    def _update_entry_tools(self, log=None):
+        # Entries whose tools are no longer the ones for their paths, e.g.
+        # after a tool is installed, are added again with the new tools.
+        # The results of the tools they still have are kept.
+        changed_entries = []
+        for entry in self._entries:
+            tools_ = tools.tools_for_path(entry.path)
+            if entry.tools() != tools_:
+                changed_entries.append((entry, tools_))
+        for entry, tools_ in changed_entries:
+            columns = {result.tool: (result.status, result.compression)
+                       for result in entry if result.tool in tools_ and
+                       result.status != tools.Status.running}
+            statuses, compressions = [], []
+            for tool in tools_:
+                status, compression = columns.get(
+                    tool, (tools.Status.pending, None))
+                statuses.append(status)
+                compressions.append(_COMPRESSIONS.index(compression))
+            self._remove_entry(self._entries.index(entry),
+                               kept_tools=columns.keys())
+            self.add_entry(Entry(entry.path, tools_, entry.change_time,
+                                 statuses, compressions))
+        if changed_entries and log is not None:
+            log.log_message(f"Changed the tools of {len(changed_entries)} "
+                            "files.")
+
+    async def sync_files(self, appearance_changed_event, log):
         log.log_message("Started sync with filesystem…")
         start_time = time.time()
+        cache = {entry.path: entry.change_time for entry in self._entries}
         all_paths = set()
         for path in fix_paths(self._root_path, codebase_files(self._root_path)):
             await asyncio.sleep(0)
             all_paths.add(path)
             if path in cache:
+                if not self.is_focused(path):
+                    continue  # Modifications are found when unfocused.
                 full_path = os.path.join(self._root_path, path)
                 change_time = os.stat(full_path).st_ctime
                 if change_time != cache[path]:
                     cache[path] = change_time
                     entry = self.on_file_modified(path)
                     entry.change_time = change_time
+                    self._journal.set_change_time(path, change_time)
             else:
                 self.on_file_added(path)
             appearance_changed_event.set()
@@ -389,31 +1167,67 @@ class Summary:
         duration = time.time() - start_time
         log.log_message(f"Finished sync with filesystem. {round(duration, 2)} secs")
 
-    def _sweep_up(self, x, y):
-        yield from reversed(self._entries[y][:x])
-        while True:
-            y = (y - 1) % len(self._entries)
-            yield from reversed(self._entries[y])
+    def is_focused(self, path):
+        return self.focus is None or path in self.focus
 
-    def _sweep_down(self, x, y):
-        yield from self._entries[y][x:]
-        while True:
-            y = (y + 1) % len(self._entries)
-            yield from self._entries[y]
+    def set_focus(self, focus):
+        self.focus = focus
+        self.closest_placeholder_generator = None
+        self._jobs_added_event.set()
 
-    def _sweep_combined(self, x, y):
-        for up_result, down_result in zip(self._sweep_up(x, y),
-                                          self._sweep_down(x, y)):
-            yield down_result
-            yield up_result
+    def _sweep_rows(self, y):
+        row_count = len(self._entries)
+        yield y
+        for index in range(1, row_count):  # Alternately down and up.
+            offset = (index + 1) // 2
+            yield (y + (offset if index % 2 == 1 else -offset)) % row_count
 
-    def _placeholder_sweep(self):
+    def _entries_cursor_position(self):
         x, y = self.cursor_position()
-        for index, result in enumerate(self._sweep_combined(x, y)):
-            if index > self.result_total:
-                break
-            if result.status == tools.Status.pending:
+        if not self.is_tree_view:
+            return x, y
+        try:
+            row = self._rows()[y]
+        except IndexError:
+            return 0, 0
+        if isinstance(row, _Directory):
+            x, row = 0, self._tree.first_entry(row)
+        return x, (0 if row is None else self._entries.index(row))
+
+    def _placeholder_sweep(self):
+        # Importer results that can't run yet are queued again.
+        for index in range(len(self._importer_results)):
+            result = self._importer_results.popleft()
+            if (result.entry.summary is not self or
+                    result.status != tools.Status.pending or
+                    not self.is_focused(result.path)):
+                continue
+            if (self._is_waiting_for_requirements(result) or
+                    not self._has_resources(result.tool)):
+                self._importer_results.append(result)
+                self._is_resource_limited = True
+            else:
                 yield result
+        x, y = self._entries_cursor_position()
+        for row_index in self._sweep_rows(y):
+            entry = self._entries[row_index]
+            if (tools.Status.pending not in entry.statuses() or
+                    not self.is_focused(entry.path) or
+                    entry.path in self._debounce_handles):
+                continue
+            columns = (itertools.chain(range(x, len(entry)),
+                                       reversed(range(x)))
+                       if row_index == y else range(len(entry)))
+            for column in columns:
+                result = entry[column]
+                if result.status == tools.Status.pending:
+                    # Results waiting for resources or required tools are
+                    # rescheduled when a running job ends.
+                    if (self._is_waiting_for_requirements(result) or
+                            not self._has_resources(result.tool)):
+                        self._is_resource_limited = True
+                    else:
+                        yield result
 
     async def get_closest_placeholder(self):
         if self.closest_placeholder_generator is None:
@@ -423,18 +1237,47 @@ class Summary:
         except StopIteration:
             raise StopAsyncIteration
 
+    def _rows(self):
+        if not self.is_tree_view:
+            return self._entries
+        if self._tree is None:
+            self._tree = _DirectoryTree(self._entries)
+        return self._tree.visible_rows()
+
+    def _row_index(self, entry):
+        if not self.is_tree_view:
+            return self._entries.index(entry)
+        return self._rows().index(self._tree.visible_row(entry))
+
+    def toggle_tree_view(self):
+        x, y = self.cursor_position()
+        try:
+            row = self._rows()[y]
+        except IndexError:
+            row = None
+        self.is_tree_view = not self.is_tree_view
+        if isinstance(row, _Directory):
+            x, row = 0, self._tree.first_entry(row)
+        if row is not None:
+            self._cursor_position = x, self._row_index(row)
+        self.closest_placeholder_generator = None
+
+    def toggle_directory(self):
+        x, y = self.cursor_position()
+        with contextlib.suppress(IndexError):
+            row = self._rows()[y]
+            if isinstance(row, _Directory):
+                self._tree.toggle_collapsed(row)
+
     def appearance_dimensions(self):
-        return self._max_path_length + 1 + Entry.MAX_WIDTH, len(self._entries)
+        return self._max_path_length + 1 + Entry.MAX_WIDTH, len(self._rows())
 
     def appearance_interval(self, interval):
         start_y, end_y = interval
         x, y = self.cursor_position()
-        self._entries[y].highlighted = x
-        self._entries[y].appearance_cache = None
-        appearance = fill3.Column(self._entries).appearance_interval(interval)
-        self._entries[y].highlighted = None
-        self._entries[y].appearance_cache = None
-        return appearance
+        return [entry.appearance_line(x if row_index == y else None)
+                for row_index, entry in enumerate(
+                        self._rows()[start_y:end_y], start_y)]
 
     def _set_scroll_position(self, cursor_x, cursor_y, summary_height):
         scroll_x, scroll_y = new_scroll_x, new_scroll_y = \
@@ -448,14 +1291,13 @@ class Summary:
     def _highlight_cursor_row(self, appearance, cursor_y):
         scroll_x, scroll_y = self._view_widget.position
         highlighted_y = cursor_y - scroll_y
-        appearance[highlighted_y] = (highlight_str(
-            appearance[highlighted_y][:-1], termstr.Color.white, 0.8)
-                                     + appearance[highlighted_y][-1])
+        appearance[highlighted_y] = _highlight_cursor_line(
+            appearance[highlighted_y])
         return appearance
 
     def appearance(self, dimensions):
         width, height = dimensions
-        if len(self._entries) == 0:
+        if len(self._rows()) == 0:
             return [" " * width for row in range(height)]
         cursor_x, cursor_y = self.cursor_position()
         width, height = width - 1, height - 1  # Minus one for the scrollbars
@@ -472,22 +1314,38 @@ class Summary:
     def cursor_position(self):
         x, y = self._cursor_position
         try:
-            return min(x, len(self._entries[y])-1), y
+            return min(x, len(self._rows()[y])-1), y
         except IndexError:
             return 0, 0
 
     def get_selection(self):
         x, y = self.cursor_position()
-        return self._entries[y][x]
+        return self._rows()[y][x]
+
+    def is_visible(self, entry):
+        try:
+            row_index = self._row_index(entry)
+        except ValueError:
+            return False
+        scroll_x, scroll_y = self._view_widget.position
+        view_width, view_height = self._view_widget.portal.last_dimensions
+        return scroll_y <= row_index < scroll_y + view_height
+
+    def distance_from_cursor(self, result):
+        try:
+            row_index = self._entries.index(result.entry)
+        except ValueError:
+            return math.inf
+        return abs(row_index - self._entries_cursor_position()[1])
 
     def _move_cursor(self, vector):
         dx, dy = vector
         if dy == 0:
             x, y = self.cursor_position()
-            self._cursor_position = ((x + dx) % len(self._entries[y]), y)
+            self._cursor_position = ((x + dx) % len(self._rows()[y]), y)
         elif dx == 0:
             x, y = self._cursor_position
-            self._cursor_position = (x, (y + dy) % len(self._entries))
+            self._cursor_position = (x, (y + dy) % len(self._rows()))
         else:
             raise ValueError
 
@@ -517,29 +1375,44 @@ class Summary:
 
     def cursor_end(self):
         x, y = self._cursor_position
-        self._cursor_position = x, len(self._entries) - 1
+        self._cursor_position = x, len(self._rows()) - 1
 
-    def _issue_generator(self):
+    def _next_position(self, key):
+        positions = self._status_positions.get(key)
+        if not positions:
+            return None
+        x, y = self.cursor_position()
+        index = positions.bisect_key_right(positions.key((self._entries[y],
+                                                          x)))
+        entry, column = positions[index % len(positions)]
+        return column, self._entries.index(entry)
+
+    def _next_visible_issue(self, tool=None):
+        rows = self._rows()
+        if len(rows) == 0:
+            return None
         x, y = self.cursor_position()
-        for index in range(len(self._entries) + 1):
-            row_index = (index + y) % len(self._entries)
-            row = self._entries[row_index]
-            for index_x, result in enumerate(row):
-                if (result.status == tools.Status.problem and
-                    not (row_index == y and index_x <= x and
-                         index != len(self._entries))):
-                    yield result, (index_x, row_index)
+        issue = self._tree.next_issue(rows[y], x, tool)
+        if issue is None:
+            return None
+        row, column = issue
+        return column, rows.index(row)
 
     def move_to_next_issue(self):
-        with contextlib.suppress(StopIteration):
-            issue, self._cursor_position = self._issue_generator().send(None)
+        position = (self._next_visible_issue() if self.is_tree_view
+                    else self._next_position(tools.Status.problem))
+        if position is not None:
+            self._cursor_position = position
 
     def move_to_next_issue_of_tool(self):
         current_tool = self.get_selection().tool
-        for issue, position in self._issue_generator():
-            if issue.tool == current_tool:
-                self._cursor_position = position
-                return
+        if current_tool is None:
+            return
+        position = (self._next_visible_issue(current_tool)
+                    if self.is_tree_view else
+                    self._next_position((current_tool, tools.Status.problem)))
+        if position is not None:
+            self._cursor_position = position
 
     def refresh_result(self, result, only_completed=True):
         if result.is_completed or not only_completed:
@@ -557,10 +1430,9 @@ class Summary:
                     self.refresh_result(result)
 
     def clear_running(self):
-        for row in self._entries:
-            for result in row:
-                if result.status == tools.Status.running:
-                    self.refresh_result(result)
+        for entry, column in list(self._status_positions.get(
+                tools.Status.running, [])):
+            self.refresh_result(entry[column])
 
     def as_html(self):
         html_parts = []
@@ -693,13 +1565,33 @@ class Listing:
 
 class Screen:
 
+    PAUSE_DURATION = 0.3  # seconds
+    MAX_PAUSE_DURATION = 2  # seconds, before the workers run for a while.
+    MAX_SELECTION_PAUSE_DURATION = 10  # seconds, so paused jobs don't time out
+    CONTROL_BURST_INTERVAL = 8  # Every 8th burst of input isn't paused.
+
     def __init__(self, summary, log, appearance_changed_event, main_loop):
         self._summary = summary
         self._log = log
         self._appearance_changed_event = appearance_changed_event
         self._main_loop = main_loop
         self._is_summary_focused = True
+        self.focus_patterns = None
         self.workers = None
+        self._worker_options = None
+        self._result_threshold = 0
+        self._retiring_workers = set()
+        self.pause_fraction = 0
+        self._resume_handle = None
+        self._pause_deadline = None
+        self._next_pause_time = 0
+        self._selection_pause = None  # (selection, start time)
+        self._selection_pause_handle = None
+        self._selection_paused_workers = set()
+        self._burst_count = 0
+        self._input_time = None
+        self._was_input_paused = None
+        self._frame_latencies = {True: [], False: []}
         self._is_listing_portrait = True
         self._is_log_visible = True
         self._is_help_visible = False
@@ -713,25 +1605,254 @@ class Screen:
         state["_appearance_changed_event"] = None
         state["_main_loop"] = None
         state["workers"] = None
+        state["_worker_options"] = None
+        state["_retiring_workers"] = set()
+        state["_resume_handle"] = None
+        state["_selection_pause"] = None
+        state["_selection_pause_handle"] = None
+        state["_selection_paused_workers"] = set()
+        state["_input_time"] = None
+        state["_frame_latencies"] = {True: [], False: []}
         return state
 
-    def make_workers(self, worker_count, is_being_tested, compression):
-        workers = []
+    def make_workers(self, worker_count, is_being_tested, compression,
+                     concurrency=1, jobserver_=None, remote_addresses=(),
+                     result_threshold=0):
+        if jobserver_ is None:
+            cpu_budget = asyncio.Semaphore(multiprocessing.cpu_count())
+        else:
+            cpu_budget = jobserver_
+        self._worker_options = (is_being_tested, compression, concurrency,
+                                cpu_budget, jobserver_ is None)
+        self._result_threshold = result_threshold
+        self._retiring_workers = set()
+        self.workers = []
+        self._summary.workers = self.workers
+        self._summary.job_slots = 0
         for index in range(worker_count):
-            worker_ = worker.Worker(is_being_tested, compression)
-            workers.append(worker_)
-            future = worker_.job_runner(self, self._summary, self._log,
-                                        self._summary._jobs_added_event,
-                                        self._appearance_changed_event)
-            worker_.future = future
-        self.workers = workers
+            self._make_worker()
+        for address in remote_addresses:
+            self._make_worker(worker.make_transport(address))
+
+    def _make_worker(self, transport=None):
+        if transport is None:
+            worker_ = worker.Worker(*self._worker_options,
+                                    result_threshold=self._result_threshold)
+        else:  # Remote workers don't use the local cpus.
+            is_being_tested, compression, concurrency = \
+                self._worker_options[:3]
+            worker_ = worker.Worker(
+                is_being_tested, compression, concurrency,
+                asyncio.Semaphore(concurrency), transport=transport)
+        worker_.future = worker_.job_runner(
+            self, self._summary, self._log, self._summary._jobs_added_event,
+            self._appearance_changed_event)
+        self.workers.append(worker_)
+        self._summary.job_slots += worker_.concurrency + 1
+        return worker_
+
+    def all_workers(self):  # Including the retiring ones still running.
+        return self.workers + list(self._retiring_workers)
+
+    def _local_workers(self):
+        return [worker_ for worker_ in self.workers
+                if not worker_.transport.is_remote]
+
+    def add_worker(self):
+        self._main_loop.create_task(self._make_worker().future)
+
+    def remove_worker(self):
+        worker_ = min(reversed(self._local_workers()),
+                      key=lambda worker_: len(worker_.results))
+        self.workers.remove(worker_)
+        self._summary.job_slots -= worker_.concurrency + 1
+        self._retiring_workers.add(worker_)
+        worker_.retire(self._summary._jobs_added_event)
+
+    async def autoscale_workers(self, max_worker_count, interval=3):
+        cpu_count = multiprocessing.cpu_count()
+        while True:
+            await asyncio.sleep(interval)
+            self._retiring_workers = {
+                worker_ for worker_ in self._retiring_workers
+                if worker_.process is not None and
+                worker_.process.returncode is None}
+            load = os.getloadavg()[0] / cpu_count
+            cpu_pressure = worker.pressure("cpu")
+            memory_pressure = worker.pressure("memory")
+            running_count = sum(len(worker_.results)
+                                for worker_ in self.workers)
+            pending_count = (self._summary.result_total -
+                             self._summary.completed_total - running_count)
+            worker_count = len(self._local_workers())
+            decision = worker.scaling_decision(
+                load, cpu_pressure, memory_pressure, pending_count,
+                worker_count, max_worker_count)
+            if decision == 0:
+                continue
+            if decision == 1:
+                self.add_worker()
+            else:
+                self.remove_worker()
+            pressures = ", ".join(
+                f"{resource} pressure {value:.0f}%" for resource, value
+                in [("cpu", cpu_pressure), ("memory", memory_pressure)]
+                if value is not None)
+            self._log.log_message(
+                f"Workers {worker_count} → {worker_count + decision} (load "
+                f"{load:.2f} per cpu, {pressures + ', ' if pressures else ''}"
+                f"{pending_count} jobs waiting).")
 
     def stop_workers(self):
-        for worker_ in self.workers:
-            if worker_.result is not None:
-                worker_.result.reset()
+        for worker_ in self.all_workers():
+            for result in worker_.results:
+                result.reset()
             worker_.kill()
 
+    def _preempt_for_selection(self):
+        # If every worker is busy elsewhere, cancel the worker whose running
+        # jobs are farthest, and most recently started, so the selected
+        # result runs next.
+        if self.workers is None:
+            return
+        try:
+            selection = self._summary.get_selection()
+        except IndexError:  # No files
+            return
+        if selection.tool is None or selection.status != tools.Status.pending:
+            return
+        if any(len(worker_.running_results) < worker_.concurrency
+               for worker_ in self.workers):
+            return
+        closest_results = {
+            worker_: min(worker_.running_results,
+                         key=self._summary.distance_from_cursor)
+            for worker_ in self.workers}
+        victims = sorted(self.workers, reverse=True, key=lambda worker_: (
+            self._summary.distance_from_cursor(closest_results[worker_]),
+            worker_.job_start_time))
+        for victim in victims:
+            result = closest_results[victim]
+            if self._summary.distance_from_cursor(result) == 0:
+                return
+            # Only if the selection would then run, in the victim's slot.
+            if self._summary.would_run_next(selection,
+                                            victim.running_results):
+                break
+        else:
+            return
+        self._log.log_message(["Preempting ", result.tool.__name__, " on ",
+                               tools.path_colored(result.path), "."])
+        self._summary.closest_placeholder_generator = None
+        victim.cancel()
+
+    def _pause_workers(self):
+        # Pause some of the bulk jobs while the user is typing, so that
+        # drawing isn't slowed by an oversubscribed cpu. Some bursts are left
+        # unpaused to measure the difference. See latency_report.
+        if self.workers is None or self.pause_fraction == 0:
+            return
+        now = self._main_loop.time()
+        if self._resume_handle is None:
+            if now < self._next_pause_time:
+                return
+            self._pause_deadline = now + Screen.MAX_PAUSE_DURATION
+            self._burst_count += 1
+            if self._burst_count % Screen.CONTROL_BURST_INTERVAL != 0:
+                bulk_workers = [worker_ for worker_ in self.workers
+                                if worker_.running_results != [] and
+                                not worker_.is_urgent]
+                pause_count = math.ceil(len(self.workers) *
+                                        self.pause_fraction)
+                for worker_ in bulk_workers[:pause_count]:
+                    worker_.pause()
+        else:
+            self._resume_handle.cancel()
+        self._resume_handle = self._main_loop.call_at(
+            min(now + Screen.PAUSE_DURATION, self._pause_deadline),
+            self._resume_workers)
+
+    def _resume_workers(self):
+        self._resume_handle = None
+        if self._main_loop.time() >= self._pause_deadline:
+            self._next_pause_time = (self._main_loop.time() +
+                                     Screen.PAUSE_DURATION)
+        for worker_ in self.all_workers():  # Including any retired since.
+            if worker_ not in self._selection_paused_workers:
+                worker_.resume()
+
+    def _pause_for_selection(self):
+        # A bulk job's niceness can't be lowered again without privileges.
+        # So while the selection runs as one, the other bulk jobs are paused
+        # instead. Only for a while, since their timeouts still run.
+        if self._selection_pause_handle is not None:
+            self._selection_pause_handle.cancel()
+            self._selection_pause_handle = None
+        try:
+            selection = self._summary.get_selection()
+        except IndexError:
+            selection = None
+        now = self._main_loop.time()
+        if self.workers is None or not any(
+                worker_.is_running_in_bulk(selection)
+                for worker_ in self.workers):
+            self._selection_pause = None
+        elif (self._selection_pause is None or
+              self._selection_pause[0] != selection):
+            self._selection_pause = selection, now
+        paused_workers = set()
+        if self._selection_pause is not None and now < (
+                self._selection_pause[1] +
+                Screen.MAX_SELECTION_PAUSE_DURATION):
+            paused_workers = {
+                worker_ for worker_ in self.workers
+                if worker_.running_results != [] and not worker_.is_urgent
+                and not worker_.is_running_in_bulk(selection)}
+            self._selection_pause_handle = self._main_loop.call_later(
+                Screen.PAUSE_DURATION, self._pause_for_selection)
+        for worker_ in self._selection_paused_workers - paused_workers:
+            if self._resume_handle is None:  # Else resumed after the input.
+                worker_.resume()
+        for worker_ in paused_workers:
+            worker_.pause()
+        self._selection_paused_workers = paused_workers
+
+    def _on_interaction(self, input_time):
+        self._preempt_for_selection()
+        self._update_worker_priorities()
+        self._pause_for_selection()
+        self._pause_workers()
+        if self._input_time is None and self.workers is not None and any(
+                worker_.running_results != [] for worker_ in self.workers):
+            self._input_time = input_time
+            self._was_input_paused = any(worker_.is_paused
+                                         for worker_ in self.workers)
+        self._appearance_changed_event.set()
+
+    def _record_frame_latency(self):
+        if self._input_time is not None:
+            self._frame_latencies[self._was_input_paused].append(
+                time.perf_counter() - self._input_time)
+            self._input_time = None
+
+    def latency_report(self):
+        medians = [
+            f"{round(statistics.median(latencies) * 1000)}ms {description}"
+            f" ({len(latencies)} inputs)"
+            for description, latencies in [
+                    ("with workers paused", self._frame_latencies[True]),
+                    ("without", self._frame_latencies[False])]
+            if latencies != []]
+        return (None if medians == [] else
+                "Median time from input to frame: " + ", ".join(medians) + ".")
+
+    def _update_worker_priorities(self):
+        if self.workers is None:
+            return
+        for worker_ in self.workers:
+            worker_.set_urgency(any(self._summary.is_visible(result.entry)
+                                    for result in worker_.running_results))
+
     def _partition(self, widgets, height):
         smaller_height = max(height // 4, 10)
         return [height - smaller_height, smaller_height]
@@ -843,7 +1964,7 @@ class Screen:
         if self.editor_command is None:
             self._log.log_message("An editor has not been defined. "
                                   "See option -e.")
-        else:
+        elif self._summary.get_selection().tool is not None:
             path = self._summary.get_selection().path
             path_colored = tools.path_colored(path)
             line_num = (self._summary.get_selection().entry[0].
@@ -865,11 +1986,34 @@ class Screen:
         with self._summary.keep_selection():
             self._summary.sort_entries()
 
+    def toggle_file_focus(self):
+        if self._summary.focus is None:
+            patterns = self.focus_patterns or [
+                os.path.dirname(self._summary.get_selection().path)]
+            self._summary.set_focus(Focus(patterns, self._summary._root_path))
+            self._log.log_command(f"Focusing on {', '.join(patterns)}.")
+        else:
+            self._summary.set_focus(None)
+            self._log.log_command("Unfocused.")
+            asyncio.ensure_future(self._summary.sync_files(
+                self._appearance_changed_event, self._log))
+
+    def toggle_tree_view(self):
+        self._summary.toggle_tree_view()
+        view = ("a directory tree" if self._summary.is_tree_view
+                else "a list")
+        self._log.log_command(f"Showing files as {view}.")
+
+    def toggle_directory(self):
+        self._summary.toggle_directory()
+
     def quit_(self):
         os.kill(os.getpid(), signal.SIGINT)
 
     def refresh(self):
         selection = self._summary.get_selection()
+        if selection.tool is None:
+            return
         tool_name = tools.tool_name_colored(selection.tool, selection.path)
         path_colored = tools.path_colored(selection.path)
         self._log.log_message([in_green("Refreshing "), tool_name,
@@ -879,6 +2023,8 @@ class Screen:
 
     def refresh_tool(self):
         selection = self._summary.get_selection()
+        if selection.tool is None:
+            return
         tool_name = tools.tool_name_colored(selection.tool, selection.path)
         self._log.log_message([in_green("Refreshing all results of "),
                                tool_name, in_green("…")])
@@ -914,6 +2060,7 @@ class Screen:
         pickle_path = os.path.join(tools.CACHE_PATH, "summary.pickle")
         open_compressed = functools.partial(gzip.open, compresslevel=1)
         tools.dump_pickle_safe(self, pickle_path, open=open_compressed)
+        self._summary.save()
 
     def _select_entry_at_position(self, x, y, view_width, view_height):
         border_width = 1
@@ -923,9 +2070,10 @@ class Screen:
         view_x, view_y = self._summary._view_widget.portal.position
         column_index = x - border_width + view_x
         row_index = y - border_width + view_y
-        if row_index >= len(self._summary._entries):
+        rows = self._summary._rows()
+        if row_index >= len(rows):
             return
-        row = self._summary._entries[row_index]
+        row = rows[row_index]
         if column_index < 0 or column_index >= len(row):
             return
         self._summary._cursor_position = column_index, row_index
@@ -970,17 +2118,18 @@ class Screen:
             self._help_widget.on_input_event(
                 event, self._appearance_changed_event)
             return
+        input_time = time.perf_counter()
         if type(event) == tuple:
             if event[0] in ["mouse press", "mouse drag"]:
                 self._on_mouse_event(event)
-                self._appearance_changed_event.set()
+                self._on_interaction(input_time)
                 return
         else:
             action = (self._key_map.get(event) or
                       self._key_map.get(event.lower()))
             if action is not None:
                 action(self)
-                self._appearance_changed_event.set()
+                self._on_interaction(input_time)
 
     def _fix_listing(self):
         widget = self._summary.get_selection()
@@ -988,6 +2137,10 @@ class Screen:
         view.position = widget.scroll_position
         x, y = view.position
         view.widget = widget.result
+        if widget.tool is None:
+            self._listing.title = tools.path_colored(widget.path +
+                                                     os.path.sep)
+            return
         tool_name = tools.tool_name_colored(widget.tool, widget.path)
         divider = " " + self._listing.top * 2 + " "
         self._listing.title = (
@@ -1044,6 +2197,7 @@ class Screen:
         width, height = max(dimensions[0], 10), max(dimensions[1], 20)
         result = (body.appearance((width, height-1)) +
                   self._get_status_bar(width))
+        self._record_frame_latency()
         return (result if (width, height) == dimensions
                 else fill3.appearance_resize(result, dimensions))
 
@@ -1057,7 +2211,9 @@ class Screen:
         ({"end", "ctrl e"}, cursor_end), ({"n"}, move_to_next_issue),
         ({"N"}, move_to_next_issue_of_tool), ({"e"}, edit_file),
         ({"q"}, quit_), ({"r"}, refresh), ({"R"}, refresh_tool),
-        ({"tab"}, toggle_focus), ({"f"}, toggle_fullscreen), ("x", xdg_open)]
+        ({"tab"}, toggle_focus), ({"f"}, toggle_fullscreen), ("x", xdg_open),
+        ({"d"}, toggle_tree_view), ({"enter"}, toggle_directory),
+        ({"F"}, toggle_file_focus)]
 
 
 def setup_inotify(root_path, loop, on_filesystem_event, exclude_filter):
@@ -1080,6 +2236,7 @@ def load_state(pickle_path, jobs_added_event, appearance_changed_event,
             screen = pickle.load(file_)
     except (FileNotFoundError, AttributeError):
         summary = Summary(root_path, jobs_added_event)
+        summary._journal.clear()
         log = Log(appearance_changed_event)
         screen = Screen(summary, log, appearance_changed_event, loop)
     else:
@@ -1107,6 +2264,9 @@ def on_filesystem_event(event, summary, root_path, appearance_changed_event):
                        pyinotify.IN_CLOSE_WRITE: summary.on_file_modified}
     if event.mask not in inotify_actions:
         return
+    if (inotify_actions[event.mask] == summary.on_file_modified and
+            not summary.is_focused(path)):
+        return  # Found by the sync when unfocused.
     try:
         inotify_actions[event.mask](path)
     except Exception:
@@ -1116,13 +2276,22 @@ def on_filesystem_event(event, summary, root_path, appearance_changed_event):
 
 
 def main(root_path, loop, worker_count=None, editor_command=None, theme=None,
-         compression=None, is_being_tested=False):
+         compression=None, focus=None, pause_fraction=None,
+         debounce_time=None, concurrency=None, is_autoscaling=False,
+         jobserver_path=None, remote_addresses=(), result_threshold=0,
+         is_being_tested=False):
     if worker_count is None:
         worker_count = max(multiprocessing.cpu_count() - 1, 1)
     if theme is None:
         theme = "native"
     if compression is None:
         compression = "gzip"
+    if pause_fraction is None:
+        pause_fraction = 0.5
+    if debounce_time is None:
+        debounce_time = 0
+    if concurrency is None:
+        concurrency = 1
     os.environ["PYGMENT_STYLE"] = theme
     pickle_path = os.path.join(tools.CACHE_PATH, "summary.pickle")
     jobs_added_event = asyncio.Event()
@@ -1131,24 +2300,52 @@ def main(root_path, loop, worker_count=None, editor_command=None, theme=None,
         pickle_path, jobs_added_event, appearance_changed_event, root_path,
         loop)
     screen.editor_command = editor_command
+    screen.focus_patterns = None if focus is None else focus.patterns
+    screen.pause_fraction = pause_fraction
+    summary.focus = focus
+    summary.debounce_time = debounce_time
     log.log_message("Program started.")
     jobs_added_event.set()
+    if jobserver_path is None:
+        jobserver_path = jobserver.makeflags_path(
+            os.environ.get("MAKEFLAGS", ""))
+        jobserver_ = (None if jobserver_path is None
+                      else jobserver.JobServer(jobserver_path))
+    else:
+        jobserver_ = jobserver.share(
+            jobserver_path, max(multiprocessing.cpu_count() - 1, 1))
+    if jobserver_ is not None:
+        log.log_message(f"Using the jobserver: {jobserver_path}")
     callback = lambda event: on_filesystem_event(event, summary, root_path,
                                                  appearance_changed_event)
     notifier = setup_inotify(root_path, loop, callback, is_path_excluded)
     try:
+        max_worker_count = worker_count
+        if is_autoscaling:
+            worker_count = max(worker_count // 2, 1)
         log.log_message(f"Starting workers ({worker_count}) …")
-        screen.make_workers(worker_count, is_being_tested, compression)
+        if remote_addresses:
+            log.log_message("Starting remote workers (" +
+                            ", ".join(remote_addresses) + ") …")
+        screen.make_workers(worker_count, is_being_tested, compression,
+                            concurrency, jobserver_, remote_addresses,
+                            result_threshold)
 
         def exit_loop():
+            latency_report = screen.latency_report()
+            if latency_report is not None:
+                log.log_message(latency_report)
             log.log_command("Exiting…")
             time.sleep(0.05)
             screen.stop_workers()
             loop.stop()
         loop.create_task(summary.sync_with_filesystem(
             appearance_changed_event, log))
-        for worker in screen.workers:
-            loop.create_task(worker.future)
+        for worker_ in screen.workers:
+            loop.create_task(worker_.future)
+        loop.create_task(worker.watch_memory(screen.all_workers))
+        if is_autoscaling:
+            loop.create_task(screen.autoscale_workers(max_worker_count))
         if sys.stdout.isatty():
             loop.create_task(
                 fill3.update_screen(screen, appearance_changed_event))
@@ -1164,6 +2361,8 @@ def main(root_path, loop, worker_count=None, editor_command=None, theme=None,
                 loop.stop()
     finally:
         notifier.stop()
+        if jobserver_ is not None:
+            jobserver_.close()
     if summary.is_loaded:
         screen.save()
 
@@ -1178,21 +2377,28 @@ def chdir(path):
         os.chdir(old_cwd)
 
 
+CACHE_FORMAT_VERSION = "1"  # Change when the cache's format changes.
+
+
 def manage_cache(root_path):
+    # Results of changed tools are refreshed individually, see
+    # Summary.refresh_changed_tools.
     cache_path = os.path.join(root_path, tools.CACHE_PATH)
-    timestamp_path = os.path.join(cache_path, "creation_time")
+    format_path = os.path.join(cache_path, "format_version")
     if os.path.exists(cache_path):
-        timestamp = os.stat(timestamp_path).st_mtime
-        for resource_path in ["__main__.py", "tools.py", "tools.toml"]:
-            with importlib.resources.path(eris, resource_path) as resource:
-                if resource.stat().st_mtime > timestamp:
-                    print("Eris has been updated, so clearing the cache and"
-                          " recalculating all results…")
-                    shutil.rmtree(cache_path)
-                    break
+        try:
+            with open(format_path) as format_file:
+                format_version = format_file.read()
+        except FileNotFoundError:
+            format_version = None
+        if format_version != CACHE_FORMAT_VERSION:
+            print("The format of eris' cache has changed, so clearing the "
+                  "cache and recalculating all results…")
+            shutil.rmtree(cache_path)
     if not os.path.exists(cache_path):
         os.mkdir(cache_path)
-        open(timestamp_path, "w").close()
+        with open(format_path, "w") as format_file:
+            format_file.write(CACHE_FORMAT_VERSION)
 
 
 def print_tool_info():
@@ -1236,6 +2442,15 @@ def check_arguments():
     except ValueError:
         print("--workers requires a number.")
         sys.exit(1)
+    concurrency = None
+    try:
+        if arguments["--concurrency"] is not None:
+            concurrency = int(arguments["--concurrency"])
+            if concurrency < 1:
+                raise ValueError
+    except ValueError:
+        print("--concurrency requires a number greater than 0.")
+        sys.exit(1)
     root_path = os.path.abspath(arguments["<directory>"])
     if not os.path.exists(root_path):
         print("File does not exist:", root_path)
@@ -1253,10 +2468,58 @@ def check_arguments():
         if arguments["--compression"] not in compressions:
             print("--compression must be one of:", " ".join(compressions))
             sys.exit(1)
+    focus = None
+    if arguments["--focus"] is not None:
+        try:
+            focus = Focus(arguments["--focus"].split(","), root_path)
+        except subprocess.CalledProcessError as error:
+            print("--focus couldn't get the changed files from git:",
+                  error.stderr.strip())
+            sys.exit(1)
+    pause_fraction = None
+    try:
+        if arguments["--pause"] is not None:
+            pause_fraction = float(arguments["--pause"])
+            if not 0 <= pause_fraction <= 1:
+                raise ValueError
+    except ValueError:
+        print("--pause requires a number from 0 to 1.")
+        sys.exit(1)
+    debounce_time = None
+    try:
+        if arguments["--debounce"] is not None:
+            debounce_time = float(arguments["--debounce"])
+            if debounce_time < 0:
+                raise ValueError
+    except ValueError:
+        print("--debounce requires a number of seconds.")
+        sys.exit(1)
+    result_threshold = 0
+    try:
+        if arguments["--pipe-results"] is not None:
+            result_threshold = int(float(arguments["--pipe-results"]) * 1024)
+            if result_threshold < 0:
+                raise ValueError
+    except ValueError:
+        print("--pipe-results requires a number of kilobytes.")
+        sys.exit(1)
+    remote_addresses = ([] if arguments["--remote"] is None
+                        else arguments["--remote"].split(","))
+    try:
+        for address in remote_addresses:
+            worker.make_transport(address)
+    except ValueError:
+        print("--remote requires addresses like HOST:PORT or "
+              "ssh:HOST:DIRECTORY.")
+        sys.exit(1)
+    jobserver_path = (None if arguments["--jobserver"] is None
+                      else os.path.abspath(arguments["--jobserver"]))
     editor_command = arguments["--editor"] or os.environ.get("EDITOR", None)\
         or os.environ.get("VISUAL", None)
     return root_path, worker_count, editor_command, arguments["--theme"], \
-        arguments["--compression"]
+        arguments["--compression"], focus, pause_fraction, \
+        debounce_time, concurrency, arguments["--autoscale"], \
+        jobserver_path, remote_addresses, result_threshold
 
 
 def inotify_watches_exceeded():
@@ -1267,15 +2530,19 @@ def inotify_watches_exceeded():
 
 
 def entry_point():
-    root_path, worker_count, editor_command, theme, compression = \
-        check_arguments()
+    root_path, worker_count, editor_command, theme, compression, \
+        focus, pause_fraction, debounce_time, concurrency, \
+        is_autoscaling, jobserver_path, remote_addresses, \
+        result_threshold = check_arguments()
     with terminal.terminal_title("eris: " + os.path.basename(root_path)):
         manage_cache(root_path)
         with chdir(root_path):  # FIX: Don't change directory if possible.
             loop = asyncio.get_event_loop()
             try:
                 main(root_path, loop, worker_count, editor_command, theme,
-                     compression)
+                     compression, focus, pause_fraction,
+                     debounce_time, concurrency, is_autoscaling,
+                     jobserver_path, remote_addresses, result_threshold)
             except pyinotify.WatchManagerError:
                 inotify_watches_exceeded()
 
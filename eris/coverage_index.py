@@ -0,0 +1,87 @@
+# Copyright (C) 2019 Andrew Hamilton. All rights reserved.
+# Licensed under the Artistic License 2.0.
+
+
+"""The lines of the project that each test file ran, when last tested."""
+
+
+import array
+import collections
+import contextlib
+import os
+import pickle
+import zlib
+
+
+_SUFFIX = ".coverage"
+
+
+def _record_path(index_dir, test_path):
+    return os.path.join(index_dir, test_path + _SUFFIX)
+
+
+def write_record(index_dir, test_path, coverage_json):
+    """Record the lines run by a test file, from a "coverage json" report."""
+    coverage = {"./" + os.path.normpath(path):
+                array.array("I", file_report["executed_lines"])
+                for path, file_report in coverage_json["files"].items()}
+    path = _record_path(index_dir, test_path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as record_file:
+        record_file.write(zlib.compress(pickle.dumps(
+            coverage, protocol=pickle.HIGHEST_PROTOCOL)))
+    os.rename(tmp_path, path)
+
+
+def remove_record(index_dir, test_path):
+    with contextlib.suppress(FileNotFoundError):
+        os.remove(_record_path(index_dir, test_path))
+
+
+def _read_record(path):
+    with open(path, "rb") as record_file:
+        return pickle.loads(zlib.decompress(record_file.read()))
+
+
+class CoverageIndex:
+
+    def __init__(self, index_dir):
+        self.index_dir = index_dir
+        self._records = None  # test path -> coverage
+        self._tests = None  # path -> tests that ran it
+
+    def _load(self):
+        self._records = {}
+        self._tests = collections.defaultdict(set)
+        for directory, subdirs, filenames in os.walk(self.index_dir):
+            for filename in filenames:
+                if filename.endswith(_SUFFIX):
+                    path = os.path.join(directory, filename)
+                    self.update("./" + os.path.relpath(
+                        path, self.index_dir)[:-len(_SUFFIX)])
+
+    def update(self, test_path):
+        """Read the record of a test file again, after it was tested."""
+        if self._records is None:
+            return  # It is read when the index is loaded.
+        for path in self._records.pop(test_path, {}):
+            self._tests[path].discard(test_path)
+        try:
+            coverage = _read_record(_record_path(self.index_dir, test_path))
+        except (OSError, ValueError, pickle.UnpicklingError, zlib.error):
+            return
+        self._records[test_path] = coverage
+        for path in coverage:
+            self._tests[path].add(test_path)
+
+    def tests_covering(self, path, lines=None):
+        """Returns the tests with records, and the ones that ran path.
+
+        If lines are given, only tests that ran one of them count."""
+        if self._records is None:
+            self._load()
+        return set(self._records), {
+            test_path for test_path in self._tests.get(path, ())
+            if lines is None or
+            not set(lines).isdisjoint(self._records[test_path][path])}
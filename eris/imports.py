@@ -0,0 +1,139 @@
+# Copyright (C) 2019 Andrew Hamilton. All rights reserved.
+# Licensed under the Artistic License 2.0.
+
+
+"""The imports between the python files of a project."""
+
+
+import ast
+import collections
+import hashlib
+import os
+import pickle
+
+
+_MAX_CACHE_SIZE = 10000
+# (content digest, package) -> imported modules, least recently used first
+_imports_cache = collections.OrderedDict()
+
+
+def _path_parts(path):
+    parts = path[:-len(".py")].split("/")
+    return [part for part in parts if part not in ["", "."]]
+
+
+def module_names(path):
+    """The names a file may be imported by.
+
+    e.g. "./src/pkg/mod.py" may be src.pkg.mod, pkg.mod or mod."""
+    parts = _path_parts(path)
+    if parts[-1] == "__init__":
+        parts.pop()
+    return {".".join(parts[index:]) for index in range(len(parts))}
+
+
+def _package(path):
+    return tuple(_path_parts(path)[:-1])
+
+
+def _imported_modules(source, package):
+    try:
+        tree = ast.parse(source)
+    except (SyntaxError, ValueError):
+        return set()
+    modules = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            modules.update(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom):
+            parts = [] if node.module is None else [node.module]
+            if node.level > 0:  # A relative import.
+                parts = list(package[:len(package) - node.level + 1]) + parts
+            module = ".".join(parts)
+            modules.add(module)
+            modules.update(f"{module}.{alias.name}" for alias in node.names)
+    # Importing a.b.c also imports the packages a and a.b.
+    return {".".join(module.split(".")[:index + 1])
+            for module in modules if module != ""
+            for index in range(module.count(".") + 1)}
+
+
+def imported_modules(source, package=()):
+    """The modules imported by python source, given the file's package."""
+    key = hashlib.blake2b(source).digest(), package
+    try:
+        _imports_cache.move_to_end(key)
+        return _imports_cache[key]
+    except KeyError:
+        modules = _imports_cache[key] = _imported_modules(source, package)
+        if len(_imports_cache) > _MAX_CACHE_SIZE:
+            _imports_cache.popitem(last=False)
+        return modules
+
+
+def load_cache(path):
+    """Add the imports found in an earlier session to the cache."""
+    global _imports_cache
+    try:
+        with open(path, "rb") as file_:
+            cache = pickle.load(file_)
+    except (OSError, EOFError, pickle.UnpicklingError):
+        return
+    cache.update(_imports_cache)
+    while len(cache) > _MAX_CACHE_SIZE:
+        cache.popitem(last=False)
+    _imports_cache = cache
+
+
+def save_cache(path):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as file_:
+        pickle.dump(_imports_cache, file_, protocol=pickle.HIGHEST_PROTOCOL)
+    os.rename(tmp_path, path)
+
+
+class ImportGraph:
+
+    def __init__(self, paths):
+        self._imports = {}  # path -> module names it imports
+        # module name -> paths importing it
+        self._importers = collections.defaultdict(set)
+        for path in paths:
+            self.update(path)
+
+    def update(self, path):
+        """Read the imports of a file again, or of a new file."""
+        try:
+            with open(path, "rb") as file_:
+                source = file_.read()
+        except OSError:
+            source = b""
+        modules = imported_modules(source, _package(path))
+        old_modules = self._imports.get(path, set())
+        for module in old_modules - modules:
+            self._importers[module].discard(path)
+        for module in modules - old_modules:
+            self._importers[module].add(path)
+        self._imports[path] = modules
+
+    def remove(self, path):
+        for module in self._imports.pop(path, ()):
+            self._importers[module].discard(path)
+
+    def importers(self, path):
+        """The files that import path, even indirectly, nearest first.
+
+        Returns (path, distance) pairs."""
+        distances = {path: 0}
+        queue = collections.deque([path])
+        importers = []
+        while queue:
+            imported_path = queue.popleft()
+            for importer in sorted(
+                    importer for name in module_names(imported_path)
+                    for importer in self._importers.get(name, ())):
+                if importer not in distances:
+                    distances[importer] = distances[imported_path] + 1
+                    importers.append((importer, distances[importer]))
+                    queue.append(importer)
+        return importers
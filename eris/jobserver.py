@@ -0,0 +1,121 @@
+# Copyright (C) 2019 Andrew Hamilton. All rights reserved.
+# Licensed under the Artistic License 2.0.
+
+
+import array
+import asyncio
+import contextlib
+import errno
+import fcntl
+import os
+import termios
+
+
+def makeflags_path(makeflags):
+    """Returns a path to the jobserver in MAKEFLAGS, or None.
+
+    Newer versions of make pass a named fifo, older ones a pair of file
+    descriptors, which are reopened through /proc."""
+    path = None
+    for flag in makeflags.split():
+        option, _, value = flag.partition("=")
+        if option not in ["--jobserver-auth", "--jobserver-fds"]:
+            continue
+        if value.startswith("fifo:"):
+            path = value[len("fifo:"):]
+        else:
+            read_fd = value.split(",")[0]
+            path = f"/proc/self/fd/{read_fd}" if read_fd.isdigit() else None
+    if path is not None and not os.path.exists(path):
+        return None  # make didn't pass the descriptors on.
+    return path
+
+
+class JobServer:
+    """A client of a GNU make jobserver, used like an asyncio.Semaphore.
+
+    Like every client it has one implicit token of its own."""
+
+    def __init__(self, path):
+        self.path = path
+        self._fd = os.open(path, os.O_RDWR | os.O_NONBLOCK)
+        self._has_implicit_token = True
+        self._tokens = []
+        self._waiters = []
+
+    def _take_token(self):
+        if self._has_implicit_token:
+            self._has_implicit_token = False
+            return True
+        with contextlib.suppress(BlockingIOError):
+            self._tokens.append(os.read(self._fd, 1))
+            return True
+        return False
+
+    def _available_count(self):
+        count = array.array("i", [0])
+        fcntl.ioctl(self._fd, termios.FIONREAD, count)
+        return count[0]
+
+    def locked(self):
+        # Tokens are only counted, so they are left for the other clients.
+        return not self._has_implicit_token and self._available_count() == 0
+
+    def _on_readable(self):
+        asyncio.get_event_loop().remove_reader(self._fd)
+        waiters, self._waiters = self._waiters, []
+        for waiter in waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+
+    async def acquire(self):
+        while not self._take_token():
+            loop = asyncio.get_event_loop()
+            if self._waiters == []:
+                loop.add_reader(self._fd, self._on_readable)
+            waiter = loop.create_future()
+            self._waiters.append(waiter)
+            await waiter
+        return True
+
+    def release(self):
+        if self._tokens:
+            os.write(self._fd, self._tokens.pop())
+        else:
+            self._has_implicit_token = True
+
+    def close(self):
+        """Give back all the tokens held, so the other clients can use them."""
+        os.write(self._fd, b"".join(self._tokens))
+        self._tokens = []
+        os.close(self._fd)  # The fifo is left for any other clients.
+
+
+def _is_stale(path):
+    # No process has the fifo open, e.g. its owner was killed.
+    try:
+        fd = os.open(path, os.O_WRONLY | os.O_NONBLOCK)
+    except OSError as error:
+        if error.errno == errno.ENXIO:
+            return True
+        raise
+    os.close(fd)
+    return False
+
+
+def share(path, token_count):
+    """Join the jobserver fifo at path, or start one with token_count tokens.
+
+    This lets several eris instances share the cpus. A fifo left behind by
+    instances that are no longer running is replaced."""
+    try:
+        os.mkfifo(path)
+    except FileExistsError:
+        if not _is_stale(path):
+            return JobServer(path)
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(path)
+        return share(path, token_count)
+    jobserver = JobServer(path)
+    os.write(jobserver._fd, b"+" * token_count)
+    return jobserver
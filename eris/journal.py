@@ -0,0 +1,137 @@
+# Copyright (C) 2019 Andrew Hamilton. All rights reserved.
+# Licensed under the Artistic License 2.0.
+
+
+import contextlib
+import os
+import pickle
+import shutil
+import threading
+
+import eris.summary_index as summary_index
+
+
+_ENTRY, _DELETE, _STATUS, _CHANGE_TIME = range(4)
+
+
+def _read_changes(path):
+    try:
+        with open(path, "rb") as file_:
+            while True:
+                try:
+                    yield from pickle.load(file_)
+                except (EOFError, pickle.UnpicklingError):
+                    return  # The last batch may be truncated by a crash.
+    except FileNotFoundError:
+        return
+
+
+def _replay(overlay, changes, index):
+    """Apply changes to the overlay of entries differing from the index.
+
+    Deleted entries are None in the overlay."""
+    for change in changes:
+        kind, path = change[:2]
+        if kind == _ENTRY:
+            overlay[path] = change[2:]
+            continue
+        if kind == _DELETE:
+            overlay[path] = None
+            continue
+        if path in overlay:
+            entry = overlay[path]
+        else:
+            entry = None if index is None else index.get(path)
+        if entry is None:
+            continue
+        change_time, results = entry
+        if kind == _STATUS:
+            tool_name, status, compression = change[2:]
+            overlay[path] = change_time, tuple(
+                (tool_name, status, compression) if result[0] == tool_name
+                else result for result in results)
+        elif kind == _CHANGE_TIME:
+            overlay[path] = change[2], results
+
+
+class Journal:
+
+    COMPACTION_SIZE = 4 * 1024 * 1024  # bytes
+
+    def __init__(self, journal_dir, sort_key):
+        self.journal_dir = journal_dir
+        self._sort_key = sort_key
+        self._changes = []
+        self._compaction_thread = None
+
+    def _path(self, name):
+        return os.path.join(self.journal_dir, name)
+
+    def add_entry(self, path, change_time, results):
+        self._changes.append((_ENTRY, path, change_time, tuple(results)))
+
+    def delete_entry(self, path):
+        self._changes.append((_DELETE, path))
+
+    def set_status(self, path, tool_name, status, compression):
+        self._changes.append((_STATUS, path, tool_name, status, compression))
+
+    def set_change_time(self, path, change_time):
+        self._changes.append((_CHANGE_TIME, path, change_time))
+
+    def flush(self):
+        if self._changes == []:
+            return
+        os.makedirs(self.journal_dir, exist_ok=True)
+        with open(self._path("journal"), "ab") as file_:
+            pickle.dump(self._changes, file_,
+                        protocol=pickle.HIGHEST_PROTOCOL)
+        self._changes = []
+        if (not self.is_compacting() and
+                os.stat(self._path("journal")).st_size >
+                Journal.COMPACTION_SIZE):
+            self.compact_in_background()
+
+    def is_compacting(self):
+        return (self._compaction_thread is not None and
+                self._compaction_thread.is_alive())
+
+    def compact_in_background(self):
+        if not os.path.exists(self._path("journal.old")):
+            os.rename(self._path("journal"), self._path("journal.old"))
+        self._compaction_thread = threading.Thread(target=self._compact,
+                                                   daemon=True)
+        self._compaction_thread.start()
+
+    def _read_index(self):
+        try:
+            return summary_index.SummaryIndex(self._path("index"),
+                                              self._sort_key)
+        except FileNotFoundError:
+            return None
+
+    def _compact(self):
+        index = self._read_index()
+        overlay = {}
+        _replay(overlay, _read_changes(self._path("journal.old")), index)
+        records = ([] if index is None else
+                   [record for record in index.records()
+                    if record[0] not in overlay])
+        records.extend((path,) + entry for path, entry in overlay.items()
+                       if entry is not None)
+        records.sort(key=lambda record: self._sort_key(record[0]))
+        summary_index.write_index(self._path("index"), records)
+        os.remove(self._path("journal.old"))
+
+    def load(self):
+        """Returns the compacted index and an overlay of later changes."""
+        index = self._read_index()
+        overlay = {}
+        for name in ["journal.old", "journal"]:
+            _replay(overlay, _read_changes(self._path(name)), index)
+        return index, overlay
+
+    def clear(self):
+        self._changes = []
+        with contextlib.suppress(FileNotFoundError):
+            shutil.rmtree(self.journal_dir)
@@ -0,0 +1,170 @@
+# Copyright (C) 2019 Andrew Hamilton. All rights reserved.
+# Licensed under the Artistic License 2.0.
+
+
+import array
+import bisect
+import mmap
+import operator
+import os
+import struct
+
+
+_MAGIC = b"ERISIDX1"
+_HEADER = struct.Struct("<8s5Q")
+_ALIGNMENT = 8
+
+
+def _padding(length):
+    return b"\0" * (-length % _ALIGNMENT)
+
+
+def write_index(path, records):
+    """Write (path, change_time, results) records, already in sort order."""
+    tool_ids, compression_ids = {}, {None: 0}
+    path_offsets, paths = array.array("Q", [0]), bytearray()
+    change_times = array.array("d")
+    result_offsets = array.array("Q", [0])
+    tool_column, status_column = array.array("H"), array.array("B")
+    compression_column = array.array("B")
+    for entry_path, change_time, results in records:
+        paths.extend(os.fsencode(entry_path))
+        paths.append(0)  # Terminated so that they can be decoded in bulk.
+        path_offsets.append(len(paths))
+        change_times.append(change_time)
+        for tool_name, status, compression in results:
+            tool_column.append(tool_ids.setdefault(tool_name, len(tool_ids)))
+            status_column.append(status)
+            compression_column.append(compression_ids.setdefault(
+                compression, len(compression_ids)))
+        result_offsets.append(len(tool_column))
+    tool_names = "\n".join(tool_ids).encode("utf-8")
+    compressions = "\n".join(list(compression_ids)[1:]).encode("utf-8")
+    sections = [tool_names, compressions, path_offsets, paths, change_times,
+                result_offsets, tool_column, status_column,
+                compression_column]
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as file_:
+        file_.write(_HEADER.pack(_MAGIC, len(change_times), len(tool_column),
+                                 len(tool_names), len(compressions),
+                                 len(paths)))
+        for section in sections:
+            data = bytes(section)
+            file_.write(data + _padding(len(data)))
+    os.rename(tmp_path, path)
+
+
+class SummaryIndex:
+
+    def __init__(self, path, sort_key):
+        self._sort_key = sort_key
+        with open(path, "rb") as file_:
+            self._mmap = mmap.mmap(file_.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(self._mmap)
+        (magic, entry_count, result_count, tool_names_size, compressions_size,
+         paths_size) = _HEADER.unpack_from(view)
+        if magic != _MAGIC:
+            raise ValueError(f"Not a summary index: {path}")
+        self._offset = _HEADER.size
+        tool_names = self._section(view, tool_names_size).tobytes()
+        self.tool_names = tool_names.decode("utf-8").split("\n")
+        compressions = self._section(view, compressions_size).tobytes()
+        self.compressions = [None] + (compressions.decode("utf-8").split("\n")
+                                      if compressions else [])
+        self._path_offsets = self._section(view, (entry_count + 1) * 8, "Q")
+        self._paths = self._section(view, paths_size)
+        self._change_times = self._section(view, entry_count * 8, "d")
+        self._result_offsets = self._section(view, (entry_count + 1) * 8, "Q")
+        self._tools = self._section(view, result_count * 2, "H")
+        self._statuses = self._section(view, result_count)
+        self._compressions = self._section(view, result_count)
+
+    def _section(self, view, size, format_="B"):
+        section = view[self._offset:self._offset + size].cast(format_)
+        self._offset += size + (-size % _ALIGNMENT)
+        return section
+
+    def __len__(self):
+        return len(self._change_times)
+
+    @property
+    def result_count(self):
+        return len(self._statuses)
+
+    def path(self, position):
+        return os.fsdecode(self._paths[self._path_offsets[position]:
+                                       self._path_offsets[position + 1] - 1]
+                           .tobytes())
+
+    def paths(self):
+        if len(self) == 0:
+            return []
+        return os.fsdecode(self._paths[:-1].tobytes()).split("\0")
+
+    def change_time(self, position):
+        return self._change_times[position]
+
+    def _result_slice(self, position):
+        return slice(self._result_offsets[position],
+                     self._result_offsets[position + 1])
+
+    def row_length(self, position):
+        return (self._result_offsets[position + 1] -
+                self._result_offsets[position])
+
+    def row_lengths(self):
+        return list(map(operator.sub, self._result_offsets[1:],
+                        self._result_offsets[:-1]))
+
+    def count_statuses(self, statuses):
+        all_statuses = self._statuses.tobytes()
+        return sum(all_statuses.count(status) for status in statuses)
+
+    def positions_with_statuses(self, statuses):
+        all_statuses = self._statuses.tobytes()
+        positions = set()
+        for status in statuses:
+            offset = all_statuses.find(status)
+            while offset != -1:
+                position = bisect.bisect_right(self._result_offsets,
+                                               offset) - 1
+                positions.add(position)
+                offset = all_statuses.find(
+                    status, self._result_offsets[position + 1])
+        return positions
+
+    def statuses(self, position):
+        return self._statuses[self._result_slice(position)].tobytes()
+
+    def results(self, position):
+        slice_ = self._result_slice(position)
+        return [(self.tool_names[tool_id], status,
+                 self.compressions[compression_id])
+                for tool_id, status, compression_id in zip(
+                        self._tools[slice_], self._statuses[slice_],
+                        self._compressions[slice_])]
+
+    def find(self, path):
+        key = self._sort_key(path)
+        low, high = 0, len(self)
+        while low < high:
+            middle = (low + high) // 2
+            if self._sort_key(self.path(middle)) < key:
+                low = middle + 1
+            else:
+                high = middle
+        if low < len(self) and self.path(low) == path:
+            return low
+        raise KeyError(path)
+
+    def get(self, path):
+        try:
+            position = self.find(path)
+        except KeyError:
+            return None
+        return self.change_time(position), tuple(self.results(position))
+
+    def records(self):
+        for position in range(len(self)):
+            yield (self.path(position), self.change_time(position),
+                   self.results(position))
@@ -4,25 +4,34 @@
 # Copyright (C) 2015-2019 Andrew Hamilton. All rights reserved.
 # Licensed under the Artistic License 2.0.
 
+import asyncio
+import collections
 import contextlib
 import enum
 import functools
+import hashlib
 import importlib
-import importlib.util
+import importlib.machinery
 import importlib.resources
+import inspect
+import io
+import json
 import math
 import os
 import os.path
 import pickle
 import pwd
+import resource
 import shlex
 import shutil
+import signal
 import stat
 import subprocess
 import sys
 import tempfile
 import time
 import traceback
+import types
 
 import pygments
 import pygments.lexers
@@ -30,6 +39,7 @@ import pygments.styles
 import toml
 
 import eris
+import eris.coverage_index as coverage_index
 import eris.fill3 as fill3
 import eris.gut as gut
 import eris.lscolors as lscolors
@@ -39,6 +49,9 @@ import eris.termstr as termstr
 PYTHON_VERSION = "3.8"
 PYTHON_EXECUTABLE = "python" + PYTHON_VERSION
 CACHE_PATH = ".eris"
+COVERAGE_INDEX_PATH = os.path.join(CACHE_PATH, "coverage_index")
+TOOL_FINGERPRINTS_PATH = os.path.join(CACHE_PATH, "tool_fingerprints")
+IMPORTS_CACHE_PATH = os.path.join(CACHE_PATH, "imports_cache")
 
 
 if "PYGMENT_STYLE" not in os.environ:
@@ -55,6 +68,7 @@ class Status(enum.IntEnum):
     running = 6
     pending = 7
     timed_out = 8
+    limit_exceeded = 9
 
 
 _STATUS_COLORS = {Status.ok: termstr.Color.green,
@@ -63,12 +77,14 @@ _STATUS_COLORS = {Status.ok: termstr.Color.green,
                   Status.not_applicable: termstr.Color.grey_50,
                   Status.running: termstr.Color.blue,
                   Status.error: termstr.Color.red,
-                  Status.timed_out: termstr.Color.purple}
+                  Status.timed_out: termstr.Color.purple,
+                  Status.limit_exceeded: termstr.Color.orange}
 STATUS_MEANINGS = [
     (Status.normal, "Normal"), (Status.ok, "Ok"),
     (Status.problem, "Problem"), (Status.not_applicable, "Not applicable"),
     (Status.running, "Running"), (Status.timed_out, "Timed out"),
-    (Status.pending, "Pending"), (Status.error, "Error")
+    (Status.pending, "Pending"), (Status.error, "Error"),
+    (Status.limit_exceeded, "Exceeded a resource limit")
 ]
 STATUS_TO_TERMSTR = {
     status: termstr.TermStr(" ", termstr.CharStyle(bg_color=color))
@@ -86,6 +102,60 @@ _LS_COLOR_CODES = get_ls_color_codes()
 TIMEOUT = 60
 
 
+class ResourceLimitExceeded(Exception):
+    pass
+
+
+_LIMIT_SIGNALS = {signal.SIGXCPU: "cpu time", signal.SIGXFSZ: "output size"}
+
+
+def _limited_command(command, limits=None, shell=False):
+    # The limits are set by prlimit and nice as the command starts, so the
+    # processes it starts are limited too. A preexec_fn isn't safe in a
+    # worker with threads.
+    if shell:
+        command = ["/bin/sh", "-c", command]
+    if limits is None:
+        return command
+    megabyte = 2 ** 20
+    prefix = ["prlimit"]
+    for option, rlimit, value in [
+            ("as", resource.RLIMIT_AS, limits.address_space * megabyte),
+            ("cpu", resource.RLIMIT_CPU, limits.cpu_time),
+            ("nofile", resource.RLIMIT_NOFILE, limits.open_files),
+            ("fsize", resource.RLIMIT_FSIZE, limits.output_size * megabyte)]:
+        soft, hard = resource.getrlimit(rlimit)
+        if hard != resource.RLIM_INFINITY:
+            value = min(value, hard)
+        prefix.append(f"--{option}={value}:")  # Only the soft limit.
+    prefix.append("--")
+    if limits.niceness is not None:
+        increment = limits.niceness - os.getpriority(os.PRIO_PROCESS, 0)
+        if increment > 0:  # Only root can lower it.
+            prefix += ["nice", "-n", str(increment)]
+    return prefix + command
+
+
+def _check_limits(returncode):
+    if -returncode in _LIMIT_SIGNALS:
+        raise ResourceLimitExceeded(_LIMIT_SIGNALS[-returncode])
+
+
+def _run_limited(command, limits=None, timeout=None, shell=False, **kwargs):
+    with subprocess.Popen(_limited_command(command, limits, shell),
+                          stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                          text=True, **kwargs) as process:
+        try:
+            stdout, stderr = process.communicate(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+            raise
+    _check_limits(process.returncode)
+    return subprocess.CompletedProcess(command, process.returncode, stdout,
+                                       stderr)
+
+
 def _printable(text):
     return "".join(char if ord(char) > 31 or char in ["\n", "\t"] else "#"
                    for char in text)
@@ -95,31 +165,54 @@ def _fix_input(input_):
     return _printable(input_).expandtabs(tabsize=4)
 
 
-def _do_command(command, **kwargs):
-    completed_process = subprocess.run(command, stdout=subprocess.PIPE,
-                                       stderr=subprocess.PIPE, text=True,
-                                       **kwargs)
+def _do_command(command, limits=None, **kwargs):
+    completed_process = _run_limited(command, limits, **kwargs)
     return (_fix_input(completed_process.stdout),
             _fix_input(completed_process.stderr), completed_process.returncode)
 
 
-def _run_command(command, success_status=None, error_status=None,
-                 has_color=False, timeout=None, **kwargs):
+def _command_result(stdout, stderr, returncode, success_status, error_status,
+                    has_color):
     success_status = Status.ok if success_status is None else success_status
     error_status = Status.problem if error_status is None else error_status
     if has_color:
-        process = subprocess.run(command, stdout=subprocess.PIPE,
-                                 stderr=subprocess.PIPE, text=True,
-                                 timeout=timeout, **kwargs)
-        stdout, stderr, returncode = (
-            termstr.TermStr.from_term(process.stdout),
-            termstr.TermStr.from_term(process.stderr), process.returncode)
+        stdout, stderr = (termstr.TermStr.from_term(stdout),
+                          termstr.TermStr.from_term(stderr))
     else:
-        stdout, stderr, returncode = _do_command(command, timeout=timeout)
+        stdout, stderr = _fix_input(stdout), _fix_input(stderr)
     result_status = success_status if returncode == 0 else error_status
     return result_status, (stdout + stderr)
 
 
+def _run_command(command, success_status=None, error_status=None,
+                 has_color=False, timeout=None, limits=None, **kwargs):
+    process = _run_limited(command, limits, timeout=timeout, **kwargs)
+    return _command_result(process.stdout, process.stderr, process.returncode,
+                           success_status, error_status, has_color)
+
+
+def _decode(data):  # Decoded like subprocess.run(text=True) does.
+    return io.TextIOWrapper(io.BytesIO(data)).read()
+
+
+async def _run_command_async(command, success_status=None, error_status=None,
+                             has_color=False, timeout=None, limits=None):
+    process = await asyncio.create_subprocess_exec(
+        *_limited_command(command, limits), stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE)
+    try:
+        stdout, stderr = await asyncio.wait_for(process.communicate(),
+                                                timeout)
+    except asyncio.TimeoutError:
+        process.kill()
+        await process.wait()
+        raise subprocess.TimeoutExpired(command, timeout)
+    _check_limits(process.returncode)
+    return _command_result(_decode(stdout), _decode(stderr),
+                           process.returncode, success_status, error_status,
+                           has_color)
+
+
 def deps(**kwargs):
     def decorating_func(func):
         for key, value in kwargs.items():
@@ -164,9 +257,9 @@ def _syntax_highlight_using_path(text, path):
     return _syntax_highlight(text, lexer, style)
 
 
-def linguist(path):
+def linguist(path, limits=None):
     # Dep: ruby?, ruby-dev, libicu-dev, cmake, "gem install github-linguist"
-    return _run_command(["linguist", path], Status.normal)
+    return _run_command(["linguist", path], Status.normal, limits=limits)
 
 
 def _permissions_in_octal(permissions):
@@ -192,7 +285,7 @@ def _pretty_bytes(bytes):
 
 @deps(deps={"file", "coreutils"}, url="https://github.com/ahamilton/eris",
       executables={"file"})
-def metadata(path):
+def metadata(path, limits=None):
 
     def detail(value, unit):
         result = f" ({value})" if unit is None else f" ({value} {unit})"
@@ -212,10 +305,11 @@ def metadata(path):
     size = [_pretty_bytes(stat_result.st_size),
             detail(stat_result.st_size, "bytes")]
     stdout, *rest = _do_command(
-        ["file", "--dereference", "--brief", "--uncompress", "--mime", path])
+        ["file", "--dereference", "--brief", "--uncompress", "--mime", path],
+        limits)
     mime_type = stdout
     stdout, *rest = _do_command(
-        ["file", "--dereference", "--brief", "--uncompress", path])
+        ["file", "--dereference", "--brief", "--uncompress", path], limits)
     file_type = stdout
     permissions_value = [permissions,
                          detail(_permissions_in_octal(permissions), None)]
@@ -239,7 +333,7 @@ def metadata(path):
 
 
 @deps(deps={"pip/pygments"}, url="http://pygments.org/")
-def contents(path):
+def contents(path, limits=None):
     with open(path) as file_:
         try:
             head = file_.read(200)
@@ -264,29 +358,51 @@ def _is_python_test_file(path):
     return path.endswith("_test.py") or path.startswith("test_")
 
 
-@deps(url="https://docs.python.org/3/library/unittest.html")
-def python_unittests(path):
+@deps(url="https://docs.python.org/3/library/unittest.html",
+      resource_class="heavy", requires=["python_syntax"], uses_imports=True)
+def python_unittests(path, limits=None):
     if _is_python_test_file(path):
         command = ([path] if _has_shebang_line(path)
                    else [PYTHON_EXECUTABLE, path])
-        stdout, stderr, returncode = _do_command(command, timeout=TIMEOUT)
+        stdout, stderr, returncode = _do_command(command, limits,
+                                                 timeout=TIMEOUT)
         status = Status.ok if returncode == 0 else Status.problem
         return status, (stdout + "\n" + stderr)
     else:
         return Status.not_applicable, "No tests."
 
 
+def _record_coverage(path, temp_dir, env, limits=None):
+    json_path = os.path.join(temp_dir, "coverage.json")
+    try:
+        process = _run_limited(
+            [PYTHON_EXECUTABLE, "-m", "coverage", "json", "-o", json_path],
+            limits, timeout=TIMEOUT, env=env)
+    except (subprocess.TimeoutExpired, ResourceLimitExceeded):
+        return
+    if process.returncode != 0:
+        return
+    with contextlib.suppress(OSError, ValueError, KeyError):
+        with open(json_path) as json_file:
+            coverage_index.write_record(COVERAGE_INDEX_PATH, path,
+                                        json.load(json_file))
+
+
 @deps(deps={"pip/pytest", "pip/pytest-cov"},
-      url="https://docs.pytest.org/en/latest/", executables={"pytest"})
-def pytest(path):
+      url="https://docs.pytest.org/en/latest/", executables={"pytest"},
+      resource_class="heavy", resource_limits={"memory": 4096},
+      requires=["python_syntax"], uses_imports=True, records_coverage=True)
+def pytest(path, limits=None):
     command = [PYTHON_EXECUTABLE, "-m", "pytest", "--cov=.",
                "--doctest-modules", "--color=yes", path]
     with tempfile.TemporaryDirectory() as temp_dir:
         env = os.environ.copy()
         env["COVERAGE_FILE"] = os.path.join(temp_dir, "coverage")
-        process = subprocess.run(command, stdout=subprocess.PIPE,
-                                 stderr=subprocess.PIPE, text=True,
-                                 timeout=TIMEOUT, env=env)
+        process = _run_limited(command, limits, timeout=TIMEOUT, env=env)
+        if process.returncode == 5:  # No tests were collected.
+            coverage_index.remove_record(COVERAGE_INDEX_PATH, path)
+        else:
+            _record_coverage(path, temp_dir, env, limits)
     stdout, stderr, returncode = (
         termstr.TermStr.from_term(process.stdout),
         termstr.TermStr.from_term(process.stderr), process.returncode)
@@ -297,11 +413,12 @@ def pytest(path):
     return status, (stdout + stderr)
 
 
-@deps(deps={"pip/mypy"}, url="http://mypy-lang.org/", executables={"mypy"})
-def mypy(path):
+@deps(deps={"pip/mypy"}, url="http://mypy-lang.org/", executables={"mypy"},
+      resource_class="heavy", requires=["python_syntax"], uses_imports=True)
+def mypy(path, limits=None):
     stdout, stderr, returncode = _do_command(
         [PYTHON_EXECUTABLE, "-m", "mypy", "--ignore-missing-imports", path],
-        timeout=TIMEOUT)
+        limits, timeout=TIMEOUT)
     status = Status.ok if returncode == 0 else Status.problem
     return status, stdout
 
@@ -313,8 +430,9 @@ def _colorize_coverage_report(lines):
                            for line in lines])
 
 
-@deps(deps={"pip/coverage"}, url="https://coverage.readthedocs.io/")
-def python_coverage(path):
+@deps(deps={"pip/coverage"}, url="https://coverage.readthedocs.io/",
+      resource_class="heavy", requires=["python_syntax"], uses_imports=True)
+def python_coverage(path, limits=None):
     coverage_path = ".coverage"
     if not os.path.exists(coverage_path):
         return Status.not_applicable, f'No "{coverage_path}" file.'
@@ -326,7 +444,7 @@ def python_coverage(path):
     with tempfile.TemporaryDirectory() as temp_dir:
         stdout, stderr, returncode = _do_command(
             [PYTHON_EXECUTABLE, "-m", "coverage",
-             "annotate", "--directory", temp_dir, path])
+             "annotate", "--directory", temp_dir, path], limits)
         if returncode != 0:
             return Status.problem, stdout
         cover_filename = path.replace("/", "_") + ",cover"
@@ -337,8 +455,8 @@ def python_coverage(path):
     return status, _colorize_coverage_report(lines)
 
 
-@deps(url="https://github.com/ahamilton/eris")
-def python_gut(path):
+@deps(url="https://github.com/ahamilton/eris", requires=["python_syntax"])
+def python_gut(path, limits=None):
     with open(path) as module_file:
         output = gut.gut_module(module_file.read())
     source_widget = _syntax_highlight_using_path(_fix_input(output), path)
@@ -357,9 +475,11 @@ def _colorize_mccabe(text):
         for line in text.splitlines(keepends=True)])
 
 
-@deps(deps={"pip/mccabe"}, url="https://pypi.org/project/mccabe/")
-def python_mccabe(path):
-    stdout, *rest = _do_command([PYTHON_EXECUTABLE, "-m", "mccabe", path])
+@deps(deps={"pip/mccabe"}, url="https://pypi.org/project/mccabe/",
+      requires=["python_syntax"])
+def python_mccabe(path, limits=None):
+    stdout, *rest = _do_command([PYTHON_EXECUTABLE, "-m", "mccabe", path],
+                                limits)
     max_score = 0
     with contextlib.suppress(ValueError):  # When there are no lines
         max_score = max(_get_mccabe_line_score(line)
@@ -378,26 +498,26 @@ def python_mccabe(path):
 
 @deps(deps={"perltidy"}, url="http://perltidy.sourceforge.net/",
       executables={"perltidy"})
-def perltidy(path):
-    stdout, *rest = _do_command(["perltidy", "-st", path])
+def perltidy(path, limits=None):
+    stdout, *rest = _do_command(["perltidy", "-st", path], limits)
     return Status.normal, _syntax_highlight_using_path(stdout, path)
 
 
 @deps(deps={"tidy"}, url="https://www.html-tidy.org/", executables={"tidy"})
-def html_syntax(path):
+def html_syntax(path, limits=None):
     # Stop tidy from modifiying input path by piping in input.
-    tidy_process = subprocess.run(f"cat {shlex.quote(path)} | tidy",
-                                  capture_output=True, text=True, shell=True)
+    tidy_process = _run_limited(f"cat {shlex.quote(path)} | tidy", limits,
+                                shell=True)
     status = Status.ok if tidy_process.returncode == 0 else Status.problem
     return status, _fix_input(tidy_process.stderr)
 
 
 @deps(deps={"pandoc"}, url="https://pandoc.org/", executables={"pandoc"})
-def pandoc(path):
+def pandoc(path, limits=None):
     with tempfile.TemporaryDirectory() as temp_dir:
         temp_path = os.path.join(temp_dir, "temp.html")
-        _do_command(["pandoc", "-t", "html", "-o", temp_path, path])
-        return elinks(temp_path)
+        _do_command(["pandoc", "-t", "html", "-o", temp_path, path], limits)
+        return elinks(temp_path, limits)
 
 
 MAX_IMAGE_SIZE = 200
@@ -427,7 +547,7 @@ def _image_to_text(image):
 
 
 @deps(deps={"pip/pillow"}, url="http://python-pillow.github.io/")
-def pil(path):
+def pil(path, limits=None):
     import PIL.Image
     with open(path, "rb") as image_file:
         with PIL.Image.open(image_file).convert("RGB") as image:
@@ -437,7 +557,7 @@ def pil(path):
 
 
 @deps(deps={"pip/svglib"}, url="https://github.com/deeplook/svglib")
-def svglib(path):
+def svglib(path, limits=None):
     import svglib.svglib
     import reportlab.graphics.renderPM
     drawing = svglib.svglib.svg2rlg(path)
@@ -449,28 +569,39 @@ def svglib(path):
 
 @deps(deps={"go/github.com/golang/go/src/cmd/godoc"},
       url="https://github.com/golang/go", executables={"godoc"})
-def godoc(path):
+def godoc(path, limits=None):
     with tempfile.TemporaryDirectory() as temp_dir:
         symlink_path = os.path.join(temp_dir, "file.go")
         os.symlink(os.path.abspath(path), symlink_path)
-        stdout, stderr, returncode = _do_command(["godoc", "."], cwd=temp_dir)
+        stdout, stderr, returncode = _do_command(["godoc", "."], limits,
+                                                 cwd=temp_dir)
         os.remove(symlink_path)
     return Status.normal, stdout
 
 
 def make_tool_function(dependencies, command, url=None, success_status=None,
-                       error_status=None, has_color=False, timeout=None):
+                       error_status=None, has_color=False, timeout=None,
+                       resource_class="light", resource_limits=None,
+                       requires=()):
     if url is None:
         url = dependencies[0]
     command_parts = command.split()
     executables = set([command_parts[0]])
     success_status = None if success_status is None else Status[success_status]
     error_status = None if error_status is None else Status[error_status]
-    @deps(deps=set(dependencies), url=url, executables=executables)
-    def func(path):
+    @deps(deps=set(dependencies), url=url, executables=executables,
+          resource_class=resource_class, resource_limits=resource_limits or {},
+          requires=requires)
+    def func(path, limits=None):
         return _run_command(command_parts + [path], success_status,
-                            error_status, has_color, timeout)
+                            error_status, has_color, timeout, limits)
+
+    async def run_async(path, limits=None):
+        return await _run_command_async(command_parts + [path],
+                                        success_status, error_status,
+                                        has_color, timeout, limits)
     func.command = command
+    func.run_async = run_async
     return func
 
 
@@ -479,11 +610,40 @@ with importlib.resources.open_text(eris, "tools.toml") as tools_toml_file:
     tools_toml = toml.load(tools_toml_file)
 tools_for_extensions = tools_toml["tools_for_extensions"]
 del tools_toml["tools_for_extensions"]
+ResourceClass = collections.namedtuple(
+    "ResourceClass", ["name", "cpu_weight", "memory", "max_instances"],
+    defaults=[None])
+RESOURCE_CLASSES = {name: ResourceClass(name, **resource_class)
+                    for name, resource_class
+                    in tools_toml["resource_classes"].items()}
+del tools_toml["resource_classes"]
+ResourceLimits = collections.namedtuple(  # The niceness is set per job.
+    "ResourceLimits", list(tools_toml["resource_limits"].keys()) +
+    ["niceness"], defaults=[None])
+DEFAULT_RESOURCE_LIMITS = ResourceLimits(**tools_toml["resource_limits"])
+del tools_toml["resource_limits"]
 for tool_name, tool_toml in tools_toml.items():
     tool_func = make_tool_function(**tool_toml)
     tool_func.__name__ = tool_func.__qualname__ = tool_name
+    tool_func.toml_stanza = tool_toml
     globals()[tool_name] = tool_func
 
+
+def _is_tool(object_):
+    return callable(object_) and hasattr(object_, "url")
+
+
+def _check_requirements(tools_):
+    for tool in tools_:
+        for name in getattr(tool, "requires", ()):
+            if not _is_tool(globals().get(name)):
+                raise ValueError(
+                    f"{tool.__name__} requires an unknown tool: {name!r}")
+
+
+_check_requirements([object_ for object_ in list(globals().values())
+                     if _is_tool(object_)])
+
 #############################
 
 
@@ -537,20 +697,100 @@ def compression_open_func(compression):
             importlib.import_module(compression).open)
 
 
+def _save_pickle(object_, path, compression):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    dump_pickle_safe(object_, path, open=compression_open_func(compression))
+
+
+_unsaved_results = {}  # pickle path -> result, while it is being saved.
+
+
+class _ResultRow:
+    """The storage of a result that isn't part of a summary entry."""
+
+    __slots__ = ("summary", "appearance_cache", "_status", "_compression",
+                 "_scroll_position")
+
+    def __init__(self):
+        self.summary = None
+        self.appearance_cache = None
+        self._status = Status.pending
+        self._compression = None
+        self._scroll_position = (0, 0)
+
+    def status(self, index):
+        return self._status
+
+    def set_status(self, index, status):
+        self._status = status
+
+    def compression(self, index):
+        return self._compression
+
+    def set_compression(self, index, compression):
+        self._compression = compression
+
+    def scroll_position(self, index):
+        return self._scroll_position
+
+    def set_scroll_position(self, index, position):
+        self._scroll_position = position
+
+    def requirement_statuses(self, tool):
+        return []
+
+
+@functools.lru_cache()
+def status_cursor(status):
+    return termstr.TermStr("+", termstr.CharStyle(
+        fg_color=termstr.Color.white, bg_color=_STATUS_COLORS.get(status),
+        is_bold=True))
+
+
 class Result:
+    """A view of the result of a tool, stored in a column of an entry."""
 
     COMPLETED_STATUSES = {
         Status.ok, Status.problem, Status.normal, Status.error,
-        Status.not_applicable, Status.timed_out}
+        Status.not_applicable, Status.timed_out, Status.limit_exceeded}
 
-    def __init__(self, path, tool):
+    __slots__ = ("path", "tool", "entry", "index", "is_highlighted")
+
+    def __init__(self, path, tool, entry=None, index=0):
         self.path = path
         self.tool = tool
-        self.compression = None
-        self.scroll_position = (0, 0)
-        self.status = Status.pending
+        self.entry = _ResultRow() if entry is None else entry
+        self.index = index
         self.is_highlighted = False
 
+    def __eq__(self, other):
+        if not isinstance(other, Result):
+            return NotImplemented
+        return self.path == other.path and self.tool == other.tool
+
+    def __hash__(self):
+        return hash((self.path, self.tool))
+
+    @property
+    def status(self):
+        return Status(self.entry.status(self.index))
+
+    @property
+    def compression(self):
+        return self.entry.compression(self.index)
+
+    @compression.setter
+    def compression(self, compression):
+        self.entry.set_compression(self.index, compression)
+
+    @property
+    def scroll_position(self):
+        return self.entry.scroll_position(self.index)
+
+    @scroll_position.setter
+    def scroll_position(self, position):
+        self.entry.set_scroll_position(self.index, position)
+
     def pickle_path(self):
         return os.path.join(CACHE_PATH, self.path + "-" + self.tool.__name__)
 
@@ -560,6 +800,8 @@ class Result:
         unknown_label = fill3.Text("?")
         if self.status == Status.pending or self.compression is None:
             return unknown_label
+        with contextlib.suppress(KeyError):
+            return _unsaved_results[self.pickle_path()]
         try:
             with compression_open_func(self.compression)(
                     self.pickle_path(), "rb") as pickle_file:
@@ -569,14 +811,30 @@ class Result:
 
     @result.setter
     def result(self, value):
-        os.makedirs(os.path.dirname(self.pickle_path()), exist_ok=True)
-        dump_pickle_safe(value, self.pickle_path(),
-                         open=compression_open_func(self.compression))
+        _save_pickle(value, self.pickle_path(), self.compression)
+        Result.result.fget.evict(self)
+
+    def save_result_in_background(self, value):
+        """Like setting the result, but saved in a thread.
+
+        Meanwhile the result is kept in memory."""
+        path = self.pickle_path()
+        _unsaved_results[path] = value
         Result.result.fget.evict(self)
 
+        def on_saved(future):
+            if _unsaved_results.get(path) is value:
+                del _unsaved_results[path]
+        asyncio.get_event_loop().run_in_executor(
+            None, _save_pickle, value, path, self.compression
+        ).add_done_callback(on_saved)
+
     def set_status(self, status):
-        self.status = status
+        old_status = self.status
+        self.entry.set_status(self.index, status)
         self.entry.appearance_cache = None
+        if self.entry.summary is not None:
+            self.entry.summary.on_status_changed(self, old_status)
 
     @property
     def is_completed(self):
@@ -585,6 +843,18 @@ class Result:
     async def run(self, log, appearance_changed_event, runner):
         tool_name = tool_name_colored(self.tool, self.path)
         path = path_colored(self.path)
+        failed_requirements = [
+            requirement for requirement, status
+            in self.entry.requirement_statuses(self.tool)
+            if status == Status.problem]
+        if failed_requirements:  # Not worth running.
+            requirement_name = failed_requirements[0].__name__
+            self.result = fill3.Text(f"Not run, because {requirement_name} "
+                                     "found problems.")
+            self.set_status(Status.not_applicable)
+            appearance_changed_event.set()
+            log.log_message(["Skipped ", tool_name, " on ", path, "."])
+            return
         log.log_message(["Running ", tool_name, " on ", path, "…"])
         self.set_status(Status.running)
         appearance_changed_event.set()
@@ -592,8 +862,13 @@ class Result:
         new_status = await runner.run_tool(self.path, self.tool)
         Result.result.fget.evict(self)
         end_time = time.time()
+        if self.status != Status.running:  # Reset because the file changed.
+            new_status = Status.pending
         self.set_status(new_status)
         appearance_changed_event.set()
+        if new_status == Status.pending:
+            log.log_message(["Cancelled ", tool_name, " on ", path, "."])
+            return
         log.log_message(
             ["Finished running ", tool_name, " on ", path, ". ",
              STATUS_TO_TERMSTR[new_status],
@@ -603,9 +878,7 @@ class Result:
         self.set_status(Status.pending)
 
     def _get_cursor(self):
-        status_color = _STATUS_COLORS.get(self.status, None)
-        return termstr.TermStr("+", termstr.CharStyle(
-            fg_color=termstr.Color.white, bg_color=status_color, is_bold=True))
+        return status_cursor(self.status)
 
     def appearance_min(self):
         return ([self._get_cursor() if self.is_highlighted else
@@ -615,6 +888,7 @@ class Result:
         return self.pickle_path() + ".pages"
 
     def delete(self):
+        _unsaved_results.pop(self.pickle_path(), None)
         with contextlib.suppress(FileNotFoundError):
             os.remove(self.pickle_path())
         with contextlib.suppress(FileNotFoundError):
@@ -656,6 +930,117 @@ def tools_all():
     return tools_
 
 
+def resource_class(tool):
+    return RESOURCE_CLASSES[getattr(tool, "resource_class", "light")]
+
+
+def tool_resource_limits(tool):
+    return DEFAULT_RESOURCE_LIMITS._replace(
+        **getattr(tool, "resource_limits", {}))
+
+
+def tool_requirements(tool):
+    """The tools that must run on a file first, and not find problems."""
+    return [globals()[name] for name in getattr(tool, "requires", ())]
+
+
+def records_coverage(tool):
+    """Whether the tool saves the lines its tests run in the coverage index."""
+    return getattr(tool, "records_coverage", False)
+
+
+def uses_imports(tool):
+    """Whether the tool's result depends on the modules a file imports."""
+    return getattr(tool, "uses_imports", False)
+
+
+def _module_origin(module_name):
+    # The module is found on sys.path without importing its packages.
+    search_path, spec = None, None
+    parts = module_name.split(".")
+    for index in range(len(parts)):
+        if index > 0 and search_path is None:
+            return None  # Its parent isn't a package.
+        try:
+            spec = importlib.machinery.PathFinder.find_spec(
+                ".".join(parts[:index + 1]), search_path)
+        except (ImportError, ValueError):
+            return None
+        if spec is None:
+            return None
+        search_path = spec.submodule_search_locations
+    return spec.origin
+
+
+def _executable_paths(tool):
+    if (hasattr(tool, "command") and
+        tool.command.startswith(f"{PYTHON_EXECUTABLE} -m ")):
+        return [_module_origin(tool.command.split()[2])]
+    return [shutil.which(executable)
+            for executable in sorted(getattr(tool, "executables", ()))]
+
+
+def _executable_version(path):
+    # The install time stands in for the version, which would be slow to ask
+    # for, and isn't asked for the same way by every executable.
+    if path is None:
+        return None
+    path = os.path.realpath(path)
+    with contextlib.suppress(OSError):
+        file_stat = os.stat(path)
+        return path, file_stat.st_size, file_stat.st_mtime_ns
+    return path
+
+
+def _code_names(code):
+    yield from code.co_names
+    for constant in code.co_consts:
+        if isinstance(constant, types.CodeType):
+            yield from _code_names(constant)
+
+
+def _tool_functions(tool):
+    """The tool's functions, and the helpers in its module they use."""
+    functions = {}
+    pending = [tool, getattr(tool, "run_async", None)]
+    while pending:
+        function = inspect.unwrap(pending.pop())
+        if (not isinstance(function, types.FunctionType) or
+                function.__module__ != tool.__module__ or
+                function in functions):
+            continue
+        functions[function] = None
+        pending.extend(function.__globals__.get(name)
+                       for name in _code_names(function.__code__))
+        for cell in function.__closure__ or ():
+            with contextlib.suppress(ValueError):  # An empty cell.
+                pending.append(cell.cell_contents)
+    return list(functions)
+
+
+@functools.lru_cache()
+def tool_fingerprint(tool):
+    """A digest of what a tool's results depend on, besides the file.
+
+    That is its stanza in tools.toml, its source with its helpers' source,
+    and its executables."""
+    parts = [sorted(getattr(tool, "toml_stanza", {}).items()),
+             [inspect.getsource(function)
+              for function in _tool_functions(tool)],
+             [_executable_version(path) for path in _executable_paths(tool)]]
+    return hashlib.blake2b(repr(parts).encode("utf-8")).hexdigest()
+
+
+def tools_for_paths_fingerprint():
+    """A digest of what decides the tools of each path."""
+    parts = [[(extensions, [tool.__name__ for tool in tools_])
+              for extensions, tools_ in TOOLS_FOR_EXTENSIONS],
+             [tool.__name__ for tool in generic_tools()],
+             sorted(tool.__name__ for tool in tools_all()
+                    if is_tool_available(tool)), os.path.exists(".git")]
+    return hashlib.blake2b(repr(parts).encode("utf-8")).hexdigest()
+
+
 def tool_dependencies(tool):
     try:
         return tool.deps
@@ -683,7 +1068,7 @@ def splitext(path):
 def is_tool_available(tool):
     if (hasattr(tool, "command") and
         tool.command.startswith(f"{PYTHON_EXECUTABLE} -m ")):
-        return importlib.util.find_spec(tool.command.split()[2]) is not None
+        return _module_origin(tool.command.split()[2]) is not None
     try:
         return all(shutil.which(executable) for executable in tool.executables)
     except AttributeError:
@@ -698,17 +1083,35 @@ def tools_for_path(path):
     return [tool for tool in tools if is_tool_available(tool)]
 
 
-def run_tool_no_error(path, tool):
-    try:
-        return tool(path)
-    except subprocess.TimeoutExpired:
+def _error_result(error):
+    if isinstance(error, subprocess.TimeoutExpired):
         return Status.timed_out, "Timed out"
-    except UnicodeDecodeError:
+    if isinstance(error, UnicodeDecodeError):
         return Status.not_applicable, "Result not in UTF-8"
-    except Exception:
-        return Status.error, _syntax_highlight(
-            traceback.format_exc(), pygments.lexers.PythonTracebackLexer(),
-            pygments.styles.get_style_by_name(os.environ["PYGMENT_STYLE"]))
+    if isinstance(error, ResourceLimitExceeded):
+        return Status.limit_exceeded, f"Exceeded the {error} limit"
+    return Status.error, _syntax_highlight(
+        traceback.format_exc(), pygments.lexers.PythonTracebackLexer(),
+        pygments.styles.get_style_by_name(os.environ["PYGMENT_STYLE"]))
+
+
+def run_tool_no_error(path, tool, limits=None):
+    limits = tool_resource_limits(tool) if limits is None else limits
+    try:
+        return tool(path, limits)
+    except Exception as error:
+        return _error_result(error)
+
+
+async def run_tool_no_error_async(path, tool, limits=None):
+    """Command tools run concurrently, other tools block until finished."""
+    if not hasattr(tool, "run_async"):
+        return run_tool_no_error(path, tool, limits)
+    limits = tool_resource_limits(tool) if limits is None else limits
+    try:
+        return await tool.run_async(path, limits)
+    except Exception as error:
+        return _error_result(error)
 
 
 def _convert_lscolor_code_to_charstyle(lscolor_code):
@@ -83,9 +83,11 @@ def main():
                                "summary.pickle")
     with gzip.open(pickle_path, "rb") as file_:
         screen = pickle.load(file_)
-    summary_page = make_summary_page(project_name, screen._summary)
+    summary = screen._summary
+    summary.load_entries()
+    summary_page = make_summary_page(project_name, summary)
     index = {}
-    for row in screen._summary._entries:
+    for row in summary._entries:
         for result in row:
             index[(result.path[2:], result.tool.__name__)] = result.result
     run()
@@ -4,79 +4,438 @@
 # Licensed under the Artistic License 2.0.
 
 import asyncio
+import collections
 import contextlib
+import hmac
+import itertools
+import json
+import math
+import multiprocessing
 import os
+import shlex
 import signal
+import socket
+import subprocess
+import sys
+import time
+import zlib
 
 import eris.fill3 as fill3
+import eris.termstr as termstr
 import eris.tools as tools
 import eris.paged_list
 
 
+SECRET_VARIABLE = "ERIS_WORKER_SECRET"  # Shared by eris and the listener.
+_MAX_LINE_LENGTH = 1024
+
+
+def _child_pids(pid):
+    pids = []
+    with contextlib.suppress(OSError):  # The process has exited.
+        for thread_id in os.listdir(f"/proc/{pid}/task"):
+            with open(f"/proc/{pid}/task/{thread_id}/children") as file_:
+                pids.extend(int(child) for child in file_.read().split())
+    return pids
+
+
+def process_group_memory(pids):
+    """Returns the resident memory of each process group in megabytes.
+
+    Only the processes given and their descendants are measured, rather
+    than every process on the machine."""
+    memory = collections.Counter()
+    page_size = os.sysconf("SC_PAGE_SIZE")
+    pids = list(pids)
+    while pids:
+        pid = pids.pop()
+        try:
+            with open(f"/proc/{pid}/stat", "rb") as stat_file:
+                stat = stat_file.read()
+        except OSError:  # The process has exited.
+            continue
+        fields = stat[stat.rindex(b")") + 2:].split()
+        memory[int(fields[2])] += int(fields[21]) * page_size / 2 ** 20
+        pids.extend(_child_pids(pid))
+    return memory
+
+
+async def watch_memory(workers_func, interval=1):
+    while True:
+        await asyncio.sleep(interval)
+        workers = workers_func()
+        group_memory = process_group_memory(
+            worker_.child_pgid for worker_ in workers
+            if worker_.child_pgid is not None)
+        for worker_ in workers:
+            worker_.check_memory(group_memory)
+
+
+def pressure(resource):
+    """Returns the percentage of time some tasks stalled on the resource.
+
+    This is the ten second average from the kernel's pressure stall
+    information, or None where that isn't available."""
+    try:
+        with open(f"/proc/pressure/{resource}") as pressure_file:
+            line = pressure_file.readline()  # "some avg10=1.23 avg60=..."
+    except OSError:
+        return None
+    return float(line.split()[1].partition("=")[2])
+
+
+def scaling_decision(load, cpu_pressure, memory_pressure, pending_count,
+                     worker_count, max_worker_count):
+    """Returns 1 to add a worker, -1 to remove one or 0 to leave the pool.
+
+    The load is the load average per cpu. The pressures may be None."""
+    cpu_pressure = cpu_pressure or 0
+    memory_pressure = memory_pressure or 0
+    if load > 1.25 or cpu_pressure > 40 or memory_pressure > 5:
+        return -1 if worker_count > 1 else 0
+    is_idle = load < 0.75 and cpu_pressure < 10 and memory_pressure < 1
+    return int(is_idle and pending_count > worker_count and
+               worker_count < max_worker_count)
+
+
+class LocalTransport:
+
+    is_remote = False
+    address = "localhost"
+
+    async def connect(self):
+        process = await asyncio.create_subprocess_exec(
+            "eris-worker", stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
+            preexec_fn=os.setsid)
+        return process.stdout, process.stdin, process
+
+
+class CommandTransport:
+    """A remote worker started by a command, e.g. with ssh."""
+
+    is_remote = True
+
+    def __init__(self, command):
+        self.address = command
+
+    async def connect(self):
+        process = await asyncio.create_subprocess_shell(
+            self.address, stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL,
+            preexec_fn=os.setsid)
+        return process.stdout, process.stdin, process
+
+
+class TcpTransport:
+    """A remote worker started by "eris-worker --listen" on connection."""
+
+    is_remote = True
+
+    def __init__(self, host, port):
+        self.host, self.port = host, port
+        self.address = f"{host}:{port}"
+
+    async def connect(self):
+        secret = os.environ.get(SECRET_VARIABLE)
+        if secret is None:
+            raise OSError(f"{SECRET_VARIABLE} isn't set")
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        challenge = (await reader.readline()).rstrip(b"\n")
+        writer.write(_digest(secret, challenge) + b"\n")
+        return reader, writer, None
+
+
+def make_transport(address):
+    """Returns the transport for a remote worker's address.
+
+    The address is "HOST:PORT" for a worker listening over TCP, or
+    "ssh:HOST:DIRECTORY" for one started with ssh in a checkout."""
+    if address.startswith("ssh:"):
+        host, directory = address[len("ssh:"):].split(":", 1)
+        remote_command = (f"cd {shlex.quote(directory)} && "
+                          "eris-worker --remote")
+        return CommandTransport(
+            f"ssh {shlex.quote(host)} {shlex.quote(remote_command)}")
+    host, port = address.rsplit(":", 1)
+    return TcpTransport(host, int(port))
+
+
 class Worker:
 
     AUTOSAVE_MESSAGE = "Auto-saving…"
+    BULK_NICENESS = 19
     unsaved_jobs_total = 0
 
-    def __init__(self, is_being_tested, compression):
+    def __init__(self, is_being_tested, compression, concurrency=1,
+                 cpu_budget=None, has_own_slot=True, transport=None,
+                 result_threshold=0):
         self.is_being_tested = is_being_tested
         self.compression = compression
-        self.result = None
+        self.concurrency = concurrency
+        self.cpu_budget = (asyncio.Semaphore(multiprocessing.cpu_count())
+                           if cpu_budget is None else cpu_budget)
+        self.has_own_slot = has_own_slot
+        self.transport = LocalTransport() if transport is None else transport
+        self.result_threshold = result_threshold
+        self.results = []  # Queued jobs, the first ones are running.
         self.process = None
+        self._writer = None
         self.child_pgid = None
+        self.job_start_time = None
+        self.is_cancelled = False
+        self.is_memory_exceeded = False
+        self.is_urgent = False
+        self.is_paused = False
+        self._is_killed = False
+        self.is_retiring = False
+        self._token_count = 0
+        self._jobs = {}  # job id -> (path, tool, future)
+        self._bulk_job_ids = set()  # Jobs started at the bulk priority.
+        self._job_ids = itertools.count()
+
+    @property
+    def running_results(self):
+        return self.results[:self.concurrency]
 
     async def create_process(self):
-        create = asyncio.create_subprocess_exec(
-            "eris-worker", stdin=asyncio.subprocess.PIPE,
-            stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
-            preexec_fn=os.setsid)
-        self.process = await create
-        pid_line = await self.process.stdout.readline()
-        self.child_pgid = int(pid_line.strip())
-        os.setpriority(os.PRIO_PGRP, self.child_pgid, 19)
-        self.process.stdin.write(f"{self.compression}\n".encode("utf-8"))
+        reader, self._writer, self.process = await self.transport.connect()
+        pid_line = await reader.readline()
+        # Remote process groups can't be signalled or measured.
+        self.child_pgid = (None if self.transport.is_remote
+                           else int(pid_line.strip()))
+        self.is_urgent = False
+        self.is_paused = False
+        self._writer.write(f"{self.compression}\n{self.concurrency}\n"
+                           f"{self.result_threshold}\n".encode("utf-8"))
+        asyncio.ensure_future(self._read_statuses(reader))
 
-    async def run_tool(self, path, tool):
+    def _write_job(self, job_id, path, tool, is_urgent):
+        self._bulk_job_ids &= self._jobs.keys()
+        if is_urgent:
+            self._bulk_job_ids.discard(job_id)
+        else:
+            self._bulk_job_ids.add(job_id)
+        self._writer.write(f"{job_id}\n{tool.__qualname__}\n{path}\n"
+                           f"{int(is_urgent)}\n".encode("utf-8"))
+
+    async def _read_statuses(self, reader):
         while True:
-            self.process.stdin.write(
-                f"{tool.__qualname__}\n{path}\n".encode("utf-8"))
-            data = await self.process.stdout.readline()
-            if data == b"":
-                await self.create_process()
-            else:
+            line = await reader.readline()
+            if line == b"":
                 break
-        return tools.Status(int(data))
+            job_id, status, *size = line.split()
+            if size:  # The result was sent back, compressed.
+                try:
+                    data = await reader.readexactly(int(size[0]))
+                except asyncio.IncompleteReadError:
+                    break
+            path, tool, future = self._jobs.pop(int(job_id))
+            if size:
+                try:
+                    text = _load_text(zlib.decompress(data))
+                except (zlib.error, ValueError, KeyError, TypeError,
+                        IndexError):
+                    status = tools.Status.error.value
+                    text = "The worker sent back an invalid result."
+                result = tools.Result(path, tool)
+                result.compression = self.compression
+                result.save_result_in_background(make_result_widget(
+                    text, result, self.compression))
+            future.set_result(tools.Status(int(status)))
+        if self._is_killed:
+            return
+        try:
+            await self.create_process()
+        except OSError:  # The remote worker is unreachable, so give up.
+            for path, tool, future in self._jobs.values():
+                future.set_result(tools.Status.pending)
+            self._jobs.clear()
+            self.is_retiring = True
+            return
+        is_cancelled, self.is_cancelled = self.is_cancelled, False
+        if self.is_memory_exceeded:
+            self.is_memory_exceeded = False
+            if self._jobs:
+                self._fail_running_job("Exceeded the memory limit")
+            is_cancelled = True
+        if is_cancelled:  # All the queued jobs are left pending.
+            for path, tool, future in self._jobs.values():
+                future.set_result(tools.Status.pending)
+            self._jobs.clear()
+        else:  # The worker crashed, so try again.
+            for job_id, (path, tool, future) in self._jobs.items():
+                self._write_job(job_id, path, tool,
+                                self._is_visible(path, tool))
+
+    def _save_result(self, path, tool, text):
+        result = tools.Result(path, tool)
+        result.compression = self.compression
+        result.result = make_result_widget(text, result, self.compression)
+
+    def _fail_running_job(self, text):
+        job_id = next(iter(self._jobs))
+        path, tool, future = self._jobs.pop(job_id)
+        self._save_result(path, tool, text)
+        future.set_result(tools.Status.limit_exceeded)
+
+    def check_memory(self, group_memory):
+        # If the concurrency is more than one, the first running job is
+        # blamed.
+        running_tools = [tool for path, tool, future
+                         in list(self._jobs.values())[:self.concurrency]]
+        limit = sum(tools.tool_resource_limits(tool).memory
+                    for tool in running_tools)
+        if running_tools and group_memory.get(self.child_pgid, 0) > limit:
+            self.is_memory_exceeded = True
+            self._signal(signal.SIGKILL)
+
+    def _is_visible(self, path, tool):
+        for result in self.results:
+            if result.path == path and result.tool is tool:
+                summary = result.entry.summary
+                return summary is not None and summary.is_visible(result.entry)
+        return False
+
+    def is_running_in_bulk(self, result):
+        """Whether the result is running, at the bulk priority."""
+        return any(job_id in self._bulk_job_ids and path == result.path and
+                   tool is result.tool for job_id, (path, tool, future)
+                   in list(self._jobs.items())[:self.concurrency])
+
+    async def run_tool(self, path, tool):
+        job_id = next(self._job_ids)
+        future = asyncio.get_event_loop().create_future()
+        self._jobs[job_id] = path, tool, future
+        self._write_job(job_id, path, tool, self._is_visible(path, tool))
+        return await future
+
+    async def _run_job(self, result, summary, screen, log,
+                       appearance_changed_event):
+        self.results.append(result)
+        if len(self.results) <= self.concurrency:
+            self._start_job(summary)
+        try:
+            await result.run(log, appearance_changed_event, self)
+        finally:
+            is_running = result in self.running_results
+            self.results.remove(result)
+            if is_running and len(self.results) >= self.concurrency:
+                self._start_job(summary)
+        if not result.is_completed:
+            return  # The job was cancelled, and is pending again.
+        Worker.unsaved_jobs_total += 1
+        if Worker.unsaved_jobs_total == 5000 and summary.is_loaded:
+            log.log_message(Worker.AUTOSAVE_MESSAGE)
+            screen.save()
+        summary.completed_total += 1
+        if summary.result_total == summary.completed_total:
+            log.log_message("All results are up to date.")
+            log.log_message(Worker.AUTOSAVE_MESSAGE)
+            screen.save()
+            if self.is_being_tested:
+                os.kill(os.getpid(), signal.SIGINT)
+
+    def _start_job(self, summary):
+        self.set_urgency(any(summary.is_visible(result.entry)
+                             for result in self.running_results))
+        self.job_start_time = time.time()
+
+    def _tokens_needed(self, job_count):
+        # A queued job takes the slot, and token, of the first job to finish.
+        return max(0, min(job_count, self.concurrency) - self.has_own_slot)
+
+    def _release_tokens(self, job_count):
+        while self._token_count > self._tokens_needed(job_count):
+            self._token_count -= 1
+            self.cpu_budget.release()
 
     async def job_runner(self, screen, summary, log, jobs_added_event,
                          appearance_changed_event):
-        await self.create_process()
+        # Jobs are queued in the worker, so it doesn't wait for the next.
+        # Each worker has one job slot of its own, the running jobs beyond
+        # that share the cpu budget of all the workers. When the budget is a
+        # make jobserver every running job needs a token from it.
+        try:
+            await self.create_process()
+        except OSError as error:
+            log.log_message(f"Couldn't start the worker at "
+                            f"{self.transport.address}: {error}")
+            return
+        jobs = set()
         while True:
             await jobs_added_event.wait()
             while True:
-                try:
-                    self.result = await summary.get_closest_placeholder()
-                except StopAsyncIteration:
-                    self.result = None
+                while (not self.is_retiring and
+                       len(jobs) < self.concurrency + 1):
+                    if self._tokens_needed(len(jobs) + 1) > self._token_count:
+                        if len(jobs) > 0 and self.cpu_budget.locked():
+                            break
+                        # Only blocks when there are no jobs running.
+                        await self.cpu_budget.acquire()
+                        self._token_count += 1
+                    try:
+                        result = await summary.get_closest_placeholder()
+                    except StopAsyncIteration:
+                        break
+                    result.compression = self.compression
+                    result.set_status(tools.Status.running)
+                    jobs.add(asyncio.ensure_future(self._run_job(
+                        result, summary, screen, log,
+                        appearance_changed_event)))
+                self._release_tokens(len(jobs))
+                if len(jobs) == 0:
                     break
-                await self.result.run(log, appearance_changed_event, self)
-                self.result.compression = self.compression
-                Worker.unsaved_jobs_total += 1
-                if Worker.unsaved_jobs_total == 5000 and summary.is_loaded:
-                    log.log_message(Worker.AUTOSAVE_MESSAGE)
-                    screen.save()
-                summary.completed_total += 1
-                if summary.result_total == summary.completed_total:
-                    log.log_message("All results are up to date.")
-                    log.log_message(Worker.AUTOSAVE_MESSAGE)
-                    screen.save()
-                    if self.is_being_tested:
-                        os.kill(os.getpid(), signal.SIGINT)
+                done, jobs = await asyncio.wait(
+                    jobs, return_when=asyncio.FIRST_COMPLETED)
+                for job in done:
+                    job.result()  # Raises any exception from the job.
+            if self.is_retiring:
+                self.kill()
+                return
             jobs_added_event.clear()
 
-    def kill(self):
+    def set_urgency(self, is_urgent):
+        # The priority of a job is set in the worker when its tool starts. It
+        # can't be raised later without privileges, see
+        # Screen._pause_for_selection.
+        self.is_urgent = is_urgent
+
+    def _signal(self, signal_):
         if self.child_pgid is not None:
             with contextlib.suppress(ProcessLookupError):
-                os.killpg(self.child_pgid, signal.SIGKILL)
+                os.killpg(self.child_pgid, signal_)
+        elif signal_ == signal.SIGKILL:  # Remote workers are disconnected.
+            if self.process is not None:
+                with contextlib.suppress(ProcessLookupError):
+                    os.killpg(self.process.pid, signal_)
+            elif self._writer is not None:
+                self._writer.close()
+
+    def pause(self):
+        if not self.is_paused:
+            self._signal(signal.SIGSTOP)
+            self.is_paused = True
+
+    def resume(self):
+        if self.is_paused:
+            self._signal(signal.SIGCONT)
+            self.is_paused = False
+
+    def cancel(self):
+        """Kill the queued jobs. They are left pending, to be run again."""
+        if self._jobs:
+            self.is_cancelled = True
+            self._signal(signal.SIGKILL)
+
+    def kill(self):
+        self._is_killed = True
+        self._signal(signal.SIGKILL)
+
+    def retire(self, jobs_added_event):
+        """Stop taking jobs, and exit once the running ones finish."""
+        self.is_retiring = True
+        jobs_added_event.set()  # Wakes the job runner if it is idle.
 
 
 def make_result_widget(text, result, compression):
@@ -89,18 +448,178 @@ def make_result_widget(text, result, compression):
     return fill3.Fixed(appearance)
 
 
+def _dump_text(text):
+    # Styled text is sent as json, which unlike a pickle is safe to load
+    # from a remote worker.
+    if not isinstance(text, termstr.TermStr):
+        return json.dumps({"text": text}).encode("utf-8")
+    styles, runs = {}, []
+    for style, group in itertools.groupby(text.style):
+        key = (style.fg_color, style.bg_color, style.is_bold, style.is_italic,
+               style.is_underlined)
+        runs.append((styles.setdefault(key, len(styles)), len(list(group))))
+    return json.dumps({"text": text.data, "styles": list(styles),
+                       "runs": runs}).encode("utf-8")
+
+
+def _load_text(data):
+    text = json.loads(data.decode("utf-8"))
+    if "styles" not in text:
+        return str(text["text"])
+    styles = [termstr.CharStyle(*[tuple(value) if isinstance(value, list)
+                                  else value for value in style])
+              for style in text["styles"]]
+    if (any(length < 0 for index, length in text["runs"]) or
+            sum(length for index, length in text["runs"]) !=
+            len(text["text"])):
+        raise ValueError("The styles don't match the text.")
+    style = tuple(itertools.chain.from_iterable(
+        itertools.repeat(styles[index], length)
+        for index, length in text["runs"]))
+    return termstr.TermStr(text["text"], style)
+
+
+async def _read_line(reader):
+    line = await reader.readline()
+    if line == b"":
+        raise EOFError
+    return line.decode("utf-8")[:-1]
+
+
+def _checked_tool(tool_name, path):
+    # Remote workers only run eris' tools, on paths inside the checkout.
+    tool = getattr(tools, tool_name, None)
+    if tool not in tools.tools_all():
+        raise ValueError(f"Not a tool: {tool_name!r}")
+    if os.path.isabs(path) or ".." in path.split(os.sep):
+        raise ValueError(f"Not a path in the checkout: {path!r}")
+    return tool
+
+
+def _send_result(job_id, status, text):
+    data = zlib.compress(_dump_text(text))
+    sys.stdout.buffer.write(
+        f"{job_id} {status.value} {len(data)}\n".encode("utf-8") + data)
+    sys.stdout.buffer.flush()
+
+
+async def _run_job(job_id, tool_name, path, is_urgent, compression, job_slots,
+                   result_threshold):
+    # Small results are sent back to eris, rather than written to disk
+    # only to be read back.
+    # Urgent jobs run at the worker's own priority, and bulk jobs when idle.
+    # Their io priority follows their niceness.
+    try:
+        try:
+            tool = _checked_tool(tool_name, path)
+        except ValueError as error:  # e.g. A tool this version doesn't have.
+            _send_result(job_id, tools.Status.error, str(error))
+            return
+        limits = tools.tool_resource_limits(tool)
+        if not is_urgent:
+            limits = limits._replace(niceness=Worker.BULK_NICENESS)
+        status, text = await tools.run_tool_no_error_async(path, tool,
+                                                           limits)
+        data = _dump_text(text)
+        if len(data) < result_threshold:
+            _send_result(job_id, status, text)
+            return
+        result = tools.Result(path, tool)
+        result.compression = compression
+        result.result = make_result_widget(text, result, compression)
+        print(job_id, status.value, flush=True)
+    except Exception:
+        tools.log_error()
+        raise SystemExit(1)  # Stops the worker, which is then restarted.
+    finally:
+        job_slots.release()
+
+
+async def _run_jobs(is_remote):
+    loop = asyncio.get_event_loop()
+    reader = asyncio.StreamReader()
+    await loop.connect_read_pipe(
+        lambda: asyncio.StreamReaderProtocol(reader), sys.stdin)
+    compression = await _read_line(reader)
+    job_slots = asyncio.Semaphore(int(await _read_line(reader)))
+    result_threshold = int(await _read_line(reader))
+    if is_remote:
+        result_threshold = math.inf  # Every result is sent back.
+    while True:
+        job_id, tool_name, path, is_urgent = [
+            await _read_line(reader) for index in range(4)]
+        await job_slots.acquire()
+        asyncio.ensure_future(
+            _run_job(job_id, tool_name, path, is_urgent == "1", compression,
+                     job_slots, result_threshold))
+
+
+def _digest(secret, challenge):
+    return hmac.new(secret.encode("utf-8"), challenge,
+                    "sha256").hexdigest().encode("utf-8")
+
+
+def _receive_line(connection):
+    line = b""
+    while not line.endswith(b"\n") and len(line) <= _MAX_LINE_LENGTH:
+        byte = connection.recv(1)
+        if byte == b"":
+            break
+        line += byte
+    return line[:-1]
+
+
+def _listen(address, secret):
+    host, _, port = address.rpartition(":")
+    signal.signal(signal.SIGCHLD, signal.SIG_IGN)  # Reaps the workers.
+    with socket.create_server((host or "localhost", int(port))) as server:
+        while True:
+            connection, client_address = server.accept()
+            with connection:
+                # The client proves it has the secret without sending it.
+                connection.settimeout(5)  # The handshake can't block others.
+                challenge = os.urandom(16).hex().encode("utf-8")
+                try:
+                    connection.sendall(challenge + b"\n")
+                    line = _receive_line(connection)
+                except OSError:
+                    continue
+                if not hmac.compare_digest(line, _digest(secret, challenge)):
+                    continue
+                connection.settimeout(None)
+                subprocess.Popen(["eris-worker", "--remote"],
+                                 stdin=connection, stdout=connection,
+                                 stderr=subprocess.DEVNULL,
+                                 start_new_session=True)
+
+
+USAGE = """Usage:
+  eris-worker
+  eris-worker --remote
+  eris-worker --listen [HOST:]PORT
+
+Run in the checkout of a project, --remote sends the results back
+instead of writing them to the cache, and --listen starts a remote
+worker for each connection from eris. HOST defaults to localhost.
+Connections must give the secret in ERIS_WORKER_SECRET, which is set
+to the same value where eris is run."""
+
+
 def main():
+    if sys.argv[1:2] == ["--listen"] and len(sys.argv) == 3:
+        if not os.environ.get(SECRET_VARIABLE):
+            print(f"{SECRET_VARIABLE} must be set to listen.")
+            sys.exit(1)
+        _listen(sys.argv[2], os.environ[SECRET_VARIABLE])
+        return
+    if sys.argv[1:] not in [[], ["--remote"]]:
+        print(USAGE)
+        sys.exit(1)
     print(os.getpgid(os.getpid()), flush=True)
-    compression = input()
     try:
-        while True:
-            tool_name, path = input(), input()
-            tool = getattr(tools, tool_name)
-            result = tools.Result(path, tool)
-            result.compression = compression
-            status, text = tools.run_tool_no_error(path, tool)
-            result.result = make_result_widget(text, result, compression)
-            print(status.value, flush=True)
+        asyncio.run(_run_jobs(sys.argv[1:] == ["--remote"]))
+    except EOFError:  # Eris has gone, so stop any tools still running.
+        os.killpg(0, signal.SIGKILL)
     except Exception:
         tools.log_error()
 
@@ -7,7 +7,9 @@ import asyncio
 import contextlib
 import io
 import os
+import pickle
 import shutil
+import subprocess
 import tempfile
 import unittest
 
@@ -202,6 +204,872 @@ class SummarySyncWithFilesystemTestCase(unittest.TestCase):
         self.assertTrue(self.jobs_added_event.is_set())
 
 
+class SummaryIssueTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.summary = __main__.Summary(self.temp_dir, asyncio.Event())
+        for path in ["./a", "./b", "./c"]:
+            _touch(os.path.join(self.temp_dir, path))
+            self.summary.on_file_added(path)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def _set_problem(self, x, y):
+        self.summary._entries[y][x].set_status(__main__.tools.Status.problem)
+
+    def test_move_to_next_issue(self):
+        self.summary.move_to_next_issue()
+        self.assertEqual(self.summary.cursor_position(), (0, 0))
+        self._set_problem(1, 0)
+        self._set_problem(0, 2)
+        self.summary.move_to_next_issue()
+        self.assertEqual(self.summary.cursor_position(), (1, 0))
+        self.summary.move_to_next_issue()
+        self.assertEqual(self.summary.cursor_position(), (0, 2))
+        self.summary.move_to_next_issue()
+        self.assertEqual(self.summary.cursor_position(), (1, 0))
+        self.summary._entries[2][0].reset()
+        self.summary.move_to_next_issue()
+        self.assertEqual(self.summary.cursor_position(), (1, 0))
+
+    def test_move_to_next_issue_of_tool(self):
+        self._set_problem(1, 0)
+        self._set_problem(0, 1)
+        self._set_problem(1, 2)
+        self.summary._cursor_position = (1, 0)
+        self.summary.move_to_next_issue_of_tool()
+        self.assertEqual(self.summary.cursor_position(), (1, 2))
+
+    def test_deleted_entry_issues(self):
+        self._set_problem(0, 1)
+        os.remove(os.path.join(self.temp_dir, "b"))
+        self.summary.on_file_deleted("./b")
+        self.summary.move_to_next_issue()
+        self.assertEqual(self.summary.cursor_position(), (0, 0))
+
+
+class SummaryWidthTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.summary = __main__.Summary(self.temp_dir, asyncio.Event())
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def _add(self, path, tool_count):
+        tools = [__main__.tools.contents] * tool_count
+        self.summary.add_entry(__main__.Entry(path, tools, 0))
+
+    def test_widths_after_deletions(self):
+        self._add("./a", 1)
+        entry = self.summary._entries[0]
+        entry.appearance_min()
+        appearance_cache = entry.appearance_cache
+        self._add("./bbb", 3)
+        self._add("./cc", 3)
+        self.assertEqual(__main__.Entry.MAX_WIDTH, 3)
+        self.assertEqual(self.summary._max_path_length, 3)
+        self.summary.on_file_deleted("./bbb")
+        self.assertEqual(__main__.Entry.MAX_WIDTH, 3)
+        self.assertEqual(self.summary._max_path_length, 2)
+        self.summary.on_file_deleted("./cc")
+        self.assertEqual(__main__.Entry.MAX_WIDTH, 1)
+        self.assertEqual(self.summary._max_path_length, 1)
+        self.assertIs(entry.appearance_cache, appearance_cache)
+        self.assertEqual(len(entry.appearance_min()[0]), len(". a"))
+
+
+class SummaryAppearanceTestCase(unittest.TestCase):
+
+    def test_row_lines_are_cached(self):
+        summary = __main__.Summary(None, asyncio.Event())
+        for path in ["./a", "./b"]:
+            summary.add_entry(__main__.Entry(
+                path, [__main__.tools.contents] * 2, 0))
+        first_lines = summary.appearance_interval((0, 2))
+        self.assertEqual([line.data for line in first_lines],
+                         ["+. a", ".. b"])
+        first_caches = [entry.appearance_cache for entry in summary._entries]
+        summary.appearance_interval((0, 2))
+        self.assertIs(summary._entries[0].appearance_cache, first_caches[0])
+        self.assertIs(summary._entries[1].appearance_cache, first_caches[1])
+        summary._entries[1][0].set_status(__main__.tools.Status.ok)
+        summary.appearance_interval((0, 2))
+        self.assertIs(summary._entries[0].appearance_cache, first_caches[0])
+        self.assertIsNot(summary._entries[1].appearance_cache,
+                         first_caches[1])
+        summary.cursor_down()
+        self.assertEqual([line.data for line in
+                          summary.appearance_interval((1, 2))], ["+. b"])
+
+
+class SummaryTreeViewTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.summary = __main__.Summary(self.temp_dir, asyncio.Event())
+        for path in ["./a/x", "./a/b/y", "./c"]:
+            self.summary.add_entry(__main__.Entry(
+                path, [__main__.tools.contents] * 2, 0))
+        self.summary._cursor_position = (0, 0)
+        self.summary.toggle_tree_view()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def _row_paths(self):
+        return [row.path for row in self.summary._rows()]
+
+    def _directory(self, path):
+        return self.summary._tree._directories[path]
+
+    def test_collapsed_directories(self):
+        self.assertEqual(self._row_paths(), ["./c", "./a"])
+        self.assertEqual(self._directory("./a").status_counts[
+            __main__.tools.Status.pending], 4)
+        self.summary.cursor_down()
+        self.summary.toggle_directory()
+        self.assertEqual(self._row_paths(), ["./c", "./a", "./a/x", "./a/b"])
+
+    def test_status_counts(self):
+        self.assertEqual(self.summary._entries[2].path, "./a/b/y")
+        self.summary._entries[2][1].set_status(__main__.tools.Status.problem)
+        for path in ["./a", "./a/b"]:
+            counts = self._directory(path).status_counts
+            self.assertEqual(counts[__main__.tools.Status.problem], 1)
+        self.assertEqual(self._directory("./a").status_counts[
+            __main__.tools.Status.pending], 3)
+        self.summary.move_to_next_issue()
+        self.assertEqual(self.summary.cursor_position(), (0, 1))
+        self.assertIsNone(self.summary.get_selection().tool)
+
+    def test_toggle_keeps_selection(self):
+        self.summary.toggle_tree_view()
+        self.summary._cursor_position = (1, 1)
+        self.assertEqual(self.summary.get_selection().path, "./a/x")
+        self.summary.toggle_tree_view()
+        self.assertEqual(self.summary.get_selection().path, "./a")
+        self.summary.toggle_tree_view()
+        self.assertEqual(self.summary.cursor_position(), (0, 1))
+
+    def test_next_issue_of_tool_skips_collapsed_directories(self):
+        for entry in [self.summary._entries[0], self.summary._entries[2]]:
+            entry[1].set_status(__main__.tools.Status.problem)
+        self.summary._cursor_position = (1, 0)
+        self.summary.move_to_next_issue_of_tool()
+        self.assertEqual(self.summary.cursor_position(), (1, 0))
+        self.summary._tree.toggle_collapsed(self._directory("./a"))
+        self.summary.move_to_next_issue_of_tool()
+        self.assertEqual(self.summary.cursor_position(), (1, 0))
+        self._directory("./a/b").is_collapsed = False
+        self.summary._tree.toggle_collapsed(self._directory("./a"))
+        self.summary._tree.toggle_collapsed(self._directory("./a"))
+        self.assertEqual(self._row_paths(),
+                         ["./c", "./a", "./a/x", "./a/b", "./a/b/y"])
+        self.summary.move_to_next_issue_of_tool()
+        self.assertEqual(self.summary.cursor_position(), (1, 4))
+        self.summary.move_to_next_issue_of_tool()
+        self.assertEqual(self.summary.cursor_position(), (1, 0))
+
+    def test_visible_rows_are_maintained(self):
+        self.summary.cursor_down()
+        self.summary.toggle_directory()
+        for path in ["./a/b/z", "./a/w", "./d/v"]:
+            self.summary.add_entry(__main__.Entry(
+                path, [__main__.tools.contents], 0))
+        self.assertEqual(self._row_paths(),
+                         ["./c", "./a", "./a/w", "./a/x", "./a/b", "./d"])
+        self.summary.on_file_deleted("./a/w")
+        self.summary.on_file_deleted("./d/v")
+        self.assertEqual(self._row_paths(), ["./c", "./a", "./a/x", "./a/b"])
+        self.summary.toggle_directory()
+        self.assertEqual(self._row_paths(), ["./c", "./a"])
+
+    def test_added_and_deleted_entries_keep_the_selection(self):
+        self.summary._cursor_position = (1, 0)
+        self.summary.add_entry(__main__.Entry(
+            "./0", [__main__.tools.contents], 0))
+        self.assertEqual(self._row_paths(), ["./0", "./c", "./a"])
+        self.assertEqual(self.summary.get_selection().path, "./c")
+        self.summary.on_file_deleted("./0")
+        self.assertEqual(self.summary.get_selection().path, "./c")
+        self.summary.on_file_deleted("./c")
+        self.assertEqual(self.summary.get_selection().path, "./a")
+
+    def test_clicks_select_rows(self):
+        screen = __main__.Screen(self.summary, __main__.Log(asyncio.Event()),
+                                 asyncio.Event(), _MockMainLoop())
+        self.summary._view_widget.position = (0, 0)
+        screen._select_entry_at_position(1, 2, 80, 20)
+        self.assertEqual(self.summary.cursor_position(), (0, 1))
+        self.assertEqual(self.summary.get_selection().path, "./a")
+        screen._select_entry_at_position(1, 3, 80, 20)  # Below the rows.
+        self.assertEqual(self.summary.cursor_position(), (0, 1))
+
+    def test_deleted_directories(self):
+        self.summary.on_file_deleted("./a/b/y")
+        self.assertNotIn("./a/b", self.summary._tree._directories)
+        self.summary.on_file_deleted("./a/x")
+        self.assertEqual(self._row_paths(), ["./c"])
+
+
+class FocusTestCase(unittest.TestCase):
+
+    def test_prefixes_and_globs(self):
+        focus = __main__.Focus(["src/", "./docs/*.md"], None)
+        self.assertIn("./src/foo.py", focus)
+        self.assertIn("./src", focus)
+        self.assertNotIn("./src2/foo.py", focus)
+        self.assertIn("./docs/a/b.md", focus)
+        self.assertNotIn("./docs/b.txt", focus)
+        self.assertIn("./foo", __main__.Focus(["."], None))
+
+    def test_git_changed_files(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            def git(*arguments):
+                subprocess.run(["git", "-c", "user.name=a", "-c",
+                                "user.email=a@a", *arguments], cwd=temp_dir,
+                               check=True, stdout=subprocess.DEVNULL)
+            for path in ["a", "b"]:
+                _touch(os.path.join(temp_dir, path))
+            git("init", "-q")
+            git("add", "a", "b")
+            git("commit", "-q", "-m", "a")
+            with open(os.path.join(temp_dir, "b"), "w") as file_:
+                file_.write("b")
+            focus = __main__.Focus(["git:HEAD"], temp_dir)
+            self.assertIn("./b", focus)
+            self.assertNotIn("./a", focus)
+
+    def test_scheduling_is_restricted(self):
+        summary = __main__.Summary(None, asyncio.Event())
+        for path in ["./a/x", "./b/y"]:
+            summary.add_entry(__main__.Entry(
+                path, [__main__.tools.contents], 0))
+        summary.set_focus(__main__.Focus(["b"], None))
+        self.assertTrue(summary._jobs_added_event.is_set())
+        loop = asyncio.new_event_loop()
+        placeholder = loop.run_until_complete(
+            summary.get_closest_placeholder())
+        self.assertEqual(placeholder.path, "./b/y")
+        placeholder.set_status(__main__.tools.Status.ok)
+        with self.assertRaises(StopAsyncIteration):
+            loop.run_until_complete(summary.get_closest_placeholder())
+        summary.set_focus(None)
+        placeholder = loop.run_until_complete(
+            summary.get_closest_placeholder())
+        self.assertEqual(placeholder.path, "./a/x")
+        loop.close()
+
+
+class _FakeWorker:
+
+    def __init__(self, result, job_start_time):
+        self.results = [] if result is None else [result]
+        self.concurrency = 1
+        self.job_start_time = job_start_time
+        self.is_cancelled = False
+        self.is_urgent = False
+        self.is_paused = False
+        self.is_bulk = False
+
+    @property
+    def running_results(self):
+        return self.results[:self.concurrency]
+
+    def is_running_in_bulk(self, result):
+        return self.is_bulk and result in self.running_results
+
+    def cancel(self):
+        self.is_cancelled = True
+
+    def set_urgency(self, is_urgent):
+        pass
+
+    def pause(self):
+        self.is_paused = True
+
+    def resume(self):
+        self.is_paused = False
+
+
+class PreemptionTestCase(unittest.TestCase):
+
+    def setUp(self):
+        appearance_changed_event = asyncio.Event()
+        self.summary = __main__.Summary("/project", asyncio.Event())
+        for path in ["./a", "./b", "./c", "./d"]:
+            self.summary.add_entry(__main__.Entry(
+                path, [__main__.tools.contents], 0))
+        self.screen = __main__.Screen(
+            self.summary, __main__.Log(appearance_changed_event),
+            appearance_changed_event, _MockMainLoop())
+        entries = self.summary._entries
+        self.near = _FakeWorker(entries[1][0], 2)
+        self.far = _FakeWorker(entries[3][0], 1)
+        self.screen.workers = [self.near, self.far]
+        for worker_ in self.screen.workers:
+            worker_.results[0].set_status(__main__.tools.Status.running)
+
+    def test_farthest_job_is_cancelled(self):
+        self.summary._cursor_position = (0, 0)
+        self.screen._preempt_for_selection()
+        self.assertFalse(self.near.is_cancelled)
+        self.assertTrue(self.far.is_cancelled)
+        loop = asyncio.new_event_loop()
+        placeholder = loop.run_until_complete(
+            self.summary.get_closest_placeholder())
+        self.assertEqual(placeholder.path, "./a")
+        loop.close()
+
+    def test_workers_are_compared_by_their_closest_running_job(self):
+        entries = self.summary._entries
+        self.near.results = [entries[2][0]]
+        self.far.concurrency = 2
+        self.far.results.append(entries[1][0])
+        self.summary._cursor_position = (0, 0)
+        self.screen._preempt_for_selection()
+        self.assertTrue(self.near.is_cancelled)
+        self.assertFalse(self.far.is_cancelled)
+
+    def test_no_preemption_when_selection_is_unfocused(self):
+        self.summary.focus = {"./c", "./d"}
+        self.summary._cursor_position = (0, 0)
+        self.screen._preempt_for_selection()
+        self.assertFalse(self.near.is_cancelled or self.far.is_cancelled)
+
+    def test_no_preemption_when_selection_is_debounced(self):
+        self.summary._debounce_handles["./a"] = None
+        self.summary._cursor_position = (0, 0)
+        self.screen._preempt_for_selection()
+        self.assertFalse(self.near.is_cancelled or self.far.is_cancelled)
+
+    def test_no_preemption_when_victims_free_no_resources_needed(self):
+        heavy = __main__.tools.resource_class(__main__.tools.pylint)
+        self.summary._running_classes[heavy] = heavy.max_instances
+        entry = __main__.Entry("./0.py", [__main__.tools.pylint], 0)
+        self.summary.add_entry(entry)
+        self.summary._cursor_position = (
+            0, self.summary._entries.index(entry))
+        self.assertIs(self.summary.get_selection().entry, entry)
+        self.screen._preempt_for_selection()
+        self.assertFalse(self.near.is_cancelled or self.far.is_cancelled)
+
+    def test_no_preemption_when_selection_is_running(self):
+        self.summary._cursor_position = (0, 3)
+        self.screen._preempt_for_selection()
+        self.assertFalse(self.near.is_cancelled or self.far.is_cancelled)
+
+    def test_visible_entries(self):
+        self.summary._view_widget.portal.last_dimensions = 10, 2
+        self.summary._view_widget.position = 0, 1
+        self.assertEqual([self.summary.is_visible(entry)
+                          for entry in self.summary._entries],
+                         [False, True, True, False])
+
+    def test_no_preemption_when_a_worker_is_idle(self):
+        self.near.results = []
+        self.summary._cursor_position = (0, 0)
+        self.screen._preempt_for_selection()
+        self.assertFalse(self.far.is_cancelled)
+
+
+class PauseTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        appearance_changed_event = asyncio.Event()
+        summary = __main__.Summary("/project", asyncio.Event())
+        summary.add_entry(__main__.Entry("./a", [__main__.tools.contents], 0))
+        self.screen = __main__.Screen(
+            summary, __main__.Log(appearance_changed_event),
+            appearance_changed_event, self.loop)
+        self.screen.pause_fraction = 0.5
+        result = summary._entries[0][0]
+        self.screen.workers = [_FakeWorker(result, 0) for index in range(3)]
+        self.screen.workers[0].is_urgent = True
+
+    def tearDown(self):
+        self.loop.close()
+
+    def _paused(self):
+        return [worker_.is_paused for worker_ in self.screen.workers]
+
+    def test_bulk_workers_are_paused_during_input(self):
+        self.screen.on_input_event("left")
+        self.assertEqual(self._paused(), [False, True, True])
+        self.loop.run_until_complete(
+            asyncio.sleep(__main__.Screen.PAUSE_DURATION + 0.1))
+        self.assertEqual(self._paused(), [False, False, False])
+
+    def test_retired_workers_are_resumed(self):
+        self.screen.on_input_event("left")
+        retired_worker = self.screen.workers.pop()
+        self.screen._retiring_workers.add(retired_worker)
+        self.loop.run_until_complete(
+            asyncio.sleep(__main__.Screen.PAUSE_DURATION + 0.1))
+        self.assertFalse(retired_worker.is_paused)
+
+    def _run_selection_in_bulk(self):
+        self.screen.pause_fraction = 0  # Not paused for the input.
+        self.screen._summary.add_entry(
+            __main__.Entry("./b", [__main__.tools.contents], 0))
+        self.screen.workers[0].is_bulk = True
+        for worker_ in self.screen.workers[1:]:
+            worker_.results = [self.screen._summary._entries[1][0]]
+        self.screen.on_input_event("left")
+
+    def test_bulk_workers_are_paused_while_the_selection_runs(self):
+        self._run_selection_in_bulk()
+        self.assertEqual(self._paused(), [False, True, True])
+        self.loop.run_until_complete(
+            asyncio.sleep(__main__.Screen.PAUSE_DURATION + 0.1))
+        self.assertEqual(self._paused(), [False, True, True])
+        self.screen.workers[0].results = []
+        self.loop.run_until_complete(
+            asyncio.sleep(__main__.Screen.PAUSE_DURATION + 0.1))
+        self.assertEqual(self._paused(), [False, False, False])
+
+    def test_selection_pause_duration_is_capped(self):
+        self._run_selection_in_bulk()
+        selection, start_time = self.screen._selection_pause
+        self.screen._selection_pause = selection, start_time - (
+            __main__.Screen.MAX_SELECTION_PAUSE_DURATION)
+        self.loop.run_until_complete(
+            asyncio.sleep(__main__.Screen.PAUSE_DURATION + 0.1))
+        self.assertEqual(self._paused(), [False, False, False])
+
+    def test_pause_duration_is_capped(self):
+        self.screen.on_input_event("left")
+        self.screen._pause_deadline = self.loop.time()
+        self.screen.on_input_event("left")
+        self.loop.run_until_complete(asyncio.sleep(0.05))
+        self.assertEqual(self._paused(), [False, False, False])
+        self.screen.on_input_event("left")
+        self.assertEqual(self._paused(), [False, False, False])
+
+    def test_latency_report(self):
+        self.assertIsNone(self.screen.latency_report())
+        for index in range(__main__.Screen.CONTROL_BURST_INTERVAL):
+            self.screen.on_input_event("left")
+            self.screen.appearance((100, 60))
+            self.screen._resume_handle.cancel()
+            self.screen._resume_workers()
+        self.assertEqual(len(self.screen._frame_latencies[True]),
+                         __main__.Screen.CONTROL_BURST_INTERVAL - 1)
+        self.assertEqual(len(self.screen._frame_latencies[False]), 1)
+        self.assertIn("with workers paused", self.screen.latency_report())
+
+
+class StaleJobTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.summary = __main__.Summary("/project", asyncio.Event())
+        for path in ["./a", "./b"]:
+            self.summary.add_entry(__main__.Entry(
+                path, [__main__.tools.contents], 0))
+        self.result = self.summary._entries[0][0]
+        self.result.set_status(__main__.tools.Status.running)
+        self.worker = _FakeWorker(self.result, 0)
+        self.summary.workers = [self.worker]
+
+    def test_running_job_is_cancelled(self):
+        self.summary.on_file_modified("./b")
+        self.assertFalse(self.worker.is_cancelled)
+        self.summary.on_file_modified("./a")
+        self.assertTrue(self.worker.is_cancelled)
+        self.assertEqual(self.result.status, __main__.tools.Status.pending)
+
+    def test_queued_job_is_cancelled(self):
+        self.worker.results.insert(0, self.summary._entries[1][0])
+        self.summary.on_file_modified("./a")
+        self.assertTrue(self.worker.is_cancelled)
+
+    def test_debounce(self):
+        self.summary.debounce_time = 0.1
+
+        async def modify_and_schedule():
+            self.summary.on_file_modified("./a")
+            self.summary.on_file_modified("./a")
+            placeholder = await self.summary.get_closest_placeholder()
+            self.assertEqual(placeholder.path, "./b")
+            placeholder.set_status(__main__.tools.Status.ok)
+            with self.assertRaises(StopAsyncIteration):
+                await self.summary.get_closest_placeholder()
+            self.summary._jobs_added_event.clear()
+            await self.summary._jobs_added_event.wait()
+            placeholder = await self.summary.get_closest_placeholder()
+            self.assertEqual(placeholder.path, "./a")
+        loop = asyncio.new_event_loop()
+        loop.run_until_complete(modify_and_schedule())
+        loop.close()
+
+
+class ResourceClassTestCase(unittest.TestCase):
+
+    def test_heavy_tools_are_limited(self):
+        summary = __main__.Summary(None, asyncio.Event())
+        for path in ["./a", "./b", "./c"]:
+            summary.add_entry(__main__.Entry(
+                path, [__main__.tools.mypy, __main__.tools.contents], 0))
+        loop = asyncio.new_event_loop()
+
+        def next_placeholder():
+            result = loop.run_until_complete(
+                summary.get_closest_placeholder())
+            result.set_status(__main__.tools.Status.running)
+            return result
+        placeholders = [next_placeholder() for index in range(5)]
+        self.assertEqual(
+            [(result.path, result.tool) for result in placeholders],
+            [("./a", __main__.tools.mypy), ("./a", __main__.tools.contents),
+             ("./b", __main__.tools.mypy), ("./b", __main__.tools.contents),
+             ("./c", __main__.tools.contents)])
+        summary._jobs_added_event.clear()
+        placeholders[0].set_status(__main__.tools.Status.ok)
+        self.assertTrue(summary._jobs_added_event.is_set())
+        self.assertEqual(next_placeholder().path, "./c")
+        loop.close()
+
+    def test_cpu_weight_is_limited_by_job_slots(self):
+        summary = __main__.Summary(None, asyncio.Event())
+        summary.job_slots = 3
+        for path in ["./a", "./b"]:
+            summary.add_entry(__main__.Entry(path, [__main__.tools.mypy], 0))
+        summary._entries[0][0].set_status(__main__.tools.Status.running)
+        self.assertTrue(summary._has_resources(__main__.tools.contents))
+        self.assertFalse(summary._has_resources(__main__.tools.mypy))
+
+
+class RequirementsTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.summary = __main__.Summary(None, asyncio.Event())
+        self.summary.add_entry(__main__.Entry(
+            "./a.py", [__main__.tools.pylint, __main__.tools.python_syntax],
+            0))
+        self.pylint, self.python_syntax = self.summary._entries[0]
+        self.loop = asyncio.new_event_loop()
+
+    def tearDown(self):
+        self.loop.close()
+
+    def _next_placeholder(self):
+        return self.loop.run_until_complete(
+            self.summary.get_closest_placeholder())
+
+    def test_required_tools_run_first(self):
+        self.assertEqual(self._next_placeholder().tool,
+                         __main__.tools.python_syntax)
+        self.python_syntax.set_status(__main__.tools.Status.running)
+        with self.assertRaises(StopAsyncIteration):
+            self._next_placeholder()
+        self.python_syntax.set_status(__main__.tools.Status.ok)
+        self.assertEqual(self._next_placeholder().tool, __main__.tools.pylint)
+
+    def test_tools_are_skipped_when_requirements_fail(self):
+
+        class _Runner:
+
+            async def run_tool(self, path, tool):
+                raise AssertionError("The tool shouldn't run.")
+        self.python_syntax.set_status(__main__.tools.Status.problem)
+        self.pylint.compression = "none"
+        with tempfile.TemporaryDirectory() as temp_dir:
+            with __main__.chdir(temp_dir):
+                self.loop.run_until_complete(self.pylint.run(
+                    __main__.Log(asyncio.Event()), asyncio.Event(),
+                    _Runner()))
+                self.assertEqual(self.pylint.status,
+                                 __main__.tools.Status.not_applicable)
+                self.assertEqual(
+                    str(self.pylint.result.appearance_min()[0]),
+                    "Not run, because python_syntax found problems.")
+
+
+class ImportersTestCase(unittest.TestCase):
+
+    def test_importers_tests_run_first(self):
+        summary = __main__.Summary(None, asyncio.Event())
+        tools_ = [__main__.tools.python_syntax, __main__.tools.pytest]
+        with tempfile.TemporaryDirectory() as temp_dir:
+            with __main__.chdir(temp_dir):
+                for path, source in [("a.py", ""), ("lib.py", ""),
+                                     ("test_lib.py", "import lib")]:
+                    with open(path, "w") as file_:
+                        file_.write(source)
+                    summary.add_entry(__main__.Entry("./" + path, tools_, 0))
+                for entry in summary._entries:
+                    for result in entry:
+                        result.set_status(__main__.tools.Status.ok)
+                summary.completed_total = summary.result_total
+                summary.on_file_modified("./lib.py")
+        importer_result = summary._entries[2][1]
+        self.assertEqual(importer_result.status,
+                         __main__.tools.Status.pending)
+        self.assertEqual(summary._entries[0][1].status,
+                         __main__.tools.Status.ok)
+        loop = asyncio.new_event_loop()
+        self.assertEqual(
+            loop.run_until_complete(summary.get_closest_placeholder()),
+            importer_result)
+        loop.close()
+
+    def test_waiting_importers_are_kept(self):
+        summary = __main__.Summary(None, asyncio.Event())
+        tools_ = [__main__.tools.python_syntax, __main__.tools.pytest]
+        with tempfile.TemporaryDirectory() as temp_dir:
+            with __main__.chdir(temp_dir):
+                for path, source in [("lib.py", ""),
+                                     ("test_lib.py", "import lib")]:
+                    with open(path, "w") as file_:
+                        file_.write(source)
+                    summary.add_entry(__main__.Entry("./" + path, tools_, 0))
+                for entry in summary._entries:
+                    for result in entry:
+                        result.set_status(__main__.tools.Status.ok)
+                summary.completed_total = summary.result_total
+                summary.on_file_modified("./lib.py")
+        importer_result = summary._entries[1][1]
+        summary._entries[1][0].set_status(__main__.tools.Status.pending)
+        loop = asyncio.new_event_loop()
+        placeholders = []
+        with contextlib.suppress(StopAsyncIteration):
+            while True:
+                placeholders.append(loop.run_until_complete(
+                    summary.get_closest_placeholder()))
+        self.assertNotIn(importer_result, placeholders)
+        self.assertEqual(list(summary._importer_results), [importer_result])
+        loop.close()
+
+
+class CoverageSchedulingTestCase(unittest.TestCase):
+
+    def test_tests_are_selected_by_coverage(self):
+        summary = __main__.Summary(None, asyncio.Event())
+        tools_ = [__main__.tools.pytest, __main__.tools.mypy]
+        with tempfile.TemporaryDirectory() as temp_dir:
+            with __main__.chdir(temp_dir):
+                for path, source in [("lib.py", ""),
+                                     ("test_lib.py", "import lib"),
+                                     ("test_other.py", "")]:
+                    with open(path, "w") as file_:
+                        file_.write(source)
+                    summary.add_entry(__main__.Entry("./" + path, tools_, 0))
+                for test_path, covered_path in [("./test_lib.py", "a.py"),
+                                                ("./test_other.py", "lib.py")]:
+                    __main__.coverage_index.write_record(
+                        __main__.tools.COVERAGE_INDEX_PATH, test_path,
+                        {"files": {covered_path: {"executed_lines": [1]}}})
+                for entry in summary._entries:
+                    for result in entry:
+                        result.set_status(__main__.tools.Status.ok)
+                summary.completed_total = summary.result_total
+                summary.on_file_modified("./lib.py")
+        lib, test_lib, test_other = summary._entries
+        self.assertEqual([result.status for result in test_lib],
+                         [__main__.tools.Status.ok,
+                          __main__.tools.Status.pending])
+        self.assertEqual([result.status for result in test_other],
+                         [__main__.tools.Status.pending,
+                          __main__.tools.Status.ok])
+        loop = asyncio.new_event_loop()
+        placeholders = [
+            loop.run_until_complete(summary.get_closest_placeholder())
+            for index in range(2)]
+        loop.close()
+        self.assertEqual(placeholders, [test_other[0], test_lib[1]])
+
+    def test_index_is_updated_when_tests_finish(self):
+        summary = __main__.Summary(None, asyncio.Event())
+        with tempfile.TemporaryDirectory() as temp_dir:
+            with __main__.chdir(temp_dir):
+                summary.add_entry(__main__.Entry(
+                    "./test_lib.py", [__main__.tools.pytest], 0))
+                self.assertEqual(
+                    summary._coverage_index.tests_covering("./lib.py"),
+                    (set(), set()))
+                result = summary._entries[0][0]
+                result.set_status(__main__.tools.Status.running)
+                __main__.coverage_index.write_record(
+                    __main__.tools.COVERAGE_INDEX_PATH, "./test_lib.py",
+                    {"files": {"lib.py": {"executed_lines": [1]}}})
+                result.set_status(__main__.tools.Status.ok)
+                self.assertEqual(
+                    summary._coverage_index.tests_covering("./lib.py"),
+                    ({"./test_lib.py"}, {"./test_lib.py"}))
+
+
+class AutoscaleTestCase(unittest.TestCase):
+
+    def test_add_and_remove_workers(self):
+        loop = asyncio.new_event_loop()
+        summary = __main__.Summary("/project", asyncio.Event())
+        log = __main__.Log(asyncio.Event())
+        screen = __main__.Screen(summary, log, asyncio.Event(), loop)
+        screen.make_workers(2, True, "none", concurrency=2)
+        self.assertEqual(summary.job_slots, 6)
+        self.assertIs(summary.workers, screen.workers)
+        retiring_worker = screen.workers[1]
+        retiring_worker.results.append(None)
+        screen.workers[0].results.extend([None, None])
+        screen.remove_worker()
+        self.assertEqual(screen.workers, [screen.workers[0]])
+        self.assertEqual(summary.job_slots, 3)
+        self.assertTrue(retiring_worker.is_retiring)
+        self.assertEqual(screen._retiring_workers, {retiring_worker})
+        self.assertEqual(screen.all_workers(),
+                         [screen.workers[0], retiring_worker])
+        for worker_ in [retiring_worker] + screen.workers:
+            worker_.future.close()
+        loop.close()
+
+
+class SummarySortTestCase(unittest.TestCase):
+
+    def test_toggle_order_keeps_selection(self):
+        summary = __main__.Summary(None, asyncio.Event())
+        for path in ["./b/a.md", "./a/z.txt", "./a/b.md"]:
+            summary.add_entry(__main__.Entry(
+                path, [__main__.tools.contents], 0))
+        summary._cursor_position = (0, 2)
+        self.assertEqual(summary.get_selection().path, "./b/a.md")
+        for is_directory_sort, paths, cursor_y in [
+                (False, ["./a/b.md", "./b/a.md", "./a/z.txt"], 1),
+                (True, ["./a/b.md", "./a/z.txt", "./b/a.md"], 2)]:
+            summary.is_directory_sort = is_directory_sort
+            with summary.keep_selection():
+                summary.sort_entries()
+            self.assertEqual([entry.path for entry in summary._entries],
+                             paths)
+            self.assertEqual(summary.cursor_position(), (0, cursor_y))
+
+
+class SummaryLoadTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.original_working_dir = os.getcwd()
+        os.chdir(self.temp_dir)
+        os.mkdir(__main__.tools.CACHE_PATH)
+
+    def tearDown(self):
+        os.chdir(self.original_working_dir)
+        shutil.rmtree(self.temp_dir)
+
+    def test_load_from_compacted_index(self):
+        summary = __main__.Summary(self.temp_dir, asyncio.Event())
+        for path in ["./foo", "./bar.md"]:
+            _touch(path)
+            summary.on_file_added(path)
+        summary.get_selection().set_status(__main__.tools.Status.ok)
+        summary.save()
+        summary._journal.compact_in_background()
+        summary._journal._compaction_thread.join()
+        loaded_summary = __main__.Summary(self.temp_dir, asyncio.Event())
+        loaded_summary.load_entries()
+        self.assertEqual([entry.path for entry in loaded_summary._entries],
+                         ["./foo", "./bar.md"])
+        self.assertTrue(all(entry._index_row is not None
+                            for entry in loaded_summary._entries))
+        self.assertEqual(loaded_summary.result_total, summary.result_total)
+        self.assertEqual(loaded_summary.completed_total, 1)
+        self.assertEqual(loaded_summary.get_selection().status,
+                         __main__.tools.Status.ok)
+        self.assertEqual(loaded_summary._entries[0].statuses(),
+                         summary._entries[0].statuses())
+
+
+class ChangedToolsTestCase(unittest.TestCase):
+
+    def test_only_results_of_changed_tools_are_refreshed(self):
+        summary = __main__.Summary(None, asyncio.Event())
+        tools_ = [__main__.tools.contents, __main__.tools.metadata]
+        with tempfile.TemporaryDirectory() as temp_dir:
+            with __main__.chdir(temp_dir):
+                summary.add_entry(__main__.Entry("./foo", tools_, 0))
+                for result in summary._entries[0]:
+                    result.set_status(__main__.tools.Status.ok)
+                summary.completed_total = summary.result_total
+                summary.refresh_changed_tools()  # Unknown, so all refreshed.
+                self.assertEqual(summary.completed_total, 0)
+                summary.save()
+                fingerprints_path = __main__.tools.TOOL_FINGERPRINTS_PATH
+                with open(fingerprints_path, "rb") as file_:
+                    fingerprints = pickle.load(file_)
+                fingerprints["metadata"] = "old"
+                __main__.tools.dump_pickle_safe(fingerprints,
+                                                fingerprints_path)
+                for result in summary._entries[0]:
+                    result.set_status(__main__.tools.Status.ok)
+                summary.completed_total = summary.result_total
+                summary.refresh_changed_tools()
+                summary.save()
+                with open(fingerprints_path, "rb") as file_:
+                    self.assertNotEqual(pickle.load(file_)["metadata"], "old")
+        self.assertEqual([result.status for result in summary._entries[0]],
+                         [__main__.tools.Status.ok,
+                          __main__.tools.Status.pending])
+
+    def test_entries_get_the_tools_for_their_paths(self):
+        summary = __main__.Summary(None, asyncio.Event())
+        with tempfile.TemporaryDirectory() as temp_dir:
+            with __main__.chdir(temp_dir):
+                summary.add_entry(__main__.Entry(
+                    "./foo", [__main__.tools.contents], 0))
+                summary.add_entry(__main__.Entry(
+                    "./bar", __main__.tools.tools_for_path("./bar"), 0))
+                bar = summary._entries[0]
+                summary.refresh_changed_tools()
+                self.assertEqual(
+                    [entry.tools() for entry in summary._entries],
+                    [__main__.tools.tools_for_path("./bar"),
+                     __main__.tools.tools_for_path("./foo")])
+                self.assertIs(summary._entries[0], bar)
+                self.assertEqual(summary.result_total, 4)
+
+    def test_updated_entries_keep_the_results_of_their_tools(self):
+        summary = __main__.Summary(None, asyncio.Event())
+        tools_ = __main__.tools.tools_for_path("./foo")
+        with tempfile.TemporaryDirectory() as temp_dir:
+            with __main__.chdir(temp_dir):
+                summary.add_entry(__main__.Entry(
+                    "./foo", [tools_[0], __main__.tools.python_syntax], 0))
+                os.mkdir(__main__.tools.CACHE_PATH)
+                for result in summary._entries[0]:
+                    result.compression = "none"
+                    result.set_status(__main__.tools.Status.ok)
+                    _touch(result.pickle_path())
+                summary.completed_total = summary.result_total
+                summary._update_entry_tools()
+                entry = summary._entries[0]
+                self.assertEqual(entry.tools(), tools_)
+                self.assertEqual([result.status for result in entry],
+                                 [__main__.tools.Status.ok] +
+                                 [__main__.tools.Status.pending] *
+                                 (len(tools_) - 1))
+                self.assertEqual(entry[0].compression, "none")
+                self.assertEqual(os.listdir(__main__.tools.CACHE_PATH),
+                                 [os.path.basename(entry[0].pickle_path())])
+                self.assertEqual(summary.completed_total, 1)
+
+    def test_manage_cache_clears_a_cache_of_another_format(self):
+        with tempfile.TemporaryDirectory() as root_path:
+            cache_path = os.path.join(root_path, ".eris")
+            os.mkdir(cache_path)
+            open(os.path.join(cache_path, "foo-contents"), "w").close()
+            with contextlib.redirect_stdout(io.StringIO()):
+                __main__.manage_cache(root_path)
+            self.assertEqual(os.listdir(cache_path), ["format_version"])
+            open(os.path.join(cache_path, "foo-contents"), "w").close()
+            __main__.manage_cache(root_path)
+            self.assertTrue(
+                os.path.exists(os.path.join(cache_path, "foo-contents")))
+
+
 def _mount_total():
     with open("/proc/mounts") as proc_mounts:
         return len(proc_mounts.readlines())
@@ -224,7 +1092,8 @@ class MainTestCase(unittest.TestCase):
                 with contextlib.redirect_stdout(io.StringIO()):
                     __main__.main(root_path, loop, worker_count=2,
                                   is_being_tested=True)
-                for file_name in ["summary.pickle", "creation_time",
+                for file_name in ["summary.pickle", "format_version",
+                                  "summary_journal/journal",
                                   "foo-metadata", "foo-contents"]:
                     self.assertTrue(os.path.exists(".eris/" + file_name))
             self.assertEqual(_mount_total(), mount_total)
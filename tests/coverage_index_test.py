@@ -0,0 +1,63 @@
+#!/usr/bin/env python3.8
+
+# Copyright (C) 2019 Andrew Hamilton. All rights reserved.
+# Licensed under the Artistic License 2.0.
+
+
+import os
+import tempfile
+import unittest
+
+import eris.coverage_index as coverage_index
+
+
+def _coverage_json(executed_lines):
+    return {"files": {path: {"executed_lines": lines}
+                      for path, lines in executed_lines.items()}}
+
+
+class CoverageIndexTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        self.index_dir = os.path.join(self.temp_dir.name, "coverage_index")
+        self.index = coverage_index.CoverageIndex(self.index_dir)
+
+    def test_empty(self):
+        self.assertEqual(self.index.tests_covering("./a.py"), (set(), set()))
+
+    def test_tests_covering(self):
+        coverage_index.write_record(self.index_dir, "./test_a.py",
+                                    _coverage_json({"a.py": [1, 2, 5],
+                                                    "test_a.py": [1]}))
+        coverage_index.write_record(self.index_dir, "./tests/test_b.py",
+                                    _coverage_json({"lib/b.py": [3]}))
+        tests = {"./test_a.py", "./tests/test_b.py"}
+        self.assertEqual(self.index.tests_covering("./a.py"),
+                         (tests, {"./test_a.py"}))
+        self.assertEqual(self.index.tests_covering("./lib/b.py"),
+                         (tests, {"./tests/test_b.py"}))
+        self.assertEqual(self.index.tests_covering("./a.py", lines=[3, 4]),
+                         (tests, set()))
+        self.assertEqual(self.index.tests_covering("./a.py", lines=[4, 5]),
+                         (tests, {"./test_a.py"}))
+
+    def test_changed_records(self):
+        coverage_index.write_record(self.index_dir, "./test_a.py",
+                                    _coverage_json({"a.py": [1]}))
+        self.assertEqual(self.index.tests_covering("./a.py")[1],
+                         {"./test_a.py"})
+        coverage_index.write_record(self.index_dir, "./test_a.py",
+                                    _coverage_json({"b.py": [1]}))
+        self.assertEqual(self.index.tests_covering("./a.py")[1],
+                         {"./test_a.py"})  # Until the index is updated.
+        self.index.update("./test_a.py")
+        self.assertEqual(self.index.tests_covering("./a.py")[1], set())
+        coverage_index.remove_record(self.index_dir, "./test_a.py")
+        self.index.update("./test_a.py")
+        self.assertEqual(self.index.tests_covering("./b.py"), (set(), set()))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3.8
+
+# Copyright (C) 2019 Andrew Hamilton. All rights reserved.
+# Licensed under the Artistic License 2.0.
+
+
+import os
+import tempfile
+import unittest
+
+import eris.__main__ as __main__
+import eris.imports as imports
+
+
+class ImportedModulesTestCase(unittest.TestCase):
+
+    def test_module_names(self):
+        self.assertEqual(imports.module_names("./a/b/c.py"),
+                         {"a.b.c", "b.c", "c"})
+        self.assertEqual(imports.module_names("./a/b/__init__.py"),
+                         {"a.b", "b"})
+
+    def test_imported_modules(self):
+        source = b"""
+import os.path
+from a import b, c
+from . import d
+from .. import e
+from .f import g
+def h():
+    import i
+"""
+        self.assertEqual(
+            imports.imported_modules(source, ("p", "q")),
+            {"os", "os.path", "a", "a.b", "a.c", "p", "p.q", "p.q.d",
+             "p.e", "p.q.f", "p.q.f.g", "i"})
+
+    def test_syntax_error(self):
+        self.assertEqual(imports.imported_modules(b"import (", ()), set())
+
+    def test_cache_is_bounded(self):
+        original_cache = imports._imports_cache
+        self.addCleanup(setattr, imports, "_imports_cache", original_cache)
+        imports._imports_cache = imports.collections.OrderedDict()
+        for index in range(imports._MAX_CACHE_SIZE + 1):
+            imports.imported_modules(f"import m{index}".encode("utf-8"))
+        self.assertEqual(len(imports._imports_cache), imports._MAX_CACHE_SIZE)
+        self.assertNotIn({"m0"}, imports._imports_cache.values())
+
+    def test_cache_is_saved(self):
+        original_cache = imports._imports_cache
+        self.addCleanup(setattr, imports, "_imports_cache", original_cache)
+        imports.imported_modules(b"import saved")
+        with tempfile.TemporaryDirectory() as temp_dir:
+            cache_path = os.path.join(temp_dir, "imports_cache")
+            imports.save_cache(cache_path)
+            imports._imports_cache = imports.collections.OrderedDict()
+            imports.load_cache(cache_path)
+        self.assertIn({"saved"}, imports._imports_cache.values())
+
+
+class ImportGraphTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        with __main__.chdir(self.temp_dir.name):
+            os.mkdir("pkg")
+            for path, source in [
+                    ("pkg/__init__.py", ""), ("pkg/lib.py", ""),
+                    ("pkg/util.py", "from . import lib"),
+                    ("test_util.py", "import pkg.util"),
+                    ("other.py", "import os")]:
+                with open(path, "w") as file_:
+                    file_.write(source)
+            self.graph = imports.ImportGraph(
+                ["./pkg/__init__.py", "./pkg/lib.py", "./pkg/util.py",
+                 "./test_util.py", "./other.py"])
+
+    def test_importers(self):
+        self.assertEqual(self.graph.importers("./pkg/lib.py"),
+                         [("./pkg/util.py", 1), ("./test_util.py", 2)])
+        self.assertEqual(self.graph.importers("./pkg/__init__.py"),
+                         [("./pkg/util.py", 1), ("./test_util.py", 1)])
+        self.assertEqual(self.graph.importers("./other.py"), [])
+
+    def test_update(self):
+        with __main__.chdir(self.temp_dir.name):
+            with open("other.py", "w") as file_:
+                file_.write("import pkg.lib")
+            self.graph.update("./other.py")
+        self.assertEqual(self.graph.importers("./pkg/lib.py"),
+                         [("./other.py", 1), ("./pkg/util.py", 1),
+                          ("./test_util.py", 2)])
+
+    def test_add_and_remove(self):
+        with __main__.chdir(self.temp_dir.name):
+            with open("test_lib.py", "w") as file_:
+                file_.write("from pkg import lib")
+            self.graph.update("./test_lib.py")
+        self.assertEqual(self.graph.importers("./pkg/lib.py"),
+                         [("./pkg/util.py", 1), ("./test_lib.py", 1),
+                          ("./test_util.py", 2)])
+        self.graph.remove("./pkg/util.py")
+        self.assertEqual(self.graph.importers("./pkg/lib.py"),
+                         [("./test_lib.py", 1)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3.8
+
+# Copyright (C) 2019 Andrew Hamilton. All rights reserved.
+# Licensed under the Artistic License 2.0.
+
+
+import asyncio
+import os
+import tempfile
+import unittest
+
+import eris.jobserver as jobserver
+
+
+class MakeflagsTestCase(unittest.TestCase):
+
+    def test_makeflags_path(self):
+        self.assertEqual(jobserver.makeflags_path(""), None)
+        self.assertEqual(jobserver.makeflags_path("-k -j4"), None)
+        read_fd, write_fd = os.pipe()
+        try:
+            self.assertEqual(
+                jobserver.makeflags_path(
+                    f" -j4 --jobserver-auth={read_fd},{write_fd}"),
+                f"/proc/self/fd/{read_fd}")
+            self.assertEqual(
+                jobserver.makeflags_path(f"--jobserver-fds={read_fd},-1"),
+                f"/proc/self/fd/{read_fd}")
+        finally:
+            os.close(read_fd)
+            os.close(write_fd)
+        with tempfile.NamedTemporaryFile() as fifo:
+            self.assertEqual(jobserver.makeflags_path(
+                f"-j2 --jobserver-auth=fifo:{fifo.name}"), fifo.name)
+        self.assertEqual(jobserver.makeflags_path(
+            "--jobserver-auth=fifo:/nonexistent"), None)
+
+
+class JobServerTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.fifo_path = os.path.join(self.temp_dir.name, "jobserver")
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+
+    def tearDown(self):
+        self.loop.close()
+        self.temp_dir.cleanup()
+
+    def test_tokens_are_shared(self):
+        owner = jobserver.share(self.fifo_path, 1)
+        client = jobserver.share(self.fifo_path, 1)
+        acquire = lambda jobserver_: self.loop.run_until_complete(
+            asyncio.wait_for(jobserver_.acquire(), 1))
+        acquire(owner)  # The implicit tokens.
+        acquire(client)
+        acquire(client)
+        self.assertTrue(owner.locked())
+        self.assertTrue(client.locked())
+        waiting = self.loop.create_task(owner.acquire())
+        self.loop.call_soon(client.release)
+        self.loop.run_until_complete(asyncio.wait_for(waiting, 1))
+        self.assertTrue(client.locked())
+        client.release()
+        self.assertFalse(client.locked())
+        client.close()
+        owner.close()
+        self.assertTrue(os.path.exists(self.fifo_path))
+
+    def test_clients_keep_the_fifo_after_the_owner_closes(self):
+        owner = jobserver.share(self.fifo_path, 2)
+        client = jobserver.share(self.fifo_path, 2)
+        owner.close()
+        new_client = jobserver.share(self.fifo_path, 2)
+        for jobserver_ in [client, new_client]:  # The implicit tokens.
+            self.loop.run_until_complete(jobserver_.acquire())
+        self.loop.run_until_complete(client.acquire())
+        self.loop.run_until_complete(new_client.acquire())
+        self.assertTrue(client.locked())
+        self.assertTrue(new_client.locked())
+        new_client.close()
+        client.close()
+
+    def test_close_returns_tokens(self):
+        owner = jobserver.share(self.fifo_path, 2)
+        client = jobserver.share(self.fifo_path, 2)
+        for index in range(3):
+            self.loop.run_until_complete(client.acquire())
+        self.assertTrue(client.locked())
+        client.close()
+        self.assertFalse(owner.locked())
+        self.loop.run_until_complete(owner.acquire())
+        self.loop.run_until_complete(owner.acquire())
+        self.assertFalse(owner.locked())
+        owner.close()
+
+    def test_locked_takes_no_token(self):
+        owner = jobserver.share(self.fifo_path, 1)
+        client = jobserver.share(self.fifo_path, 1)
+        self.loop.run_until_complete(owner.acquire())  # The implicit token.
+        self.assertFalse(owner.locked())
+        self.assertFalse(owner.locked())
+        self.loop.run_until_complete(client.acquire())
+        self.loop.run_until_complete(asyncio.wait_for(client.acquire(), 1))
+        self.assertTrue(owner.locked())
+        client.close()
+        owner.close()
+
+    def test_stale_fifo_is_replaced(self):
+        os.mkfifo(self.fifo_path)
+        owner = jobserver.share(self.fifo_path, 1)
+        self.loop.run_until_complete(owner.acquire())
+        self.loop.run_until_complete(asyncio.wait_for(owner.acquire(), 1))
+        self.assertTrue(owner.locked())
+        owner.close()
+        owner = jobserver.share(self.fifo_path, 2)
+        for index in range(3):
+            self.loop.run_until_complete(
+                asyncio.wait_for(owner.acquire(), 1))
+        self.assertTrue(owner.locked())
+        owner.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
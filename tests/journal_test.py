@@ -0,0 +1,101 @@
+#!/usr/bin/env python3.8
+
+# Copyright (C) 2019 Andrew Hamilton. All rights reserved.
+# Licensed under the Artistic License 2.0.
+
+
+import os
+import tempfile
+import unittest
+
+import eris.journal as journal
+
+
+def _sort_key(path):
+    return os.path.dirname(path), os.path.basename(path)
+
+
+class JournalTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.journal_dir = os.path.join(self.temp_dir.name, "journal")
+        self.journal = journal.Journal(self.journal_dir, _sort_key)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_load_empty(self):
+        self.assertEqual(self.journal.load(), (None, {}))
+
+    def test_replay(self):
+        self.journal.add_entry("./foo", 1, [("contents", 7, None)])
+        self.journal.add_entry("./bar", 2, [("contents", 7, None),
+                                            ("metadata", 7, None)])
+        self.journal.set_status("./bar", "metadata", 3, "gzip")
+        self.journal.set_change_time("./bar", 5)
+        self.journal.delete_entry("./foo")
+        self.journal.set_status("./foo", "contents", 3, "gzip")
+        self.journal.flush()
+        self.assertEqual(self.journal.load(), (None, {
+            "./foo": None,
+            "./bar": (5, (("contents", 7, None), ("metadata", 3, "gzip")))}))
+
+    def test_unflushed_changes_are_not_loaded(self):
+        self.journal.add_entry("./foo", 1, [])
+        self.assertEqual(
+            journal.Journal(self.journal_dir, _sort_key).load(), (None, {}))
+
+    def _compact(self):
+        self.journal.compact_in_background()
+        self.journal._compaction_thread.join()
+
+    def test_compaction(self):
+        self.journal.add_entry("./foo", 1, [("contents", 7, None)])
+        self.journal.add_entry("./bar", 2, [("metadata", 3, "gzip")])
+        self.journal.add_entry("./zoo", 3, [])
+        self.journal.flush()
+        self._compact()
+        self.assertEqual(sorted(os.listdir(self.journal_dir)), ["index"])
+        index, overlay = self.journal.load()
+        self.assertEqual(overlay, {})
+        self.assertEqual(list(index.records()),
+                         [("./bar", 2, [("metadata", 3, "gzip")]),
+                          ("./foo", 1, [("contents", 7, None)]),
+                          ("./zoo", 3, [])])
+
+    def test_changes_after_compaction(self):
+        self.journal.add_entry("./foo", 1, [("contents", 7, None)])
+        self.journal.add_entry("./bar", 2, [])
+        self.journal.flush()
+        self._compact()
+        self.journal.set_status("./foo", "contents", 3, "gzip")
+        self.journal.delete_entry("./bar")
+        self.journal.flush()
+        index, overlay = self.journal.load()
+        self.assertEqual(len(index), 2)
+        self.assertEqual(overlay, {"./foo": (1, (("contents", 3, "gzip"),)),
+                                   "./bar": None})
+        self._compact()
+        index, overlay = self.journal.load()
+        self.assertEqual(list(index.records()),
+                         [("./foo", 1, [("contents", 3, "gzip")])])
+
+    def test_truncated_journal(self):
+        self.journal.add_entry("./foo", 1, [])
+        self.journal.flush()
+        self.journal.add_entry("./bar", 1, [])
+        self.journal.flush()
+        journal_path = os.path.join(self.journal_dir, "journal")
+        os.truncate(journal_path, os.stat(journal_path).st_size - 3)
+        self.assertEqual(self.journal.load(), (None, {"./foo": (1, ())}))
+
+    def test_clear(self):
+        self.journal.add_entry("./foo", 1, [])
+        self.journal.flush()
+        self.journal.clear()
+        self.assertFalse(os.path.exists(self.journal_dir))
+
+
+if __name__ == "__main__":
+    unittest.main()
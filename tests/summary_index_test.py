@@ -0,0 +1,57 @@
+#!/usr/bin/env python3.8
+
+# Copyright (C) 2019 Andrew Hamilton. All rights reserved.
+# Licensed under the Artistic License 2.0.
+
+
+import os
+import tempfile
+import unittest
+
+import eris.summary_index as summary_index
+
+
+_RECORDS = [("./a", 1.5, [("contents", 3, "gzip"), ("metadata", 7, None)]),
+            ("./b/c", 2.0, []),
+            ("./b/d\udcff", 3.0, [("metadata", 1, "lzma")])]
+
+
+class SummaryIndexTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.index_path = os.path.join(self.temp_dir.name, "index")
+        summary_index.write_index(self.index_path, _RECORDS)
+        self.index = summary_index.SummaryIndex(self.index_path,
+                                                os.path.split)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_columns(self):
+        self.assertEqual(len(self.index), 3)
+        self.assertEqual(self.index.result_count, 3)
+        self.assertEqual(list(self.index.paths()),
+                         ["./a", "./b/c", "./b/d\udcff"])
+        self.assertEqual(self.index.change_time(1), 2.0)
+        self.assertEqual(self.index.row_length(0), 2)
+        self.assertEqual(self.index.statuses(0), bytes([3, 7]))
+        self.assertEqual(self.index.positions_with_statuses([7, 1]), {0, 2})
+        self.assertEqual(list(self.index.records()), _RECORDS)
+
+    def test_find(self):
+        self.assertEqual(self.index.find("./b/c"), 1)
+        self.assertRaises(KeyError, self.index.find, "./b/b")
+        self.assertEqual(self.index.get("./a"), (
+            1.5, (("contents", 3, "gzip"), ("metadata", 7, None))))
+        self.assertEqual(self.index.get("./z"), None)
+
+    def test_empty(self):
+        summary_index.write_index(self.index_path, [])
+        index = summary_index.SummaryIndex(self.index_path, os.path.split)
+        self.assertEqual(len(index), 0)
+        self.assertEqual(list(index.records()), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -3,9 +3,13 @@
 # Copyright (C) 2016-2019 Andrew Hamilton. All rights reserved.
 # Licensed under the Artistic License 2.0.
 
+import asyncio
 import contextlib
 import os
 import shutil
+import subprocess
+import sys
+import tempfile
 import unittest
 import unittest.mock
 
@@ -191,6 +195,162 @@ class ToolsTestCase(unittest.TestCase):
                                          tools.Status.normal)])
 
 
+class RunToolAsyncTestCase(unittest.TestCase):
+
+    def test_command_tools_match_their_sync_results(self):
+        loop = asyncio.new_event_loop()
+        for tool in [tools.python_syntax, tools.python_modulefinder]:
+            with self.subTest(tool=tool):
+                status, result = run_tool(tool, "hi3.py")
+                with chdir(os.path.join(ERIS_ROOT, "golden-files")):
+                    async_status, async_result = loop.run_until_complete(
+                        tools.run_tool_no_error_async(
+                            os.path.join(".", "input", "hi3.py"), tool))
+                self.assertEqual(async_status, status)
+                self.assertEqual(str(async_result), str(result))
+        loop.close()
+
+    def test_timeout(self):
+        loop = asyncio.new_event_loop()
+        with self.assertRaises(subprocess.TimeoutExpired):
+            loop.run_until_complete(
+                tools._run_command_async(["sleep", "1"], timeout=0.1))
+        loop.close()
+
+
+class ResourceClassTestCase(unittest.TestCase):
+
+    def test_resource_class(self):
+        self.assertEqual(tools.resource_class(tools.contents).name, "light")
+        self.assertEqual(tools.resource_class(tools.pytest).name, "heavy")
+        self.assertEqual(tools.resource_class(tools.pylint).name, "heavy")
+        self.assertIsNone(tools.resource_class(tools.contents).max_instances)
+
+
+class RequirementsTestCase(unittest.TestCase):
+
+    def test_unknown_requirement(self):
+        self.assertEqual(tools.tool_requirements(tools.pylint),
+                         [tools.python_syntax])
+        tool = tools.make_tool_function(["coreutils"], "true",
+                                        requires=["python_syntax"])
+        tools._check_requirements([tool])
+        tool = tools.make_tool_function(["coreutils"], "true",
+                                        requires=["nonexistent"])
+        with self.assertRaises(ValueError):
+            tools._check_requirements([tool])
+
+
+class ResourceLimitsTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.temp_dir.name, "foo")
+        script_path = os.path.join(self.temp_dir.name, "truncate.sh")
+        with open(script_path, "w") as script_file:
+            script_file.write('#!/bin/sh\nexec truncate -s 2M "$1"\n')
+        os.chmod(script_path, 0o755)
+        self.tool = tools.make_tool_function(
+            ["coreutils"], script_path, resource_limits={"output_size": 1})
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_tool_limits(self):
+        self.assertEqual(tools.tool_resource_limits(self.tool).output_size, 1)
+        self.assertEqual(tools.tool_resource_limits(self.tool).memory,
+                         tools.DEFAULT_RESOURCE_LIMITS.memory)
+
+    def test_exceeded_limit(self):
+        self.assertEqual(tools.run_tool_no_error(self.path, self.tool),
+                         (tools.Status.limit_exceeded,
+                          "Exceeded the output size limit"))
+
+    def test_exceeded_limit_async(self):
+        loop = asyncio.new_event_loop()
+        status, text = loop.run_until_complete(
+            tools.run_tool_no_error_async(self.path, self.tool))
+        self.assertEqual(status, tools.Status.limit_exceeded)
+        loop.close()
+
+    def test_niceness(self):
+        script_path = os.path.join(self.temp_dir.name, "nice.sh")
+        with open(script_path, "w") as script_file:
+            script_file.write("#!/bin/sh\nnice\n")
+        os.chmod(script_path, 0o755)
+        tool = tools.make_tool_function(["coreutils"], script_path)
+        limits = tools.tool_resource_limits(tool)._replace(niceness=19)
+        status, text = tools.run_tool_no_error(self.path, tool, limits)
+        self.assertEqual(str(text).strip(), "19")
+
+    def test_limits_apply_to_child_processes(self):
+        limits = tools.tool_resource_limits(self.tool)
+        process = tools._run_limited("nice | cat; cat /proc/self/limits",
+                                     limits._replace(niceness=19), shell=True)
+        niceness, *lines = process.stdout.splitlines()
+        self.assertEqual(niceness, "19")
+        open_files_line = [line for line in lines
+                           if line.startswith("Max open files")][0]
+        self.assertEqual(open_files_line.split()[3], str(limits.open_files))
+
+
+class ToolFingerprintTestCase(unittest.TestCase):
+
+    def _tool(self, command):
+        tool = tools.make_tool_function(["coreutils"], command)
+        tool.toml_stanza = {"dependencies": ["coreutils"], "command": command}
+        return tool
+
+    def test_tool_fingerprint(self):
+        self.assertEqual(tools.tool_fingerprint(self._tool("wc -l")),
+                         tools.tool_fingerprint(self._tool("wc -l")))
+        self.assertNotEqual(tools.tool_fingerprint(self._tool("wc -l")),
+                            tools.tool_fingerprint(self._tool("wc -c")))
+        self.assertNotEqual(tools.tool_fingerprint(tools.contents),
+                            tools.tool_fingerprint(tools.metadata))
+
+    def test_helpers_are_in_fingerprint(self):
+        functions = tools._tool_functions(self._tool("wc -l"))
+        self.assertIn(tools._run_command_async, functions)
+        self.assertIn(tools._run_limited, functions)
+        self.assertNotIn(tools.metadata, functions)
+        self.assertNotIn(tools.python_coverage,
+                         tools._tool_functions(tools.contents))
+
+    def test_executable_changes_fingerprint(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            executable_path = os.path.join(temp_dir, "foo")
+            with open(executable_path, "w") as file_:
+                file_.write("#!/bin/sh\n")
+            os.chmod(executable_path, 0o755)
+            with unittest.mock.patch.dict(
+                    os.environ, {"PATH": temp_dir + ":" + os.environ["PATH"]}):
+                fingerprint = tools.tool_fingerprint(self._tool("foo"))
+                with open(executable_path, "a") as file_:
+                    file_.write("echo upgraded\n")
+                self.assertNotEqual(tools.tool_fingerprint(self._tool("foo")),
+                                    fingerprint)
+
+
+class ModuleOriginTestCase(unittest.TestCase):
+
+    def test_packages_are_not_imported(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            os.mkdir(os.path.join(temp_dir, "eris_test_pkg"))
+            with open(os.path.join(temp_dir, "eris_test_pkg", "__init__.py"),
+                      "w") as init_file:
+                init_file.write("raise RuntimeError\n")
+            module_path = os.path.join(temp_dir, "eris_test_pkg", "mod.py")
+            open(module_path, "w").close()
+            with unittest.mock.patch("sys.path", [temp_dir] + sys.path):
+                self.assertEqual(tools._module_origin("eris_test_pkg.mod"),
+                                 module_path)
+                self.assertIsNone(
+                    tools._module_origin("eris_test_pkg.missing"))
+        self.assertNotIn("eris_test_pkg", sys.modules)
+        self.assertIsNone(tools._module_origin("nonexistent.mod"))
+
+
 class LruCacheWithEvictionTestCase(unittest.TestCase):
 
     def _assert_cache(self, func, hits, misses, current_size):
@@ -5,15 +5,32 @@
 
 
 import asyncio
+import contextlib
+import io
 import os
+import pickle
 import shutil
+import signal
+import socket
+import subprocess
 import tempfile
+import time
 import unittest
 
 import eris.tools as tools
 import eris.worker as worker
 
 
+def _saved_result(result):
+    loop = asyncio.get_event_loop()
+    for attempt in range(50):  # Results sent back are saved in a thread.
+        if result.pickle_path() not in tools._unsaved_results:
+            break
+        loop.run_until_complete(asyncio.sleep(0.01))
+    with open(result.pickle_path(), "rb") as result_file:
+        return pickle.load(result_file)
+
+
 class WorkerTestCase(unittest.TestCase):
 
     def setUp(self):
@@ -32,12 +49,331 @@ class WorkerTestCase(unittest.TestCase):
         compression = "none"
         worker_ = worker.Worker(False, compression)
         loop.run_until_complete(worker_.create_process())
-        worker_.process.stdin.write(f"{compression}\n".encode("utf-8"))
         future = worker_.run_tool("foo", tools.metadata)
         status = loop.run_until_complete(future)
         self.assertEqual(status, tools.Status.normal)
         result_path = os.path.join(tools.CACHE_PATH, "foo-metadata")
         self.assertTrue(os.path.exists(result_path))
+        worker_.kill()
+
+    def test_pipelined_jobs(self):
+        loop = asyncio.get_event_loop()
+        worker_ = worker.Worker(False, "none")
+        loop.run_until_complete(worker_.create_process())
+        open("bar", "w").close()
+        statuses = loop.run_until_complete(asyncio.gather(
+            worker_.run_tool("foo", tools.metadata),
+            worker_.run_tool("bar", tools.contents)))
+        self.assertEqual(statuses, [tools.Status.normal, tools.Status.normal])
+        for result_path in ["foo-metadata", "bar-contents"]:
+            self.assertTrue(os.path.exists(
+                os.path.join(tools.CACHE_PATH, result_path)))
+        worker_.kill()
+
+    def test_concurrent_jobs(self):
+        loop = asyncio.get_event_loop()
+        worker_ = worker.Worker(False, "none", concurrency=2)
+        loop.run_until_complete(worker_.create_process())
+        with open("foo.py", "w") as file_:
+            file_.write("import os\n")
+        tools_ = [tools.python_syntax, tools.python_modulefinder,
+                  tools.contents]
+        statuses = loop.run_until_complete(asyncio.gather(
+            *[worker_.run_tool("foo.py", tool) for tool in tools_]))
+        self.assertEqual(statuses, [tools.run_tool_no_error("foo.py", tool)[0]
+                                    for tool in tools_])
+        worker_.kill()
+
+    def test_queued_jobs_hold_no_tokens(self):
+        loop = asyncio.get_event_loop()
+        cpu_budget = asyncio.Semaphore(1)
+        worker_ = worker.Worker(False, "none", concurrency=2,
+                                cpu_budget=cpu_budget)
+        self.assertEqual([worker_._tokens_needed(job_count)
+                          for job_count in range(4)], [0, 0, 1, 1])
+        worker_ = worker.Worker(False, "none", cpu_budget=cpu_budget,
+                                has_own_slot=False)
+        self.assertEqual([worker_._tokens_needed(job_count)
+                          for job_count in range(3)], [0, 1, 1])
+        loop.run_until_complete(cpu_budget.acquire())
+        worker_._token_count = 1
+        worker_._release_tokens(0)
+        self.assertEqual(worker_._token_count, 0)
+        self.assertFalse(cpu_budget.locked())
+
+    def test_memory_limit(self):
+        loop = asyncio.get_event_loop()
+        worker_ = worker.Worker(False, "none")
+        loop.run_until_complete(worker_.create_process())
+        group_memory = worker.process_group_memory([worker_.child_pgid])
+        self.assertGreater(group_memory[worker_.child_pgid], 0)
+        worker_.check_memory(group_memory)
+        self.assertFalse(worker_.is_memory_exceeded)
+        worker_.pause()
+        future = asyncio.ensure_future(
+            worker_.run_tool("foo", tools.metadata))
+        loop.run_until_complete(asyncio.sleep(0))
+        worker_.check_memory({worker_.child_pgid: 1000000})
+        self.assertEqual(loop.run_until_complete(future),
+                         tools.Status.limit_exceeded)
+        result = tools.Result("foo", tools.metadata)
+        result.compression = "none"
+        result.set_status(tools.Status.limit_exceeded)
+        self.assertEqual(str(result.result.appearance_min()[0]),
+                         "Exceeded the memory limit")
+        worker_.kill()
+
+    def test_process_group_memory_of_descendants(self):
+        with subprocess.Popen(["sleep", "10"],
+                              start_new_session=True) as process:
+            try:
+                group_memory = worker.process_group_memory([os.getpid()])
+            finally:
+                process.kill()
+        self.assertGreater(group_memory[os.getpgid(0)], 0)
+        self.assertGreater(group_memory[process.pid], 0)
+
+    def test_crashed_worker_is_restarted(self):
+        loop = asyncio.get_event_loop()
+        worker_ = worker.Worker(False, "none")
+        loop.run_until_complete(worker_.create_process())
+        child_pgid = worker_.child_pgid
+        future = asyncio.ensure_future(
+            worker_.run_tool("foo", tools.metadata))
+        os.killpg(child_pgid, signal.SIGKILL)
+        self.assertEqual(loop.run_until_complete(future),
+                         tools.Status.normal)
+        self.assertNotEqual(worker_.child_pgid, child_pgid)
+        worker_.kill()
+
+    def test_urgency(self):
+        loop = asyncio.get_event_loop()
+        worker_ = worker.Worker(False, "none")
+        loop.run_until_complete(worker_.create_process())
+        niceness = os.getpriority(os.PRIO_PROCESS, 0)
+        worker_.set_urgency(True)
+        self.assertTrue(worker_.is_urgent)
+        worker_.set_urgency(False)
+        self.assertFalse(worker_.is_urgent)
+        loop.run_until_complete(worker_.run_tool("foo", tools.metadata))
+        self.assertEqual(os.getpriority(os.PRIO_PGRP, worker_.child_pgid),
+                         niceness)
+        worker_.kill()
+
+    def test_pause_and_resume(self):
+        loop = asyncio.get_event_loop()
+        worker_ = worker.Worker(False, "none")
+        loop.run_until_complete(worker_.create_process())
+        worker_.pause()
+        self.assertTrue(worker_.is_paused)
+        worker_.resume()
+        self.assertFalse(worker_.is_paused)
+        status = loop.run_until_complete(
+            worker_.run_tool("foo", tools.metadata))
+        self.assertEqual(status, tools.Status.normal)
+        worker_.kill()
+
+    def test_cancel_job(self):
+        loop = asyncio.get_event_loop()
+        worker_ = worker.Worker(False, "none")
+        loop.run_until_complete(worker_.create_process())
+        worker_.pause()  # So the job can't finish before it's cancelled.
+        future = asyncio.ensure_future(
+            worker_.run_tool("foo", tools.metadata))
+        loop.run_until_complete(asyncio.sleep(0))
+        worker_.cancel()
+        self.assertEqual(loop.run_until_complete(future),
+                         tools.Status.pending)
+        self.assertFalse(worker_.is_cancelled)
+        status = loop.run_until_complete(
+            worker_.run_tool("foo", tools.metadata))
+        self.assertEqual(status, tools.Status.normal)
+        worker_.kill()
+
+    def test_retire(self):
+        loop = asyncio.get_event_loop()
+        worker_ = worker.Worker(False, "none")
+        jobs_added_event = asyncio.Event()
+
+        class _EmptySummary:
+
+            async def get_closest_placeholder(self):
+                raise StopAsyncIteration
+        runner = loop.create_task(worker_.job_runner(
+            None, _EmptySummary(), None, jobs_added_event, asyncio.Event()))
+        loop.run_until_complete(asyncio.sleep(0.1))
+        worker_.retire(jobs_added_event)
+        loop.run_until_complete(asyncio.wait_for(runner, 5))
+        self.assertEqual(loop.run_until_complete(worker_.process.wait()),
+                         -signal.SIGKILL)
+
+    def test_piped_result(self):
+        loop = asyncio.get_event_loop()
+        worker_ = worker.Worker(False, "none", result_threshold=1000)
+        loop.run_until_complete(worker_.create_process())
+        with open("foo", "w") as foo_file:
+            foo_file.write("piped contents")
+        status = loop.run_until_complete(worker_.run_tool("foo",
+                                                          tools.contents))
+        self.assertEqual(status, tools.Status.normal)
+        result = tools.Result("foo", tools.contents)
+        result.compression = "none"
+        result.entry.set_status(0, tools.Status.normal)
+        self.assertEqual(str(result.result.appearance_min()[0]),
+                         "piped contents")
+        self.assertEqual(str(_saved_result(result).appearance_min()[0]),
+                         "piped contents")
+        worker_.kill()
+
+    def test_piped_result_keeps_its_style(self):
+        loop = asyncio.get_event_loop()
+        worker_ = worker.Worker(False, "none", result_threshold=10000)
+        loop.run_until_complete(worker_.create_process())
+        with open("foo.py", "w") as foo_file:
+            foo_file.write("import os\n")
+        status = loop.run_until_complete(worker_.run_tool("foo.py",
+                                                          tools.contents))
+        self.assertEqual(status, tools.Status.normal)
+        result = tools.Result("foo.py", tools.contents)
+        line = _saved_result(result).appearance_min()[0]
+        expected_text = tools.run_tool_no_error("foo.py", tools.contents)[1]
+        self.assertEqual(line.data, "import os")
+        self.assertEqual(line.style[:len("import os")],
+                         expected_text.style[:len("import os")])
+        self.assertNotEqual(len(set(line.style)), 1)
+        worker_.kill()
+
+    def test_jobs_running_in_bulk(self):
+        worker_ = worker.Worker(False, "none")
+        worker_._writer = io.BytesIO()
+        result = tools.Result("foo", tools.contents)
+        worker_._jobs[0] = "foo", tools.contents, None
+        worker_._write_job(0, "foo", tools.contents, False)
+        self.assertTrue(worker_.is_running_in_bulk(result))
+        self.assertFalse(worker_.is_running_in_bulk(
+            tools.Result("bar", tools.contents)))
+        worker_._write_job(0, "foo", tools.contents, True)  # Sent again.
+        self.assertFalse(worker_.is_running_in_bulk(result))
+
+    def test_sent_text(self):
+        text = tools.termstr.TermStr("ab").bold() + "c"
+        self.assertEqual(worker._load_text(worker._dump_text(text)), text)
+        self.assertEqual(worker._load_text(worker._dump_text("plain")),
+                         "plain")
+        with self.assertRaises(ValueError):
+            worker._load_text(
+                b'{"text": "a", "styles": [], "runs": [[0, 1000000000]]}')
+        with self.assertRaises(ValueError):
+            worker._load_text(pickle.dumps("a"))
+
+    def test_rejected_job_gets_an_error(self):
+        loop = asyncio.get_event_loop()
+        worker_ = worker.Worker(False, "none")
+        loop.run_until_complete(worker_.create_process())
+        status = loop.run_until_complete(worker_.run_tool("foo",
+                                                          tools.log_error))
+        self.assertEqual(status, tools.Status.error)
+        result = tools.Result("foo", tools.log_error)
+        self.assertIn("log_error",
+                      str(_saved_result(result).appearance_min()[0]))
+        self.assertEqual(worker_.process.returncode, None)
+        worker_.kill()
+
+    def _run_remote_job(self, transport):
+        loop = asyncio.get_event_loop()
+        worker_ = worker.Worker(False, "none", transport=transport)
+        loop.run_until_complete(worker_.create_process())
+        self.assertEqual(worker_.child_pgid, None)
+        status = loop.run_until_complete(worker_.run_tool("foo",
+                                                          tools.contents))
+        self.assertEqual(status, tools.Status.normal)
+        result = tools.Result("foo", tools.contents)
+        self.assertEqual(str(_saved_result(result).appearance_min()[0]),
+                         "remote contents")
+        worker_.kill()
+
+    def _make_remote_checkout(self):
+        remote_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, remote_dir)
+        with open(os.path.join(remote_dir, "foo"), "w") as foo_file:
+            foo_file.write("remote contents")
+        return remote_dir
+
+    def _listen(self, remote_dir):
+        with socket.socket() as free_socket:
+            free_socket.bind(("localhost", 0))
+            port = free_socket.getsockname()[1]
+        listener = subprocess.Popen(
+            ["eris-worker", "--listen", f"localhost:{port}"], cwd=remote_dir,
+            env=dict(os.environ, **{worker.SECRET_VARIABLE: "secret"}))
+        self.addCleanup(listener.wait)
+        self.addCleanup(listener.kill)
+        for attempt in range(50):
+            with contextlib.suppress(ConnectionRefusedError):
+                socket.create_connection(("localhost", port)).close()
+                break
+            time.sleep(0.1)
+        return port
+
+    def test_remote_worker_over_tcp(self):
+        port = self._listen(self._make_remote_checkout())
+        os.environ[worker.SECRET_VARIABLE] = "secret"
+        self.addCleanup(os.environ.pop, worker.SECRET_VARIABLE)
+        self._run_remote_job(worker.make_transport(f"localhost:{port}"))
+
+    def test_listener_needs_the_secret(self):
+        port = self._listen(self._make_remote_checkout())
+        with socket.create_connection(("localhost", port)) as connection:
+            connection.settimeout(5)
+            challenge = worker._receive_line(connection)
+            self.assertEqual(len(challenge), 32)
+            connection.sendall(worker._digest("wrong", challenge) + b"\n")
+            self.assertEqual(connection.recv(100), b"")
+
+    def test_remote_jobs_are_checked(self):
+        self.assertIs(worker._checked_tool("contents", "./foo"),
+                      tools.contents)
+        for tool_name, path in [("log_error", "./foo"),
+                                ("os", "./foo"),
+                                ("contents", "/etc/passwd"),
+                                ("contents", "./../foo")]:
+            with self.assertRaises(ValueError):
+                worker._checked_tool(tool_name, path)
+
+    def test_remote_worker_over_command(self):
+        remote_dir = self._make_remote_checkout()
+        self._run_remote_job(worker.CommandTransport(
+            f"cd {remote_dir} && eris-worker --remote"))
+
+    def test_make_transport(self):
+        transport = worker.make_transport("example.com:8000")
+        self.assertEqual((transport.host, transport.port),
+                         ("example.com", 8000))
+        transport = worker.make_transport("ssh:example.com:/a b")
+        self.assertEqual(transport.address,
+                         "ssh example.com 'cd '\"'\"'/a b'\"'\"' && "
+                         "eris-worker --remote'")
+        with self.assertRaises(ValueError):
+            worker.make_transport("example.com")
+
+
+class ScalingDecisionTestCase(unittest.TestCase):
+
+    def test_scaling_decision(self):
+        self.assertEqual(worker.scaling_decision(0.2, 1, 0, 100, 2, 4), 1)
+        self.assertEqual(worker.scaling_decision(0.2, None, None, 100, 2, 4),
+                         1)
+        self.assertEqual(worker.scaling_decision(0.2, 1, 0, 100, 4, 4), 0)
+        self.assertEqual(worker.scaling_decision(0.2, 1, 0, 1, 2, 4), 0)
+        self.assertEqual(worker.scaling_decision(1.0, 1, 0, 100, 2, 4), 0)
+        self.assertEqual(worker.scaling_decision(2.0, 1, 0, 100, 2, 4), -1)
+        self.assertEqual(worker.scaling_decision(0.2, 60, 0, 100, 2, 4), -1)
+        self.assertEqual(worker.scaling_decision(0.2, 1, 10, 100, 2, 4), -1)
+        self.assertEqual(worker.scaling_decision(2.0, 1, 0, 100, 1, 4), 0)
+
+    def test_pressure(self):
+        cpu_pressure = worker.pressure("cpu")
+        self.assertTrue(cpu_pressure is None or cpu_pressure >= 0)
 
 
 if __name__ == "__main__":